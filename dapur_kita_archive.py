@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+
+from dapur_kita_columnar import unpack_extra, unpack_ledger
+from dapur_kita_ledger import (
+    CLOSING_KEY, COLLECTIONS, compute_accounts, compute_rollups, compute_totals, date_to_ordinal,
+    get_accounts, get_rollups, get_stock, get_totals, is_void, merge_nested
+)
+
+# ------------------- Konstanta -------------------
+# Jumlah partisi lengkap (semua baris) yang disimpan di memori sekaligus
+PARTITION_CACHE_SIZE = 4
+
+_SUMMARIES = {}
+_PARTITIONS = OrderedDict()
+_ROLLUPS = {}
+_VIEWS = {}
+_LOCK = threading.Lock()
+
+
+# ------------------- Partisi -------------------
+def partition_data(record):
+    # Isi berkas partisi: baris yang ditutup beserta struktur turunan milik baris itu saja
+    data = {name: [row for row in record["removed"].get(name, []) if not is_void(row)] for name in COLLECTIONS}
+    data["totals"] = compute_totals(data)
+    data["rollups"] = compute_rollups(data)
+    data["accounts"] = compute_accounts(data)
+    data.update({"period": record["period"], "from": record.get("from"), "through": record["through"]})
+    return data
+
+
+def file_signature(paths):
+    # (mtime_ns, ukuran) setiap berkas, None untuk berkas yang belum ada
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def partition_summary(path):
+    """Struktur turunan satu partisi tanpa membangun barisnya; disimpan per tanda tangan berkas."""
+    key = (path, file_signature([path])[0])
+    with _LOCK:
+        if key not in _SUMMARIES:
+            with open(path, "rb") as f:
+                _SUMMARIES[key] = unpack_extra(f.read())
+        return _SUMMARIES[key]
+
+
+def load_partition(path):
+    key = (path, file_signature([path])[0])
+    with _LOCK:
+        if key in _PARTITIONS:
+            _PARTITIONS.move_to_end(key)
+            return _PARTITIONS[key]
+    with open(path, "rb") as f:
+        data = unpack_ledger(f.read())
+    with _LOCK:
+        _PARTITIONS[key] = data
+        while len(_PARTITIONS) > PARTITION_CACHE_SIZE:
+            _PARTITIONS.popitem(last=False)
+    return data
+
+
+def partition_paths(directory, closed):
+    return [os.path.join(directory, partition["file"]) for partition in closed["partitions"]]
+
+
+# ------------------- Laporan Lintas Periode -------------------
+def archived_rollups(directory, closed):
+    # Rekap semua partisi digabung sekali, lalu dipakai ulang selama daftar partisi sama
+    paths = tuple(partition_paths(directory, closed))
+    key = tuple(zip(paths, file_signature(paths)))
+    with _LOCK:
+        if _ROLLUPS.get(directory, (None,))[0] == key:
+            return _ROLLUPS[directory][1]
+    rollups = {}
+    for path in paths:
+        merge_nested(rollups, partition_summary(path)["rollups"])
+    with _LOCK:
+        _ROLLUPS[directory] = (key, rollups)
+    return rollups
+
+
+def report_view(data, directory, version=None):
+    """Data untuk laporan yang bisa mencakup periode tertutup.
+
+    Rekap periode berisi partisi arsip ditambah periode aktif, dan saldo pembuka tidak
+    ikut lagi karena sudah terwakili oleh rekap arsip; dengan begitu `rollup_report`,
+    `balance_as_of`, `trial_balance` dan `account_ledger` benar untuk tanggal mana pun.
+    Koleksinya tetap baris aktif saja. Hasil disimpan selama `data` dan `version` sama.
+    """
+    closed = data.get(CLOSING_KEY)
+    if not closed or not closed["partitions"]:
+        return data
+    key = (version, len(closed["partitions"]))
+    with _LOCK:
+        cached = _VIEWS.get(directory)
+        if cached and cached[0] is data and cached[1] == key:
+            return cached[2]
+    view = {name: data[name] for name in COLLECTIONS}
+    view["totals"] = get_totals(data)
+    view["accounts"] = get_accounts(data)
+    view["stock"] = get_stock(data)
+    view["rollups"] = merge_nested(merge_nested({}, archived_rollups(directory, closed)), get_rollups(data))
+    with _LOCK:
+        _VIEWS[directory] = (data, key, view)
+    return view
+
+
+def iter_archived_rows(directory, closed, collection, date_from=None, date_to=None, **match):
+    # Hanya partisi yang rentangnya beririsan dengan filter tanggal yang dibuka; hasilnya
+    # satu daftar baris per partisi, sehingga pemakai tidak perlu menampung semua partisi
+    low = date_to_ordinal(date_from) if date_from else None
+    high = date_to_ordinal(date_to) if date_to else None
+    for partition, path in zip(closed["partitions"], partition_paths(directory, closed)):
+        if low is not None and date_to_ordinal(partition["through"]) < low:
+            continue
+        if high is not None and partition["from"] and date_to_ordinal(partition["from"]) > high:
+            continue
+        rows = []
+        for row in load_partition(path)[collection]:
+            ordinal = date_to_ordinal(row["date"])
+            if (low is not None and ordinal < low) or (high is not None and ordinal > high):
+                continue
+            if all(row.get(field) == value for field, value in match.items() if value):
+                rows.append(row)
+        yield rows
+
+
+def archived_rows(directory, closed, collection, date_from=None, date_to=None, **match):
+    return [row for rows in iter_archived_rows(directory, closed, collection, date_from, date_to, **match) for row in rows]
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from dapur_kita_ledger import (
+    PRODUCTS, PURCHASE_METHODS, SALE_METHODS,
+    apply_record, build_purchase, build_sale, compute_accounts, compute_rollups,
+    compute_stock, compute_totals, empty_data, merge_rows, resolve_operation
+)
+from dapur_kita_store import BINARY_SUFFIX, open_store, reset_stores
+
+# ------------------- Konstanta -------------------
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sim_dapur_kita_revisi1.py")
+DEFAULT_SIZES = [10000, 100000]
+DEFAULT_MODES = ["json", "wal", "sqlite"]
+DEFAULT_FORMATS = ["json", "binary"]
+# Bobot metode: kebanyakan tunai/kredit, sebagian kecil retur
+PURCHASE_WEIGHTS = [60, 35, 5]
+SALE_WEIGHTS = [65, 30, 5]
+PURCHASE_SHARE = 0.3
+
+
+# ------------------- Generator Data -------------------
+def generate_ledger(postings, seed=42, start=date(2023, 1, 1), days=730):
+    # Posting dibuat dengan fungsi yang sama seperti formulir, urut tanggal seperti input harian
+    rng = random.Random(seed)
+    products = list(PRODUCTS)
+    popularity = [rng.randint(1, 10) for _ in products]
+    rows = {}
+    ordinals = sorted(rng.randrange(days) for _ in range(postings))
+    for offset in ordinals:
+        when = (start + timedelta(days=offset)).isoformat()
+        product = rng.choices(products, popularity)[0]
+        quantity = rng.randint(1, 12)
+        if rng.random() < PURCHASE_SHARE:
+            method = rng.choices(PURCHASE_METHODS, PURCHASE_WEIGHTS)[0]
+            merge_rows(rows, build_purchase(when, product, quantity * 5, PRODUCTS[product], method))
+        else:
+            method = rng.choices(SALE_METHODS, SALE_WEIGHTS)[0]
+            merge_rows(rows, build_sale(when, product, quantity, PRODUCTS[product], method))
+    data = empty_data()
+    for name, items in rows.items():
+        data[name] = items
+    data["totals"] = compute_totals(data)
+    data["rollups"] = compute_rollups(data)
+    data["accounts"] = compute_accounts(data)
+    data["stock"] = compute_stock(data)
+    return data
+
+
+# ------------------- Pengukuran -------------------
+def timed(fn, repeat=1):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def store_size(store):
+    return sum(os.path.getsize(path) for path in store.files() if os.path.exists(path))
+
+
+def data_path(workdir, file_format):
+    return os.path.join(workdir, "dapur_kita_data" + (BINARY_SUFFIX if file_format == "binary" else ".json"))
+
+
+def bench_store(mode, data, workdir, repeat, file_format="json"):
+    path = data_path(workdir, file_format)
+    results = {}
+    store = open_store(mode, path)
+    results["save_data"] = timed(lambda: store.save(data))
+    results["file_bytes"] = store_size(store)
+    reset_stores()
+    results["load_data"] = timed(lambda: open_store(mode, path).load(), repeat)
+
+    store = open_store(mode, path)
+    loaded = store.load()
+    last_date = loaded["transactions"][-1]["date"]
+
+    def post_one():
+        record = {"op": "post", "rows": build_sale(last_date, "Sendok A", 1, PRODUCTS["Sendok A"], "Tunai")}
+        apply_record(loaded, record)
+        store.commit(loaded, record)
+
+    results["commit_posting"] = timed(post_one, repeat)
+
+    def delete_middle():
+        position = len(loaded["transactions"]) // 2
+        op = {"op": "delete_transaction", "position": position, "expect": loaded["transactions"][position]}
+        record = resolve_operation(loaded, op)
+        apply_record(loaded, record)
+        store.commit(loaded, record)
+
+    results["delete_transaction"] = timed(delete_middle, repeat)
+    reset_stores()
+    return results
+
+
+def bench_render(mode, workdir, repeat, file_format="json"):
+    # Rerun Streamlit diukur headless lewat AppTest, termasuk muat data pertama kali
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["DAPUR_KITA_DATA"] = data_path(workdir, file_format)
+    os.environ["DAPUR_KITA_STORAGE"] = mode
+    results = {}
+    at = AppTest.from_file(APP_FILE, default_timeout=600)
+    at.run()
+    at.text_input[0].input("admin")
+    at.text_input[1].input("dapur123")
+    at.button[0].click()
+    results["login_rerun"] = timed(at.run)
+
+    def render(menu):
+        at.selectbox[0].select(menu)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+
+    for label, menu in (("render_profitability", "📊 Profitabilitas"), ("render_transactions", "🧾 Transaksi")):
+        samples = []
+        for _ in range(repeat + 1):
+            at.selectbox[0].select("🏠 Home")
+            at.run()
+            start = time.perf_counter()
+            render(menu)
+            samples.append(time.perf_counter() - start)
+        # Sampel pertama termasuk muat data bersama untuk pertama kalinya
+        results[label + "_first"] = samples[0]
+        results[label] = statistics.median(samples[1:])
+
+    # Transaksi tidak dihapus lagi dari halaman, tetapi dibatalkan dengan alasan
+    next(field for field in at.text_input if field.label == "Alasan Pembatalan").input("benchmark")
+    next(button for button in at.button if button.label == "Batalkan Transaksi").click()
+    results["void_transaction_rerun"] = timed(at.run)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    reset_stores()
+    return results
+
+
+# ------------------- CLI -------------------
+def compare(previous, current):
+    # Rasio > 1 berarti lebih lambat dari hasil sebelumnya
+    def key(row):
+        return row["mode"], row.get("format", "json"), row["postings"], row["metric"]
+
+    before = {key(row): row["value"] for row in previous["results"]}
+    for row in current["results"]:
+        if key(row) in before and before[key(row)]:
+            ratio = row["value"] / before[key(row)]
+            flag = "  <-- regresi" if ratio > 1.2 and not row["metric"].endswith("bytes") else ""
+            print(f"{row['mode']:>6} {row['format']:>6} {row['postings']:>8} {row['metric']:<26} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark jalur utama Dapur Kita dengan buku besar sintetis")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="jumlah posting per skenario")
+    parser.add_argument("--modes", nargs="+", default=DEFAULT_MODES, choices=DEFAULT_MODES)
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, choices=DEFAULT_FORMATS,
+                        help="format berkas snapshot untuk mode json/wal")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-render", action="store_true", help="lewati pengukuran rerun Streamlit")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="berkas hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args(argv)
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": [],
+    }
+    for size in args.sizes:
+        start = time.perf_counter()
+        data = generate_ledger(size, args.seed)
+        print(f"{size} posting dibuat dalam {time.perf_counter() - start:.1f} detik", file=sys.stderr)
+        scenarios = [
+            (mode, file_format) for mode in args.modes for file_format in args.formats
+            if mode != "sqlite" or file_format == "json"
+        ]
+        for mode, file_format in scenarios:
+            workdir = tempfile.mkdtemp(prefix=f"dapur_kita_bench_{mode}_")
+            try:
+                results = bench_store(mode, data, workdir, args.repeat, file_format)
+                if not args.no_render:
+                    results.update(bench_render(mode, workdir, args.repeat, file_format))
+            finally:
+                reset_stores()
+                shutil.rmtree(workdir, ignore_errors=True)
+            for metric, value in results.items():
+                report["results"].append({
+                    "mode": mode, "format": file_format, "postings": size, "metric": metric, "value": value
+                })
+                unit = "B" if metric.endswith("bytes") else "s"
+                print(f"{mode:>6} {file_format:>6} {size:>8} {metric:<26} {value:12.4f} {unit}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+import argparse
+import bisect
+import json
+import sys
+import threading
+from collections.abc import Mapping
+from datetime import date
+
+from dapur_kita_ledger import PRODUCTS, date_to_ordinal, period_keys, validate_date
+from dapur_kita_store import _write_json_atomic, file_signature
+
+# ------------------- Konstanta -------------------
+DEFAULT_CATALOG = "dapur_kita_catalog.json"
+# Tanggal berlaku harga awal saat katalog dibuat dari daftar barang bawaan
+HISTORY_START = "2000-01-01"
+SKU_PREFIX = "DK-"
+
+_CATALOGS = {}
+_CATALOGS_LOCK = threading.Lock()
+
+
+# ------------------- Fungsi Utilitas -------------------
+def default_catalog(products=PRODUCTS):
+    return {"products": [
+        {"sku": f"{SKU_PREFIX}{number:03d}", "name": name, "prices": [{"from": HISTORY_START, "price": price}]}
+        for number, (name, price) in enumerate(products.items(), 1)
+    ]}
+
+
+def _check_price(price):
+    if isinstance(price, bool) or not isinstance(price, (int, float)):
+        raise ValueError("Harga harus berupa angka.")
+    if price <= 0:
+        raise ValueError("Harga harus lebih dari 0.")
+
+
+def _effective(value):
+    # Tanggal berlaku disimpan dalam bentuk baku agar urutan teks sama dengan urutan tanggal
+    if not isinstance(value, str) or not validate_date(value):
+        raise ValueError("Format tanggal berlaku tidak valid.")
+    return period_keys(value)["daily"]
+
+
+def build_index(raw):
+    """Indeks katalog: barang per nama, nama per SKU, dan riwayat harga terurut per barang.
+
+    Riwayat setiap barang disimpan sebagai dua daftar sejajar (ordinal tanggal berlaku dan
+    harga) sehingga harga pada suatu tanggal cukup dicari dengan bisect. Entri dengan
+    tanggal sama dipakai yang terakhir.
+    """
+    items, skus = {}, {}
+    for product in raw.get("products", []):
+        history = {}
+        for entry in product.get("prices", []):
+            history[date_to_ordinal(entry["from"])] = (entry["from"], entry["price"])
+        ordinals = sorted(history)
+        items[product["name"]] = {
+            "sku": product["sku"], "name": product["name"], "ordinals": ordinals,
+            "dates": [history[ordinal][0] for ordinal in ordinals],
+            "prices": [history[ordinal][1] for ordinal in ordinals],
+        }
+        skus[product["sku"]] = product["name"]
+    return items, skus
+
+
+# ------------------- Katalog Barang -------------------
+class Catalog(Mapping):
+    """Katalog barang yang disimpan di berkas JSON, dibaca sebagai nama barang → harga sekarang.
+
+    Karena berbentuk Mapping, katalog bisa dipakai di mana pun daftar `PRODUCTS` dipakai
+    (`build_posting`, `build_receipt`, impor CSV, `Ledger`); `build_posting` memakai
+    `price_on` agar harga default mengikuti tanggal posting. Berkas dibaca ulang oleh
+    `refresh` hanya jika mtime/ukurannya berubah, jadi perubahan dari CLI atau proses lain
+    terlihat tanpa restart. Selama berkas belum ada, katalog berisi daftar barang bawaan;
+    berkas baru dibuat saat katalog pertama kali diubah. Indeks diganti utuh setiap kali
+    dimuat, sehingga pembaca di thread lain selalu melihat indeks lama atau baru, tidak
+    pernah setengah jadi.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG):
+        self.path = path
+        self.signature = None
+        self.loaded = False
+        self._items, self._skus = {}, {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    # Mapping: nama barang → harga yang berlaku hari ini
+    def __getitem__(self, name):
+        return self.price_on(name)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def refresh(self):
+        # Satu stat per panggilan; membaca katalog tidak pernah menulis berkas
+        signature = file_signature([self.path])[0]
+        if self.loaded and signature == self.signature:
+            return self
+        with self._lock:
+            signature = file_signature([self.path])[0]
+            if not self.loaded or signature != self.signature:
+                if signature is None:
+                    raw = default_catalog()
+                else:
+                    with open(self.path, encoding="utf-8") as f:
+                        raw = json.load(f)
+                self._items, self._skus = build_index(raw)
+                self.signature, self.loaded = signature, True
+        return self
+
+    def product(self, key):
+        """Data satu barang berdasarkan nama atau SKU; KeyError jika tidak ada."""
+        items = self._items
+        if key in items:
+            return items[key]
+        return items[self._skus[key]]
+
+    def price_on(self, name, day=None):
+        # Tanggal sebelum riwayat dimulai memakai harga paling awal
+        item = self.product(name)
+        ordinal = date.today().toordinal() if day is None else date_to_ordinal(day)
+        return item["prices"][max(bisect.bisect_right(item["ordinals"], ordinal) - 1, 0)]
+
+    def prices_on(self, day=None):
+        return {name: self.price_on(name, day) for name in self._items}
+
+    def history(self, key):
+        item = self.product(key)
+        return [{"from": start, "price": price} for start, price in zip(item["dates"], item["prices"])]
+
+    # ------------------- Perubahan -------------------
+    def _update(self, change):
+        # Berkas dibaca ulang di dalam kunci agar perubahan dari proses lain tidak tertimpa
+        with self._lock:
+            if file_signature([self.path])[0] is None:
+                raw = default_catalog()
+            else:
+                with open(self.path, encoding="utf-8") as f:
+                    raw = json.load(f)
+            result = change(raw)
+            _write_json_atomic(self.path, raw)
+            self._items, self._skus = build_index(raw)
+            self.signature, self.loaded = file_signature([self.path])[0], True
+        return result
+
+    def add_product(self, sku, name, price, effective=HISTORY_START):
+        sku, name = (sku or "").strip(), (name or "").strip()
+        if not sku or not name:
+            raise ValueError("SKU dan nama barang wajib diisi.")
+        _check_price(price)
+        effective = _effective(effective)
+
+        def change(raw):
+            for product in raw["products"]:
+                if product["sku"] == sku:
+                    raise ValueError(f"SKU {sku} sudah dipakai {product['name']}.")
+                if product["name"] == name:
+                    raise ValueError(f"Barang {name} sudah ada di katalog.")
+            raw["products"].append({"sku": sku, "name": name, "prices": [{"from": effective, "price": price}]})
+
+        self._update(change)
+
+    def set_price(self, key, price, effective):
+        """Catat harga baru yang berlaku mulai `effective`; harga pada tanggal yang sama diganti."""
+        _check_price(price)
+        effective = _effective(effective)
+
+        def change(raw):
+            for product in raw["products"]:
+                if key in (product["sku"], product["name"]):
+                    break
+            else:
+                raise ValueError(f"Barang tidak dikenal: {key!r}")
+            prices = [entry for entry in product["prices"] if _effective(entry["from"]) != effective]
+            prices.append({"from": effective, "price": price})
+            prices.sort(key=lambda entry: date_to_ordinal(entry["from"]))
+            product["prices"] = prices
+            return product["name"]
+
+        return self._update(change)
+
+
+def open_catalog(path=DEFAULT_CATALOG):
+    # Satu katalog per berkas per proses; setiap pembukaan memeriksa apakah berkas berubah
+    with _CATALOGS_LOCK:
+        if path not in _CATALOGS:
+            _CATALOGS[path] = Catalog(path)
+            return _CATALOGS[path]
+    return _CATALOGS[path].refresh()
+
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kelola katalog barang dan riwayat harga Dapur Kita")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG)
+    commands = parser.add_subparsers(dest="command", required=True)
+    listing = commands.add_parser("list", help="tampilkan barang beserta harga pada suatu tanggal")
+    listing.add_argument("--date", help="YYYY-MM-DD (default: hari ini)")
+    add = commands.add_parser("add", help="tambah barang baru")
+    add.add_argument("sku")
+    add.add_argument("name")
+    add.add_argument("price", type=float)
+    add.add_argument("--from", dest="effective", default=HISTORY_START, help="tanggal berlaku harga (YYYY-MM-DD)")
+    price = commands.add_parser("price", help="catat harga baru untuk barang (nama atau SKU)")
+    price.add_argument("product")
+    price.add_argument("price", type=float)
+    price.add_argument("--from", dest="effective", required=True, help="tanggal mulai berlaku (YYYY-MM-DD)")
+    history = commands.add_parser("history", help="riwayat harga satu barang (nama atau SKU)")
+    history.add_argument("product")
+    args = parser.parse_args(argv)
+
+    catalog = open_catalog(args.catalog)
+    value = getattr(args, "price", None)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    try:
+        if args.command == "list":
+            if args.date and not validate_date(args.date):
+                raise ValueError("Format tanggal tidak valid.")
+            for name in catalog:
+                print(f"{catalog.product(name)['sku']}\t{name}\t{catalog.price_on(name, args.date)}")
+        elif args.command == "add":
+            catalog.add_product(args.sku, args.name, value, args.effective)
+            print(f"{args.name} ditambahkan ke katalog.")
+        elif args.command == "price":
+            name = catalog.set_price(args.product, value, args.effective)
+            print(f"Harga {name} menjadi {value} mulai {args.effective}.")
+        else:
+            for entry in catalog.history(args.product):
+                print(f"{entry['from']}\t{entry['price']}")
+    except KeyError:
+        print(f"Barang tidak dikenal: {args.product!r}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
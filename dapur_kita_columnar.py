@@ -0,0 +1,280 @@
+import json
+import struct
+import zlib
+from datetime import date
+
+import numpy as np
+
+from dapur_kita_ledger import COLLECTIONS, TOTAL_COLLECTIONS, UNKNOWN_METHOD, date_to_ordinal, empty_totals
+
+# ------------------- Konstanta -------------------
+# Jenis kolom menurut nama field; field lain disimpan apa adanya sebagai objek
+DATE_FIELDS = ("date",)
+CODED_FIELDS = ("product", "type", "account", "payment_method", "description", "tx_id")
+NUMERIC_FIELDS = ("quantity", "price", "total", "amount", "debit", "credit")
+
+# Format biner: MAGIC, versi (u16), flag (u16), lalu isi yang bisa dikompresi zlib.
+# Isi = panjang header (u32) + header JSON + buffer kolom berurutan sesuai header.
+MAGIC = b"DKLB"
+FORMAT_VERSION = 1
+FLAG_ZLIB = 1
+PREFIX = struct.Struct("<4sHH")
+HEADER_LENGTH = struct.Struct("<I")
+
+
+# ------------------- Fungsi Utilitas -------------------
+def ordinal_to_date(value):
+    return date.fromordinal(int(value)).isoformat()
+
+
+# ------------------- Tabel Kolumnar -------------------
+class ColumnarTable:
+    """Satu koleksi sebagai kolom: angka dalam array bertipe, teks berulang sebagai kode
+    kamus, dan tanggal sebagai ordinal. Field yang tidak ada pada suatu baris ditandai
+    lewat `present` (kolom angka/tanggal) atau `None` di kamus/objek. Kolom angka yang
+    bercampur int dan float disimpan sebagai float, dengan `integral` menandai nilai int.
+    """
+
+    def __init__(self, length, fields, columns, dictionaries, present, integral=None):
+        self.length = length
+        self.fields = fields
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.present = present
+        self.integral = integral or {}
+
+    def __len__(self):
+        return self.length
+
+    @classmethod
+    def from_rows(cls, rows):
+        fields = []
+        for row in rows:
+            for key in row:
+                if key not in fields:
+                    fields.append(key)
+        columns, dictionaries, present, integral = {}, {}, {}, {}
+        for field in fields:
+            values = [row.get(field) for row in rows]
+            missing = [value is None for value in values]
+            if field in CODED_FIELDS:
+                dictionary, codes = {}, []
+                for value in values:
+                    codes.append(dictionary.setdefault(value, len(dictionary)))
+                dtype = np.int16 if len(dictionary) < 2 ** 15 else np.int32
+                columns[field] = np.array(codes, dtype=dtype)
+                dictionaries[field] = list(dictionary)
+                continue
+            if field in DATE_FIELDS:
+                columns[field] = np.array([0 if value is None else date_to_ordinal(value) for value in values], dtype=np.int32)
+            elif field in NUMERIC_FIELDS:
+                filled = [0 if value is None else value for value in values]
+                ints = [isinstance(value, int) for value in filled]
+                is_int = all(ints)
+                columns[field] = np.array(filled, dtype=np.int64 if is_int else np.float64)
+                if not is_int and any(ints):
+                    integral[field] = np.array(ints, dtype=bool)
+            else:
+                columns[field] = np.array(values, dtype=object)
+                continue
+            if any(missing):
+                present[field] = ~np.array(missing, dtype=bool)
+        return cls(len(rows), fields, columns, dictionaries, present, integral)
+
+    def decoded(self, field):
+        # Kolom kode dikembalikan ke nilai aslinya, tetap tanpa membuat dict per baris
+        return np.array(self.dictionaries[field], dtype=object)[self.columns[field]]
+
+    def to_rows(self):
+        lists, sparse = {}, False
+        for field in self.fields:
+            if field in self.dictionaries:
+                lists[field] = self.decoded(field).tolist()
+                sparse = sparse or None in self.dictionaries[field]
+            elif field in DATE_FIELDS:
+                # Tanggal diubah per nilai unik saja, lalu disebar kembali
+                unique, inverse = np.unique(self.columns[field], return_inverse=True)
+                lists[field] = np.array([ordinal_to_date(value) for value in unique], dtype=object)[inverse].tolist()
+            else:
+                lists[field] = self.columns[field].tolist()
+                if field in self.integral:
+                    lists[field] = [
+                        int(value) if is_int else value
+                        for value, is_int in zip(lists[field], self.integral[field].tolist())
+                    ]
+                sparse = sparse or (self.columns[field].dtype == object and None in lists[field])
+            if field in self.present:
+                sparse = True
+                mask = self.present[field].tolist()
+                lists[field] = [value if keep else None for value, keep in zip(lists[field], mask)]
+        if not sparse:
+            # Semua baris punya semua field: cukup zip tanpa memeriksa None per nilai
+            return [dict(zip(self.fields, values)) for values in zip(*(lists[field] for field in self.fields))]
+        rows = []
+        for i in range(self.length):
+            row = {}
+            for field in self.fields:
+                value = lists[field][i]
+                if value is not None:
+                    row[field] = value
+            rows.append(row)
+        return rows
+
+    def sum(self, field):
+        if field not in self.columns:
+            return 0
+        values = self.columns[field]
+        if field in self.present:
+            values = values[self.present[field]]
+        return values.sum().item()
+
+    def sum_by(self, field, key):
+        # Penjumlahan per kode dengan bincount, lalu dipetakan kembali ke nama di kamus
+        if key not in self.columns or field not in self.columns:
+            return {}
+        sums = np.bincount(self.columns[key], weights=self.columns[field], minlength=len(self.dictionaries[key]))
+        counts = np.bincount(self.columns[key], minlength=len(self.dictionaries[key]))
+        integral = self.columns[field].dtype.kind == "i"
+        return {
+            name: int(total) if integral else float(total)
+            for name, total, count in zip(self.dictionaries[key], sums, counts)
+            if count
+        }
+
+    @property
+    def nbytes(self):
+        total = sum(column.nbytes for column in self.columns.values())
+        total += sum(mask.nbytes for mask in self.integral.values())
+        return total + sum(mask.nbytes for mask in self.present.values())
+
+
+# ------------------- Buku Besar Kolumnar -------------------
+class ColumnarLedger:
+    def __init__(self, tables, extra=None):
+        self.tables = tables
+        self.extra = extra or {}
+
+    @classmethod
+    def from_data(cls, data):
+        tables = {name: ColumnarTable.from_rows(data[name]) for name in COLLECTIONS}
+        extra = {key: value for key, value in data.items() if key not in COLLECTIONS and not key.startswith("_")}
+        return cls(tables, extra)
+
+    def to_data(self):
+        data = {name: self.tables[name].to_rows() for name in COLLECTIONS}
+        data.update(self.extra)
+        return data
+
+    def totals(self):
+        totals = empty_totals()
+        for name in TOTAL_COLLECTIONS:
+            table = self.tables[name]
+            by_method = table.sum_by("total", "payment_method") if "payment_method" in table.columns else (
+                {UNKNOWN_METHOD: table.sum("total")} if len(table) else {}
+            )
+            totals[name] = {
+                "total": table.sum("total"),
+                "by_product": table.sum_by("total", "product"),
+                "by_method": {UNKNOWN_METHOD if method is None else method: total for method, total in by_method.items()},
+            }
+        return totals
+
+    @property
+    def nbytes(self):
+        return sum(table.nbytes for table in self.tables.values())
+
+
+# ------------------- Format Biner -------------------
+def _add_buffer(buffers, offset, array):
+    data = np.ascontiguousarray(array).tobytes()
+    buffers.append(data)
+    return {"dtype": array.dtype.str, "offset": offset, "nbytes": len(data)}, offset + len(data)
+
+
+def pack_ledger(data, compress=True, level=6):
+    """Data buku besar sebagai bytes: kolom bertipe dan satu tabel string bersama.
+
+    Semua nilai teks berkode (barang, akun, metode, keterangan, tx_id) dari semua koleksi
+    masuk ke satu tabel string; kolomnya hanya menyimpan indeks int32. Struktur turunan
+    dan kunci lain yang tidak diawali "_" disimpan sebagai JSON di header.
+    """
+    ledger = ColumnarLedger.from_data(data)
+    strings, buffers, offset = {}, [], 0
+    tables = {}
+    for name in COLLECTIONS:
+        table = ledger.tables[name]
+        spec = {"length": table.length, "fields": table.fields, "columns": {}}
+        for field in table.fields:
+            column = table.columns[field]
+            if field in table.dictionaries:
+                mapping = np.array([strings.setdefault(value, len(strings)) for value in table.dictionaries[field]] or [0], dtype=np.int32)
+                info, offset = _add_buffer(buffers, offset, mapping[column])
+                info["kind"] = "code"
+            elif column.dtype == object:
+                info = {"kind": "json", "values": column.tolist()}
+            else:
+                info, offset = _add_buffer(buffers, offset, column)
+                info["kind"] = "date" if field in DATE_FIELDS else "number"
+            for key, masks in (("present", table.present), ("integral", table.integral)):
+                if field in masks:
+                    info[key], offset = _add_buffer(buffers, offset, masks[field])
+            spec["columns"][field] = info
+        tables[name] = spec
+    header = json.dumps({"strings": list(strings), "tables": tables, "extra": ledger.extra}, separators=(",", ":")).encode()
+    body = HEADER_LENGTH.pack(len(header)) + header + b"".join(buffers)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, level)
+        flags |= FLAG_ZLIB
+    return PREFIX.pack(MAGIC, FORMAT_VERSION, flags) + body
+
+
+def is_packed(prefix):
+    return prefix[:len(MAGIC)] == MAGIC
+
+
+def _unpack_header(blob):
+    magic, version, flags = PREFIX.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Bukan berkas buku besar biner Dapur Kita.")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Versi format {version} lebih baru dari yang didukung ({FORMAT_VERSION}).")
+    body = memoryview(blob)[PREFIX.size:]
+    if flags & FLAG_ZLIB:
+        body = memoryview(zlib.decompress(body))
+    (length,) = HEADER_LENGTH.unpack_from(body)
+    header = json.loads(bytes(body[HEADER_LENGTH.size:HEADER_LENGTH.size + length]))
+    return header, body[HEADER_LENGTH.size + length:]
+
+
+def unpack_extra(blob):
+    # Hanya header: struktur turunan dan kunci lain, tanpa membangun baris
+    return _unpack_header(blob)[0]["extra"]
+
+
+def unpack_ledger(blob):
+    header, buffers = _unpack_header(blob)
+
+    def read(info):
+        view = buffers[info["offset"]:info["offset"] + info["nbytes"]]
+        return np.frombuffer(view, dtype=np.dtype(info["dtype"]))
+
+    strings = header["strings"]
+    tables = {}
+    for name in COLLECTIONS:
+        spec = header["tables"][name]
+        columns, dictionaries, present, integral = {}, {}, {}, {}
+        for field, info in spec["columns"].items():
+            if info["kind"] == "code":
+                columns[field] = read(info)
+                dictionaries[field] = strings
+            elif info["kind"] == "json":
+                columns[field] = np.array(info["values"], dtype=object)
+            else:
+                columns[field] = read(info)
+            if "present" in info:
+                present[field] = read(info["present"])
+            if "integral" in info:
+                integral[field] = read(info["integral"])
+        tables[name] = ColumnarTable(spec["length"], spec["fields"], columns, dictionaries, present, integral)
+    return ColumnarLedger(tables, header["extra"]).to_data()
@@ -0,0 +1,257 @@
+import argparse
+import json
+import sys
+import time
+
+from dapur_kita_ledger import (
+    POSTING_KINDS, TOMBSTONE_DAYS, build_posting, cost_of_goods_sold, date_to_ordinal, get_links, get_totals,
+    merge_rows, stock_report, tombstone_cutoff
+)
+from dapur_kita_catalog import DEFAULT_CATALOG, open_catalog
+from dapur_kita_store import open_ledger, open_store
+
+# ------------------- Konstanta -------------------
+DEFAULT_DATA = "dapur_kita_data.json"
+DEFAULT_MODE = "wal"
+CHUNK_SIZE = 1000
+
+
+# ------------------- Fungsi Utilitas -------------------
+def posting_rows(posting, products=None):
+    # Posting berupa dict dengan kolom yang sama seperti impor CSV, ditambah tx_id opsional;
+    # tanpa `products` barang dan harga default diambil dari katalog bawaan
+    return build_posting(
+        posting.get("kind"), posting.get("date"), posting.get("product"), posting.get("quantity"),
+        posting.get("payment_method"), posting.get("price"), posting.get("tx_id"),
+        open_catalog() if products is None else products
+    )
+
+
+def _tx_id(rows):
+    return rows["transactions"][0]["tx_id"]
+
+
+def _date(rows):
+    return rows["transactions"][0]["date"]
+
+
+# ------------------- Buku Besar Tanpa UI -------------------
+class Ledger:
+    """Buku besar Dapur Kita untuk skrip, integrasi dan uji beban, tanpa Streamlit.
+
+    Memakai store dan penulis bersama yang sama dengan aplikasi, sehingga posting dari
+    sini melewati validasi, pemeriksaan tutup buku dan penggabungan penulisan yang sama.
+    Posting banyak transaksi dikirim sebagai satu record urut tanggal, sehingga stok barang
+    yang tanggalnya mundur cukup dihitung ulang sekali per panggilan `post`. Tanpa
+    `products`, barang dan harga default mengikuti katalog bawaan yang dibaca ulang saat
+    berkasnya berubah.
+    """
+
+    def __init__(self, path=DEFAULT_DATA, mode=DEFAULT_MODE, products=None, **options):
+        self.store = open_store(mode, path, **options)
+        self.shared = open_ledger(self.store)
+        self._products = products
+
+    @property
+    def products(self):
+        return open_catalog() if self._products is None else self._products
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.shared.close()
+
+    def read(self):
+        return self.shared.read()
+
+    def summary(self):
+        return self.shared.summary()
+
+    def purchase(self, date, product, quantity, method="Tunai", price=None, tx_id=None):
+        rows = build_posting("pembelian", date, product, quantity, method, price, tx_id, self.products)
+        self.shared.post(rows)
+        return _tx_id(rows)
+
+    def sale(self, date, product, quantity, method="Tunai", price=None, tx_id=None):
+        rows = build_posting("penjualan", date, product, quantity, method, price, tx_id, self.products)
+        self.shared.post(rows)
+        return _tx_id(rows)
+
+    def post(self, postings, atomic=False):
+        """Posting banyak transaksi sekaligus; hasilnya (daftar tx_id, daftar (indeks, pesan)).
+
+        Dengan `atomic=True` semua posting divalidasi dulu lalu disimpan sebagai satu
+        record: satu saja yang tidak valid membuat tidak ada yang tersimpan, dan penolakan
+        dari penulis (misalnya periode tertutup) dilempar sebagai ValueError. Tanpa itu,
+        posting yang gagal dilaporkan per indeks dan posting lain tetap tersimpan: semua
+        posting tetap dikirim sebagai satu record, dan hanya jika penulis menolaknya setiap
+        posting dikirim sendiri agar yang ditolak hanya posting yang bermasalah.
+        """
+        tx_ids, errors, futures, built = [], [], [], []
+        products = self.products
+        for index, posting in enumerate(postings):
+            try:
+                built.append((index, posting_rows(posting, products)))
+            except ValueError as error:
+                errors.append((index, str(error)))
+        if atomic:
+            if errors or not built:
+                return [], errors
+            rows = {}
+            for _, items in built:
+                merge_rows(rows, items)
+            self.shared.post(rows)
+            return [_tx_id(items) for _, items in built], errors
+        # Urut tanggal (stabil) agar baris sebanyak mungkin masuk di ujung stok barangnya
+        built.sort(key=lambda item: date_to_ordinal(_date(item[1])))
+        if len(built) > 1:
+            rows = {}
+            for _, items in built:
+                merge_rows(rows, items)
+            try:
+                self.shared.post(rows)
+            except ValueError:
+                pass
+            else:
+                return [_tx_id(items) for _, items in sorted(built, key=lambda item: item[0])], errors
+        for index, rows in built:
+            futures.append((index, _tx_id(rows), self.shared.submit({"op": "post", "rows": rows})))
+        for index, tx_id, future in futures:
+            try:
+                future.result()
+                tx_ids.append(tx_id)
+            except ValueError as error:
+                errors.append((index, str(error)))
+        errors.sort()
+        return tx_ids, errors
+
+    def _transaction_op(self, op, tx_id, **fields):
+        data = self.shared.read()
+        positions = get_links(data).get(tx_id, {}).get("transactions")
+        if not positions:
+            raise ValueError(f"Transaksi {tx_id} tidak ditemukan.")
+        # Tanpa kunci baris dari `fetch`; penulis mencari barisnya lewat tx_id
+        return self.shared.submit(dict(fields, op=op, position=None, expect=data["transactions"][positions[0]])).result()
+
+    def delete(self, tx_id):
+        return self._transaction_op("delete_transaction", tx_id)
+
+    def void(self, tx_id, reason):
+        # Baris ditandai batal dan bisa dipulihkan sampai dibuang oleh `purge_tombstones`
+        return self._transaction_op("void_transaction", tx_id, reason=reason)
+
+    def restore(self, tx_id):
+        return self._transaction_op("restore_transaction", tx_id)
+
+    def purge_tombstones(self, days=TOMBSTONE_DAYS):
+        return self.shared.purge_tombstones(tombstone_cutoff(days))
+
+    def close_period(self, period):
+        return self.shared.submit({"op": "close_period", "period": period}).result()
+
+    def totals(self):
+        return get_totals(self.summary())
+
+    def stock(self, method="fifo"):
+        return stock_report(self.summary(), method)
+
+    def cost_of_goods_sold(self, method="fifo"):
+        return cost_of_goods_sold(self.summary(), method)
+
+
+# ------------------- CLI -------------------
+def read_postings(file, chunk_size=CHUNK_SIZE):
+    # Satu objek JSON per baris, dibaca bertahap; baris kosong dilewati
+    chunk = []
+    for line_num, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            chunk.append((line_num, json.loads(line)))
+        except ValueError:
+            chunk.append((line_num, None))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _post_batch(ledger, file, atomic, chunk_size):
+    # Mode atomik mengumpulkan semua baris dulu; selain itu posting dikirim per potongan
+    count, errors = 0, []
+    chunks = read_postings(file, chunk_size)
+    if atomic:
+        chunks = [[item for chunk in chunks for item in chunk]]
+    for chunk in chunks:
+        errors += [(line, "Bukan objek JSON.") for line, posting in chunk if not isinstance(posting, dict)]
+        postings = [(line, posting) for line, posting in chunk if isinstance(posting, dict)]
+        if atomic and errors:
+            return 0, errors
+        tx_ids, failed = ledger.post([posting for _, posting in postings], atomic)
+        count += len(tx_ids)
+        errors += [(postings[index][0], message) for index, message in failed]
+    return count, sorted(errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Posting ke buku besar Dapur Kita tanpa aplikasi Streamlit")
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument("--mode", default=DEFAULT_MODE, choices=("json", "wal", "sqlite"))
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="katalog barang untuk harga default")
+    commands = parser.add_subparsers(dest="command", required=True)
+    post = commands.add_parser("post", help="posting satu pembelian atau penjualan")
+    post.add_argument("kind", choices=list(POSTING_KINDS))
+    post.add_argument("date", help="YYYY-MM-DD")
+    post.add_argument("product")
+    post.add_argument("quantity", type=int)
+    post.add_argument("--method", default="Tunai", help="metode pembayaran (default: Tunai)")
+    post.add_argument("--price", type=float, help="harga per barang (default: harga katalog pada tanggal posting)")
+    batch = commands.add_parser("batch", help="posting dari berkas JSON Lines (- untuk stdin)")
+    batch.add_argument("file")
+    batch.add_argument("--atomic", action="store_true", help="simpan semua posting sebagai satu record, atau tidak sama sekali")
+    batch.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    batch.add_argument("--compact-every", type=int, help="mode wal: lipat log ke snapshot setiap N record")
+    args = parser.parse_args(argv)
+
+    # Impor besar lewat mode wal lebih cepat jika log jarang dilipat ke snapshot
+    compact_every = args.command == "batch" and args.mode == "wal" and args.compact_every
+    options = {"compact_every": compact_every} if compact_every else {}
+    ledger = Ledger(args.data, args.mode, open_catalog(args.catalog), **options)
+    try:
+        if args.command == "post":
+            price = int(args.price) if args.price is not None and args.price.is_integer() else args.price
+            try:
+                tx_id = ledger.purchase(args.date, args.product, args.quantity, args.method, price) if args.kind == "pembelian" \
+                    else ledger.sale(args.date, args.product, args.quantity, args.method, price)
+            except ValueError as error:
+                print(error, file=sys.stderr)
+                return 1
+            print(tx_id)
+            return 0
+
+        start = time.perf_counter()
+        try:
+            if args.file == "-":
+                count, errors = _post_batch(ledger, sys.stdin, args.atomic, args.chunk_size)
+            else:
+                with open(args.file, encoding="utf-8") as f:
+                    count, errors = _post_batch(ledger, f, args.atomic, args.chunk_size)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 1
+        elapsed = time.perf_counter() - start
+    finally:
+        ledger.close()
+    for line, message in errors:
+        print(f"baris {line}: {message}", file=sys.stderr)
+    print(f"{count} posting disimpan dalam {elapsed:.2f} detik ({count / elapsed if elapsed else 0:,.0f} posting/detik).")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import argparse
+import csv
+import io
+import sys
+from datetime import date
+
+from dapur_kita_archive import iter_archived_rows
+from dapur_kita_ledger import CLOSING_KEY, COLLECTIONS, date_to_ordinal, validate_date
+from dapur_kita_store import INDEXED_FIELDS, open_store
+
+# ------------------- Konstanta -------------------
+# Kolom per koleksi, urut seperti yang biasa dibaca akuntan; field lain tidak diekspor
+EXPORT_FIELDS = {
+    "journal_entries": ("date", "account", "description", "debit", "credit", "tx_id"),
+    "transactions": ("date", "type", "description", "amount", "payment_method", "tx_id"),
+    "sales": ("date", "product", "quantity", "price", "total", "payment_method", "tx_id"),
+    "inventory": ("date", "product", "quantity", "price", "total", "payment_method", "tx_id"),
+}
+INTEGER_FIELDS = ("quantity",)
+AMOUNT_FIELDS = ("debit", "credit", "amount", "price", "total")
+FORMATS = ("csv", "parquet")
+CHUNK_SIZE = 5000
+
+
+# ------------------- Pembacaan Bertahap -------------------
+def iter_chunks(store, data, collection, date_from=None, date_to=None, account=None, product=None,
+                chunk_size=CHUNK_SIZE):
+    """Baris koleksi yang cocok dengan filter, per potongan paling banyak `chunk_size` baris.
+
+    Baris periode tertutup dibaca dari partisi arsip lebih dulu (satu partisi per langkah),
+    lalu baris aktif lewat `store.iter_rows`. Filter akun/barang yang tidak berlaku untuk
+    koleksi menghasilkan nol baris, sama seperti tabel di aplikasi.
+    """
+    filters = {"account": account, "product": product}
+    fields = INDEXED_FIELDS[collection]
+    if any(value and name not in fields for name, value in filters.items()):
+        return
+    closed = data.get(CLOSING_KEY)
+    if closed and closed["partitions"] and (
+        not date_from or date_to_ordinal(date_from) <= date_to_ordinal(closed["through"])
+    ):
+        match = {fields[name]: value for name, value in filters.items() if value}
+        for rows in iter_archived_rows(store.archive_dir, closed, collection, date_from, date_to, **match):
+            for start in range(0, len(rows), chunk_size):
+                yield rows[start:start + chunk_size]
+    yield from store.iter_rows(data, collection, chunk_size, date_from=date_from, date_to=date_to, **filters)
+
+
+# ------------------- Penulis Berkas -------------------
+def write_csv(chunks, file, collection):
+    writer = csv.DictWriter(file, EXPORT_FIELDS[collection], extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        count += len(chunk)
+    return count
+
+
+def _arrow_schema(pa, collection):
+    types = {name: pa.float64() for name in AMOUNT_FIELDS}
+    types.update({name: pa.int64() for name in INTEGER_FIELDS})
+    types["date"] = pa.date32()
+    return pa.schema([(name, types.get(name, pa.string())) for name in EXPORT_FIELDS[collection]])
+
+
+def write_parquet(chunks, file, collection):
+    # Setiap potongan menjadi satu row group, jadi memori hanya sebesar satu potongan
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Ekspor parquet membutuhkan paket pyarrow.")
+
+    schema = _arrow_schema(pa, collection)
+    count = 0
+    with pq.ParquetWriter(file, schema) as writer:
+        for chunk in chunks:
+            columns = {}
+            for name in schema.names:
+                values = [row.get(name) for row in chunk]
+                if name == "date":
+                    values = [date.fromordinal(date_to_ordinal(value)) for value in values]
+                columns[name] = values
+            writer.write_table(pa.table(columns, schema=schema))
+            count += len(chunk)
+    return count
+
+
+def export(store, data, collection, file, fmt="csv", chunk_size=CHUNK_SIZE, **filters):
+    """Tulis satu koleksi ke `file` (objek berkas biner atau path) dan kembalikan jumlah barisnya."""
+    if collection not in COLLECTIONS:
+        raise ValueError(f"Koleksi tidak dikenal: {collection}")
+    for key in ("date_from", "date_to"):
+        if filters.get(key) and not validate_date(filters[key]):
+            raise ValueError("Format tanggal filter tidak valid.")
+    chunks = iter_chunks(store, data, collection, chunk_size=chunk_size, **filters)
+    if fmt == "parquet":
+        return write_parquet(chunks, file, collection)
+    if fmt != "csv":
+        raise ValueError(f"Format tidak dikenal: {fmt}")
+    if isinstance(file, str):
+        with open(file, "w", newline="", encoding="utf-8") as f:
+            return write_csv(chunks, f, collection)
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    try:
+        return write_csv(chunks, text, collection)
+    finally:
+        text.flush()
+        text.detach()
+
+
+def export_filename(collection, fmt, date_from=None, date_to=None):
+    period = "_".join(value for value in (date_from, date_to) if value)
+    return f"dapur_kita_{collection}{'_' + period if period else ''}.{fmt}"
+
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ekspor jurnal, transaksi, penjualan atau persediaan Dapur Kita")
+    parser.add_argument("collection", choices=COLLECTIONS)
+    parser.add_argument("--data", default="dapur_kita_data.json")
+    parser.add_argument("--mode", default="wal", choices=("json", "wal", "sqlite"))
+    parser.add_argument("--from", dest="date_from", help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", help="YYYY-MM-DD")
+    parser.add_argument("--account", help="hanya untuk journal_entries")
+    parser.add_argument("--product")
+    parser.add_argument("--format", default="csv", choices=FORMATS)
+    parser.add_argument("--output", help="berkas tujuan (default: nama otomatis; - untuk stdout pada CSV)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    store = open_store(args.mode, args.data)
+    # SQLite membaca baris langsung dari database, jadi ringkasan sudah cukup
+    data = store.load_summary() if store.partial_reads else store.load()
+    output = args.output or export_filename(args.collection, args.format, args.date_from, args.date_to)
+    if output == "-" and args.format != "csv":
+        print("Keluaran ke stdout hanya untuk CSV.", file=sys.stderr)
+        return 1
+    filters = {"date_from": args.date_from, "date_to": args.date_to, "account": args.account, "product": args.product}
+    try:
+        count = export(store, data, args.collection, sys.stdout.buffer if output == "-" else output,
+                       args.format, args.chunk_size, **filters)
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    if output != "-":
+        print(f"{count} baris {args.collection} diekspor ke {output}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+import argparse
+import csv
+import sys
+
+from dapur_kita_catalog import DEFAULT_CATALOG, open_catalog
+from dapur_kita_ledger import build_posting, merge_rows
+
+# ------------------- Konstanta -------------------
+REQUIRED_FIELDS = ("kind", "date", "product", "quantity", "payment_method")
+CHUNK_SIZE = 1000
+
+
+# ------------------- Fungsi Utilitas -------------------
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    # Baris CSV dibaca bertahap sehingga berkas besar tidak dimuat sekaligus
+    reader = csv.DictReader(file)
+    missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ada: {', '.join(missing)}")
+    chunk = []
+    for record in reader:
+        chunk.append((reader.line_num, record))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_record(record, products=None):
+    # Teks CSV diubah ke tipe aslinya; validasi dan pembentukan baris ada di build_posting.
+    # Tanpa `products`, harga dan nama barang diambil dari katalog bawaan
+    products = open_catalog() if products is None else products
+    try:
+        quantity = int(record.get("quantity") or "")
+    except ValueError:
+        raise ValueError("Jumlah barang harus bilangan bulat.")
+    price = None
+    if (record.get("price") or "").strip():
+        try:
+            price = float(record["price"])
+        except ValueError:
+            raise ValueError("Harga harus berupa angka.")
+        if price.is_integer():
+            price = int(price)
+    return build_posting(
+        (record.get("kind") or "").strip().lower(), (record.get("date") or "").strip(),
+        (record.get("product") or "").strip(), quantity, (record.get("payment_method") or "").strip(),
+        price, products=products
+    )
+
+
+def import_postings(file, products=None, chunk_size=CHUNK_SIZE, on_chunk=None):
+    # Semua posting yang valid digabung agar bisa disimpan dalam satu kali tulis
+    products = open_catalog() if products is None else products
+    rows, errors, count = {}, [], 0
+    for chunk in read_chunks(file, chunk_size):
+        for line, record in chunk:
+            try:
+                merge_rows(rows, parse_record(record, products))
+                count += 1
+            except ValueError as error:
+                errors.append((line, str(error)))
+        if on_chunk:
+            on_chunk(count, len(errors))
+    return rows, count, errors
+
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    from dapur_kita_store import open_ledger, open_store
+
+    parser = argparse.ArgumentParser(description="Impor pembelian/penjualan dari CSV ke buku besar Dapur Kita")
+    parser.add_argument("csv_file")
+    parser.add_argument("--data", default="dapur_kita_data.json")
+    parser.add_argument("--mode", default="wal", choices=("json", "wal", "sqlite"))
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG, help="katalog barang untuk harga default")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--skip-errors", action="store_true", help="impor baris yang valid walaupun ada baris bermasalah")
+    parser.add_argument("--dry-run", action="store_true", help="hanya validasi, tanpa menyimpan")
+    args = parser.parse_args(argv)
+
+    with open(args.csv_file, newline="", encoding="utf-8-sig") as f:
+        rows, count, errors = import_postings(f, open_catalog(args.catalog), args.chunk_size)
+    for line, message in errors:
+        print(f"baris {line}: {message}", file=sys.stderr)
+    if errors and not args.skip_errors:
+        print(f"{len(errors)} baris bermasalah, tidak ada data yang diimpor.", file=sys.stderr)
+        return 1
+    if args.dry_run or not count:
+        print(f"{count} transaksi valid, tidak ada yang disimpan.")
+        return 0
+    open_ledger(open_store(args.mode, args.data)).post(rows)
+    print(f"{count} transaksi berhasil diimpor.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from dapur_kita_ledger import CLOSING_KEY, COLLECTIONS, TOTAL_COLLECTIONS, VOID_KEY, get_date_index, get_links
+
+# ------------------- Konstanta -------------------
+# Urutan dan keterangan pemeriksaan; kode ini juga kolom pertama setiap temuan
+CHECKS = {
+    "posting": "debit dan kredit jurnal satu posting tidak sama",
+    "tanggal": "debit dan kredit jurnal satu tanggal tidak sama",
+    "tautan": "transaksi tanpa baris persediaan/penjualan atau jurnal yang cocok",
+    "yatim": "baris persediaan/penjualan atau jurnal tanpa transaksi",
+    "total": "total tidak sama dengan jumlah × harga",
+}
+TOLERANCE = 1e-6
+# Baris tanpa tx_id (data lama) hanya ikut pemeriksaan per tanggal dan total
+NO_TX = None
+
+
+# ------------------- Kolom -------------------
+def _codes(rows, field, index):
+    # Nilai teks dijadikan kode bilangan bulat lewat kamus bersama, sekali jalan per baris
+    return np.fromiter((index.setdefault(row.get(field), len(index)) for row in rows), dtype=np.int64, count=len(rows))
+
+
+def _numbers(rows, field):
+    return np.fromiter((row.get(field) or 0 for row in rows), dtype=np.float64, count=len(rows))
+
+
+def _returned(rows):
+    return np.fromiter(
+        (row.get("payment_method", "").startswith("Retur") for row in rows), dtype=bool, count=len(rows)
+    )
+
+
+def _uneven(values, scale):
+    # Selisih dibandingkan dengan besar nilainya agar pembulatan float tidak ikut dilaporkan
+    return np.flatnonzero(np.abs(values) > TOLERANCE * np.maximum(1, np.abs(scale)))
+
+
+# ------------------- Pemeriksaan -------------------
+def check_ledger(data):
+    """Periksa keutuhan buku besar dalam satu pindaian per koleksi.
+
+    Setiap kolom yang dibutuhkan dibaca sekali ke array numpy; tx_id dan tanggal dijadikan
+    kode lewat kamus, lalu jumlah per posting, per tanggal dan per transaksi dihitung dengan
+    bincount. Baris yang dibatalkan dilewati. Hasilnya daftar (pemeriksaan, kunci, pesan)
+    terurut menurut `CHECKS`; daftar kosong berarti buku besar utuh.
+    """
+    rows = {name: [row for row in data.get(name, ()) if VOID_KEY not in row] for name in COLLECTIONS}
+    tx_index = {NO_TX: 0}
+    tx = {name: _codes(rows[name], "tx_id", tx_index) for name in COLLECTIONS}
+    tx_ids = list(tx_index)
+    size = len(tx_ids)
+    issues = []
+
+    journal = rows["journal_entries"]
+    debit, credit = _numbers(journal, "debit"), _numbers(journal, "credit")
+    net, gross = debit - credit, np.abs(debit) + np.abs(credit)
+    by_tx = np.bincount(tx["journal_entries"], weights=net, minlength=size)
+    for code in _uneven(by_tx, np.bincount(tx["journal_entries"], weights=gross, minlength=size)):
+        if code:
+            issues.append(("posting", tx_ids[code], f"selisih debit - kredit {by_tx[code]:,.2f}"))
+    date_index = {}
+    dates = _codes(journal, "date", date_index)
+    by_date = np.bincount(dates, weights=net, minlength=len(date_index))
+    days = list(date_index)
+    for code in _uneven(by_date, np.bincount(dates, weights=gross, minlength=len(date_index))):
+        issues.append(("tanggal", days[code], f"selisih debit - kredit {by_date[code]:,.2f}"))
+
+    # Satu transaksi = satu baris persediaan/penjualan dengan total yang sama + baris jurnal
+    goods_tx = np.concatenate([tx[name] for name in TOTAL_COLLECTIONS])
+    goods_total = np.concatenate([_numbers(rows[name], "total") for name in TOTAL_COLLECTIONS])
+    tx_count = np.bincount(tx["transactions"], minlength=size)
+    goods_count = np.bincount(goods_tx, minlength=size)
+    journal_count = np.bincount(tx["journal_entries"], minlength=size)
+    amount = np.bincount(tx["transactions"], weights=_numbers(rows["transactions"], "amount"), minlength=size)
+    goods_sum = np.bincount(goods_tx, weights=goods_total, minlength=size)
+    linked = tx_count > 0
+    linked[0] = False
+    for code in np.flatnonzero(linked & ((tx_count > 1) | (goods_count != 1) | (journal_count == 0))):
+        issues.append(("tautan", tx_ids[code], (
+            f"{tx_count[code]} transaksi, {goods_count[code]} baris persediaan/penjualan, "
+            f"{journal_count[code]} baris jurnal"
+        )))
+    mismatch = np.zeros(size, dtype=bool)
+    mismatch[_uneven(amount - goods_sum, amount)] = True
+    for code in np.flatnonzero(linked & (goods_count == 1) & mismatch):
+        issues.append(("tautan", tx_ids[code], f"jumlah transaksi {amount[code]:,.2f} ≠ total barang {goods_sum[code]:,.2f}"))
+    orphan = ~linked & ((goods_count > 0) | (journal_count > 0))
+    orphan[0] = False
+    for code in np.flatnonzero(orphan):
+        issues.append(("yatim", tx_ids[code], f"{goods_count[code]} baris persediaan/penjualan, {journal_count[code]} baris jurnal"))
+
+    for name in TOTAL_COLLECTIONS:
+        items = rows[name]
+        expected = _numbers(items, "quantity") * _numbers(items, "price") * np.where(_returned(items), -1, 1)
+        for i in _uneven(_numbers(items, "total") - expected, expected):
+            key = items[i].get("tx_id") or f"{name}:{items[i].get('date')}:{items[i].get('product')}"
+            issues.append(("total", key, f"{name} total {items[i]['total']:,.2f} ≠ {expected[i]:,.2f}"))
+
+    order = list(CHECKS)
+    issues.sort(key=lambda issue: order.index(issue[0]))
+    return issues
+
+
+def check_posting(rows):
+    # Pemeriksaan yang sama untuk baris satu posting sebelum disimpan
+    return check_ledger({name: rows.get(name, []) for name in COLLECTIONS})
+
+
+def check_change(data, record):
+    """Periksa posting yang tersentuh record "void", "restore" atau "delete" sebelum diterapkan.
+
+    Untuk setiap tx_id dari baris yang berubah, baris aktif posting itu sesudah perubahan
+    diperiksa seperti `check_posting`; posting yang batal seluruhnya tidak punya baris aktif
+    dan lolos. Baris jurnal lama tanpa tx_id diperiksa lewat keseimbangan tanggalnya.
+    """
+    restore = record["op"] == "restore"
+    changed = record["restored"] if restore else record["removed"]
+    positions = {name: set(items) for name, items in record["rows"].items()}
+    tx_ids, days = set(), set()
+    for name, rows in changed.items():
+        for row in rows:
+            # Tombstone yang dihapus (misalnya oleh pemadatan) tidak mengubah baris aktif
+            if record["op"] == "delete" and VOID_KEY in row:
+                continue
+            if "tx_id" in row:
+                tx_ids.add(row["tx_id"])
+            elif name == "journal_entries":
+                days.add(row["date"])
+
+    def after(name, items):
+        # Baris yang dipulihkan dihitung tanpa tanda batal; yang dibatalkan/dihapus dilewati
+        rows = data[name]
+        if restore:
+            return [
+                {key: value for key, value in rows[i].items() if key != VOID_KEY} if i in positions.get(name, ()) else rows[i]
+                for i in items
+            ]
+        return [rows[i] for i in items if i not in positions.get(name, ())]
+
+    links = get_links(data)
+    postings = {name: [] for name in COLLECTIONS}
+    for tx_id in tx_ids:
+        for name, items in links.get(tx_id, {}).items():
+            postings[name] += after(name, items)
+    issues = check_ledger(postings)
+    if days:
+        index = get_date_index(data, "journal_entries")
+        entries = after("journal_entries", sorted({i for day in days for i in index.positions_between(day, day)}))
+        dated = check_ledger(dict({name: [] for name in COLLECTIONS}, journal_entries=entries))
+        issues += [issue for issue in dated if issue[0] == "tanggal"]
+    return issues
+
+
+def posting_error(issues, subject="Posting"):
+    check, key, message = issues[0]
+    more = f" (dan {len(issues) - 1} temuan lain)" if len(issues) > 1 else ""
+    return f"{subject} ditolak, {CHECKS[check]}: {message}{more}."
+
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    from dapur_kita_archive import load_partition, partition_paths
+    from dapur_kita_store import open_store
+
+    parser = argparse.ArgumentParser(description="Periksa keseimbangan jurnal dan keutuhan antarkoleksi buku besar Dapur Kita")
+    parser.add_argument("--data", default="dapur_kita_data.json")
+    parser.add_argument("--mode", default="wal", choices=("json", "wal", "sqlite"))
+    parser.add_argument("--archive", action="store_true", help="periksa juga partisi periode yang sudah ditutup")
+    parser.add_argument("--limit", type=int, default=20, help="jumlah temuan yang ditampilkan per pemeriksaan")
+    args = parser.parse_args(argv)
+
+    store = open_store(args.mode, args.data)
+    start = time.perf_counter()
+    data = store.load()
+    loaded = time.perf_counter()
+    sources = [("aktif", data)]
+    closed = data.get(CLOSING_KEY)
+    if args.archive and closed:
+        sources += [
+            (partition["period"], load_partition(path))
+            for partition, path in zip(closed["partitions"], partition_paths(store.archive_dir, closed))
+        ]
+    found = 0
+    rows = 0
+    for label, source in sources:
+        rows += sum(len(source[name]) for name in COLLECTIONS)
+        issues = check_ledger(source)
+        found += len(issues)
+        for check in CHECKS:
+            selected = [issue for issue in issues if issue[0] == check]
+            if not selected:
+                continue
+            print(f"[{label}] {len(selected)} temuan: {CHECKS[check]}")
+            for _, key, message in selected[:args.limit]:
+                print(f"  {key}: {message}")
+    elapsed = time.perf_counter() - loaded
+    print(f"{rows:,} baris diperiksa dalam {elapsed:.2f} detik (muat {loaded - start:.2f} detik).")
+    if found:
+        return 1
+    print("Buku besar seimbang dan semua baris saling cocok.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1437 @@
+import argparse
+import bisect
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+# ------------------- Konstanta -------------------
+PRODUCTS = {
+    "Sendok A": 15000,
+    "Sendok B": 20000,
+    "Sendok C": 25000,
+    "Sendok D": 30000,
+    "Pisau A": 15000,
+    "Pisau B": 20000,
+    "Pisau Bungkus (C)": 30000,
+    "Saringan": 10000,
+    "Toples kecil": 12000
+}
+PURCHASE_METHODS = ["Tunai", "Kredit", "Retur Pembelian"]
+SALE_METHODS = ["Tunai", "Kredit", "Retur Penjualan"]
+# Saldo normal tiap akun: aset bertambah di debit, utang bertambah di kredit
+ACCOUNT_TYPES = {
+    "Kas": "debit",
+    "Persediaan": "debit",
+    "Piutang Usaha": "debit",
+    "Utang Usaha": "credit"
+}
+COLLECTIONS = ("inventory", "transactions", "sales", "journal_entries")
+TOTAL_COLLECTIONS = ("inventory", "sales")
+# Struktur turunan yang ikut disimpan bersama data
+DERIVED_KEYS = ("totals", "rollups", "accounts", "stock")
+# Struktur yang hanya hidup di memori dan tidak pernah ditulis ke disk; "_ids" adalah id baris
+# SQLite yang dibawa data hasil muat store itu
+TRANSIENT_KEYS = ("_links", "_checkpoints", "_dates", "_voids", "_movements", "_stock_marks", "_ids")
+# Jumlah baris terakhir per koleksi yang ikut disimpan di ringkasan
+RECENT_ROWS = 250
+# Keadaan tutup buku: batas periode tertutup, daftar partisi dan saldo/total pembuka
+CLOSING_KEY = "closed"
+UNKNOWN_METHOD = "-"
+# Metode biaya persediaan perpetual; keduanya selalu dihitung bersamaan
+COST_METHODS = ("fifo", "average")
+# Baris yang dibatalkan membawa {"reason", "at"} di kunci ini dan tetap di posisinya
+VOID_KEY = "void"
+# Tombstone yang lebih tua dari ini dibuang permanen oleh pemadatan
+TOMBSTONE_DAYS = 30
+# Keadaan stok awal hari dicatat sebagai titik mulai hitung ulang setiap sekian mutasi barang
+MARK_EVERY = 64
+
+
+class LedgerConflict(Exception):
+    pass
+
+
+class PeriodClosed(ValueError):
+    pass
+
+
+# ------------------- Fungsi Utilitas -------------------
+def empty_data():
+    data = {name: [] for name in COLLECTIONS}
+    data["totals"] = empty_totals()
+    data["rollups"] = empty_rollups()
+    data["accounts"] = {}
+    data["stock"] = {}
+    return data
+
+
+def validate_date(date_str):
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+
+def date_to_ordinal(value):
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d").toordinal()
+
+
+def empty_closing():
+    return {"through": None, "partitions": [], "totals": empty_totals(), "accounts": {}, "stock": {}}
+
+
+def period_bounds(period):
+    # "YYYY" untuk satu tahun, "YYYY-MM" untuk satu bulan; hasilnya tanggal awal dan akhir
+    try:
+        if len(period) == 4:
+            first = date(int(period), 1, 1)
+            last = date(first.year, 12, 31)
+        else:
+            first = datetime.strptime(period, "%Y-%m").date()
+            last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    except ValueError:
+        raise ValueError("Periode harus berformat YYYY atau YYYY-MM.")
+    return first.isoformat(), last.isoformat()
+
+
+def merge_nested(target, source, sign=1):
+    # Menjumlahkan struktur bertingkat (total, rekap, saldo akun) ke dalam `target`
+    for key, value in source.items():
+        if isinstance(value, dict):
+            merge_nested(target.setdefault(key, {}), value, sign)
+        else:
+            target[key] = target.get(key, 0) + sign * value
+    return target
+
+
+def persistable(data):
+    return {key: value for key, value in data.items() if key not in TRANSIENT_KEYS}
+
+
+def _derived_updaters(data):
+    # Setiap struktur turunan diperbarui per baris yang ditambah atau dihapus
+    return [
+        (get_totals(data), add_to_totals),
+        (get_rollups(data), add_to_rollups),
+        (get_accounts(data), add_to_accounts),
+        (data.setdefault("_checkpoints", {}), invalidate_checkpoints),
+    ]
+
+
+def _remove_positions(data, name, positions, updaters):
+    links = data.get("_links")
+    dates = data.get("_dates", {})
+    if name in dates:
+        dates[name].delete(positions)
+    for index in data.get("_movements", {}).get(name, {}).values():
+        index.delete(positions)
+    if links is not None:
+        _unlink_tail(links, name, data[name], positions[0])
+    voids = data.get("_voids")
+    if voids is not None and voids[name]:
+        gone = set(positions)
+        voids[name] = [i - bisect.bisect_left(positions, i) for i in voids[name] if i not in gone]
+    for i in reversed(positions):
+        # Baris yang sudah dibatalkan tidak lagi ikut di struktur turunan
+        if not is_void(data[name][i]):
+            for state, add in updaters:
+                add(state, name, data[name][i], -1)
+        del data[name][i]
+    if links is not None:
+        for i in range(positions[0], len(data[name])):
+            _link(links, name, data[name][i], i)
+
+
+def check_rows(rows):
+    # Setiap baris dicoba ke struktur turunan kosong sebelum data diubah, sehingga baris yang
+    # akan gagal di tengah `apply_record` ditolak selagi data dan struktur turunannya utuh
+    scratch = [(empty_totals(), add_to_totals), (empty_rollups(), add_to_rollups), ({}, add_to_accounts)]
+    stock = {}
+    for name, items in rows.items():
+        if name not in COLLECTIONS:
+            raise ValueError(f"Koleksi tidak dikenal: {name!r}")
+        for row in items:
+            date_to_ordinal(row["date"])
+            for state, add in scratch:
+                add(state, name, row, 1)
+            if name in TOTAL_COLLECTIONS:
+                move_stock(stock, name, row)
+
+
+def apply_record(data, record):
+    # "post" menambah baris, "delete" menghapus baris berdasarkan posisi, "void"/"restore"
+    # memasang/melepas tanda batal, dan "close" memindahkan baris periode tertutup keluar
+    # dari buku besar aktif. Baris posting diperiksa dulu lewat `check_rows`; operasi lain
+    # hanya mengenai baris yang sudah pernah lolos saat dicatat
+    if record["op"] == "post":
+        check_rows(record["rows"])
+    updaters = _derived_updaters(data)
+    links = data.get("_links")
+    dates = data.get("_dates", {})
+    movements = data.get("_movements", {})
+    stock = get_stock(data)
+    marks = data.setdefault("_stock_marks", {})
+    fresh = record.get("_stock_marks")
+    if "stock" in record:
+        rebuilt = record["stock"]
+    else:
+        fresh = {}
+        rebuilt = stock_rebuilds(data, record, fresh)
+    if record["op"] == "post":
+        for name, rows in record["rows"].items():
+            start = len(data[name])
+            data[name].extend(rows)
+            for offset, row in enumerate(rows):
+                for state, add in updaters:
+                    add(state, name, row, 1)
+                if name in TOTAL_COLLECTIONS and row["product"] not in rebuilt:
+                    move_stock(stock, name, row, marks=marks)
+                if links is not None:
+                    _link(links, name, row, start + offset)
+                if name in dates:
+                    dates[name].insert(date_to_ordinal(row["date"]), start + offset)
+                if name in movements:
+                    index = movements[name].setdefault(row["product"], DateIndex([]))
+                    index.insert(date_to_ordinal(row["date"]), start + offset)
+    elif record["op"] == "delete":
+        for name, positions in record["rows"].items():
+            positions = sorted(set(positions))
+            if positions:
+                _remove_positions(data, name, positions, updaters)
+    elif record["op"] in ("void", "restore"):
+        # Baris tetap di posisinya sehingga indeks tanggal dan tautan tidak berubah; struktur
+        # turunan dikurangi atau ditambah seperti saat baris dihapus atau dicatat
+        sign = -1 if record["op"] == "void" else 1
+        voids = get_voids(data)
+        for name, rows in marked_rows(record).items():
+            for i, row in zip(record["rows"][name], rows):
+                for state, add in updaters:
+                    add(state, name, row, sign)
+                data[name][i] = row
+                if sign < 0:
+                    bisect.insort(voids[name], i)
+                else:
+                    voids[name].remove(i)
+    elif record["op"] == "close":
+        # Total dan saldo akun tetap kumulatif: baris yang ditutup pindah ke saldo pembuka,
+        # sedangkan rekap periode aktif hanya mencakup periode yang masih terbuka
+        closed = data.setdefault(CLOSING_KEY, empty_closing())
+        counts, movements = {}, []
+        for name, positions in record["rows"].items():
+            positions = sorted(set(positions))
+            counts[name] = 0
+            for i in positions:
+                row = data[name][i]
+                if is_void(row):
+                    # Tombstone di periode yang ditutup ikut dibuang, tidak masuk arsip
+                    continue
+                counts[name] += 1
+                add_to_totals(closed["totals"], name, row, 1)
+                add_to_accounts(closed["accounts"], name, row, 1)
+                if name in TOTAL_COLLECTIONS:
+                    movements.append((_movement_key(name, row), name, row))
+            if positions:
+                _remove_positions(data, name, positions, [(get_rollups(data), add_to_rollups)])
+        # Stok aktif tidak berubah; saldo pembuka stok digeser ke akhir periode yang ditutup
+        movements.sort(key=lambda movement: movement[0])
+        closed["stock"] = replay_stock(closed.get("stock", {}), movements)
+        closed["through"] = record["through"]
+        closed["partitions"].append({
+            "period": record["period"], "file": record["file"],
+            "from": record.get("from"), "through": record["through"], "counts": counts,
+        })
+        data["_checkpoints"] = {}
+        marks.clear()
+    else:
+        raise ValueError(f"Operasi log tidak dikenal: {record['op']}")
+    # Titik mulai hasil hitung ulang ikut dipasang; record dari log tidak membawanya, jadi
+    # titik mulai barang yang dihitung ulang dibuang dan dibangun lagi saat dibutuhkan
+    for product in rebuilt:
+        if fresh is None:
+            marks.pop(product, None)
+        elif product in fresh:
+            marks[product] = fresh[product]
+    for product, item in rebuilt.items():
+        if item is None:
+            stock.pop(product, None)
+        else:
+            stock[product] = _copy_item(item)
+    return data
+
+
+# ------------------- ID Transaksi dan Indeks Tautan -------------------
+def new_tx_id():
+    return uuid.uuid4().hex
+
+
+def _link(links, name, row, position):
+    tx_id = row.get("tx_id")
+    if tx_id is not None:
+        links.setdefault(tx_id, {}).setdefault(name, []).append(position)
+
+
+def _unlink_tail(links, name, rows, start):
+    # Posisi baris setelah `start` akan bergeser, jadi tautannya dilepas dulu
+    for row in rows[start:]:
+        tx_id = row.get("tx_id")
+        if tx_id in links and name in links[tx_id]:
+            kept = [i for i in links[tx_id][name] if i < start]
+            if kept:
+                links[tx_id][name] = kept
+            else:
+                del links[tx_id][name]
+                if not links[tx_id]:
+                    del links[tx_id]
+
+
+def get_links(data):
+    # Indeks tx_id -> {koleksi: [posisi]} dibangun sekali per muatan data
+    if "_links" not in data:
+        links = {}
+        for name in COLLECTIONS:
+            for i, row in enumerate(data[name]):
+                _link(links, name, row, i)
+        data["_links"] = links
+    return data["_links"]
+
+
+def linked_positions(data, index):
+    transaksi = data["transactions"][index]
+    if "tx_id" in transaksi:
+        return {name: list(positions) for name, positions in get_links(data)[transaksi["tx_id"]].items()}
+    # Transaksi lama tanpa ID: dicocokkan seperti sebelumnya, hanya di antara baris tanpa ID
+    return {
+        "transactions": [index],
+        "inventory": [i for i, item in enumerate(data["inventory"]) if "tx_id" not in item and item["total"] == transaksi["amount"] and item["product"] == transaksi["type"]],
+        "sales": [i for i, item in enumerate(data["sales"]) if "tx_id" not in item and item["total"] == transaksi["amount"] and item["product"] == transaksi["type"]],
+        "journal_entries": [i for i, entry in enumerate(data["journal_entries"]) if "tx_id" not in entry and entry["date"] == transaksi["date"] and entry["description"].find(transaksi["type"]) != -1],
+    }
+
+
+# ------------------- Indeks Tanggal -------------------
+class DateIndex:
+    """Posisi baris satu koleksi yang diurutkan menurut ordinal tanggal.
+
+    Baris baru masuk ke `tail` kecil yang belum terurut dan digabung ke array utama
+    setiap `merge_every` sisipan, sehingga sisipan tidak menyalin seluruh array.
+    Pencarian rentang memakai searchsorted pada array utama ditambah pindaian `tail`.
+    """
+
+    merge_every = 256
+
+    def __init__(self, rows, positions=None):
+        # `positions` adalah posisi asli `rows` jika indeks hanya mencakup sebagian koleksi
+        ordinals = np.fromiter((date_to_ordinal(row["date"]) for row in rows), dtype=np.int32, count=len(rows))
+        order = np.argsort(ordinals, kind="stable")
+        self.ordinals = ordinals[order]
+        self.positions = order.astype(np.int64) if positions is None else np.asarray(positions, dtype=np.int64)[order]
+        self.tail = []
+
+    def __len__(self):
+        return len(self.positions) + len(self.tail)
+
+    def insert(self, ordinal, position):
+        self.tail.append((ordinal, position))
+        if len(self.tail) >= self.merge_every:
+            self._merge()
+
+    def _merge(self):
+        tail = sorted(self.tail)
+        ordinals = np.array([ordinal for ordinal, _ in tail], dtype=np.int32)
+        positions = np.array([position for _, position in tail], dtype=np.int64)
+        at = np.searchsorted(self.ordinals, ordinals, side="right")
+        self.ordinals = np.insert(self.ordinals, at, ordinals)
+        self.positions = np.insert(self.positions, at, positions)
+        self.tail = []
+
+    def delete(self, positions):
+        # Posisi setelah baris yang dihapus bergeser sebanyak baris terhapus di depannya
+        deleted = np.array(sorted(positions), dtype=np.int64)
+        keep = ~np.isin(self.positions, deleted)
+        self.ordinals = self.ordinals[keep]
+        self.positions = self.positions[keep]
+        self.positions -= np.searchsorted(deleted, self.positions)
+        gone = set(positions)
+        self.tail = [
+            (ordinal, position - int(np.searchsorted(deleted, position)))
+            for ordinal, position in self.tail if position not in gone
+        ]
+
+    def _bounds(self, date_from, date_to):
+        low = date_to_ordinal(date_from) if date_from else None
+        high = date_to_ordinal(date_to) if date_to else None
+        start = 0 if low is None else int(np.searchsorted(self.ordinals, low, side="left"))
+        stop = len(self.ordinals) if high is None else int(np.searchsorted(self.ordinals, high, side="right"))
+        return low, high, start, stop
+
+    def _tail_matches(self, low, high):
+        return [
+            position for ordinal, position in self.tail
+            if (low is None or ordinal >= low) and (high is None or ordinal <= high)
+        ]
+
+    def count(self, date_from=None, date_to=None):
+        low, high, start, stop = self._bounds(date_from, date_to)
+        return stop - start + len(self._tail_matches(low, high))
+
+    def positions_between(self, date_from=None, date_to=None):
+        # Hasil dikembalikan dalam urutan entri agar sama dengan tampilan tanpa filter
+        low, high, start, stop = self._bounds(date_from, date_to)
+        found = self.positions[start:stop]
+        tail = self._tail_matches(low, high)
+        if tail:
+            found = np.concatenate([found, np.array(tail, dtype=np.int64)])
+        return np.sort(found).tolist()
+
+
+def get_date_index(data, collection):
+    dates = data.setdefault("_dates", {})
+    if collection not in dates:
+        dates[collection] = DateIndex(data[collection])
+    return dates[collection]
+
+
+def get_movement_index(data, collection):
+    # Indeks tanggal per barang untuk koleksi mutasi stok, berisi posisi baris di koleksi
+    movements = data.setdefault("_movements", {})
+    if collection not in movements:
+        rows, groups = data[collection], {}
+        for i, row in enumerate(rows):
+            groups.setdefault(row["product"], []).append(i)
+        movements[collection] = {
+            product: DateIndex([rows[i] for i in positions], positions) for product, positions in groups.items()
+        }
+    return movements[collection]
+
+
+def rows_between(data, collection, date_from=None, date_to=None):
+    rows = data[collection]
+    return [(i, rows[i]) for i in get_date_index(data, collection).positions_between(date_from, date_to)]
+
+
+# ------------------- Pembatalan (Tombstone) -------------------
+def is_void(row):
+    return VOID_KEY in row
+
+
+def get_voids(data):
+    # Posisi baris yang dibatalkan per koleksi, terurut; dibangun sekali per muatan data lalu
+    # diperbarui per record, jadi tampilan tidak perlu memindai koleksi untuk melewatinya
+    if "_voids" not in data:
+        data["_voids"] = {name: [i for i, row in enumerate(data[name]) if VOID_KEY in row] for name in COLLECTIONS}
+    return data["_voids"]
+
+
+def live_positions(voids, size, offset=0, limit=None):
+    """Posisi baris aktif ke-`offset` dan seterusnya (paling banyak `limit`) dari `size` baris.
+
+    Posisi awal dicari dengan bisect pada daftar tombstone yang terurut, lalu tombstone
+    dilompati sambil berjalan; biayanya sebanding dengan `limit`, bukan ukuran koleksi.
+    """
+    position = offset
+    while True:
+        shifted = offset + bisect.bisect_right(voids, position)
+        if shifted == position:
+            break
+        position = shifted
+    found, j = [], bisect.bisect_left(voids, position)
+    while position < size and (limit is None or len(found) < limit):
+        if j < len(voids) and voids[j] == position:
+            j += 1
+        else:
+            found.append(position)
+        position += 1
+    return found
+
+
+def marked_rows(record):
+    # Isi baru baris pada record "void"/"restore", urut sesuai posisi di record["rows"]
+    if record["op"] == "void":
+        mark = {"reason": record["reason"], "at": record["at"]}
+        return {name: [dict(row, **{VOID_KEY: dict(mark)}) for row in rows] for name, rows in record["removed"].items()}
+    return {
+        name: [{key: value for key, value in row.items() if key != VOID_KEY} for row in rows]
+        for name, rows in record["restored"].items()
+    }
+
+
+def purge_positions(data, before):
+    # Tombstone yang dibatalkan sebelum `before` (timestamp ISO), siap dihapus permanen
+    found = {name: [i for i in positions if data[name][i][VOID_KEY]["at"] < before] for name, positions in get_voids(data).items()}
+    return {name: positions for name, positions in found.items() if positions}
+
+
+def tombstone_cutoff(days=TOMBSTONE_DAYS):
+    return (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+
+
+# ------------------- Pembentukan Posting -------------------
+def build_purchase(date, product, quantity, price, method, tx_id=None):
+    total = quantity * price * (-1 if method == "Retur Pembelian" else 1)
+    keterangan = "Retur Pembelian" if method == "Retur Pembelian" else "Pembelian"
+    tx_id = tx_id or new_tx_id()
+
+    rows = {"inventory": [], "transactions": [], "journal_entries": []}
+    rows["inventory"].append({
+        "tx_id": tx_id, "date": date, "product": product,
+        "quantity": quantity, "price": price, "total": total,
+        "payment_method": method
+    })
+    rows["transactions"].append({
+        "tx_id": tx_id, "date": date, "type": product,
+        "description": keterangan, "amount": total,
+        "payment_method": method
+    })
+
+    # Jurnal
+    if method == "Retur Pembelian":
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"Retur pembelian {product}",
+            "account": "Utang Usaha", "debit": 0, "credit": -total
+        })
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"Pengurangan persediaan karena retur {product}",
+            "account": "Persediaan", "debit": -total, "credit": 0
+        })
+    else:
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"Pembelian {product}",
+            "account": "Persediaan", "debit": total, "credit": 0
+        })
+        # Pembelian kredit menambah utang; tanpa baris ini jurnalnya tidak seimbang
+        akun, keterangan = ("Kas", "Pembayaran tunai") if method == "Tunai" else ("Utang Usaha", "Utang")
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"{keterangan} pembelian {product}",
+            "account": akun, "debit": 0, "credit": total
+        })
+    return rows
+
+
+def build_sale(date, product, quantity, price, method, tx_id=None):
+    total = price * quantity * (-1 if method == "Retur Penjualan" else 1)
+    keterangan = "Retur Penjualan" if method == "Retur Penjualan" else "Penjualan"
+    tx_id = tx_id or new_tx_id()
+
+    rows = {"sales": [], "transactions": [], "journal_entries": []}
+    rows["sales"].append({
+        "tx_id": tx_id, "date": date, "product": product, "price": price,
+        "quantity": quantity, "total": total, "payment_method": method
+    })
+    rows["transactions"].append({
+        "tx_id": tx_id, "date": date, "type": product,
+        "description": keterangan, "amount": total, "payment_method": method
+    })
+
+    # Jurnal
+    if method == "Retur Penjualan":
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"Retur penjualan {product}",
+            "account": "Persediaan", "debit": -total, "credit": 0
+        })
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"Pengembalian kas karena retur {product}",
+            "account": "Kas", "debit": 0, "credit": -total
+        })
+    else:
+        akun = "Kas" if method == "Tunai" else "Piutang Usaha"
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"{keterangan.lower()} {product}",
+            "account": akun, "debit": total, "credit": 0
+        })
+        rows["journal_entries"].append({
+            "tx_id": tx_id, "date": date, "description": f"Pengurangan persediaan karena {keterangan.lower()} {product}",
+            "account": "Persediaan", "debit": 0, "credit": total
+        })
+    return rows
+
+
+POSTING_KINDS = {
+    "pembelian": (PURCHASE_METHODS, build_purchase),
+    "penjualan": (SALE_METHODS, build_sale),
+}
+
+
+def list_price(products, product, date):
+    # Katalog barang (dapur_kita_catalog) menyimpan riwayat harga; dict biasa hanya harga sekarang
+    price_on = getattr(products, "price_on", None)
+    return products[product] if price_on is None else price_on(product, date)
+
+
+def build_posting(kind, date, product, quantity, method, price=None, tx_id=None, products=PRODUCTS):
+    """Validasi satu posting lalu bentuk barisnya; dipakai formulir, impor CSV dan API tanpa UI.
+
+    Harga default diambil dari daftar barang, atau dari katalog sesuai tanggal posting. Kesalahan dilempar sebagai ValueError dengan
+    pesan yang bisa langsung ditampilkan ke pengguna.
+    """
+    if kind not in POSTING_KINDS:
+        raise ValueError(f"Jenis tidak dikenal: {kind!r} (pembelian/penjualan)")
+    methods, build = POSTING_KINDS[kind]
+    if not isinstance(date, str) or not validate_date(date):
+        raise ValueError("Format tanggal tidak valid.")
+    # Tanggal disimpan dalam bentuk baku agar urutan teks sama dengan urutan tanggal
+    date = period_keys(date)["daily"]
+    if product not in products:
+        raise ValueError(f"Barang tidak dikenal: {product!r}")
+    if isinstance(quantity, bool) or not isinstance(quantity, int):
+        raise ValueError("Jumlah barang harus bilangan bulat.")
+    if quantity < 1:
+        raise ValueError("Jumlah barang minimal 1.")
+    if method not in methods:
+        raise ValueError(f"Metode pembayaran tidak valid untuk {kind}: {method!r}")
+    price = list_price(products, product, date) if price is None else price
+    if isinstance(price, bool) or not isinstance(price, (int, float)):
+        raise ValueError("Harga harus berupa angka.")
+    if price <= 0:
+        raise ValueError("Harga harus lebih dari 0.")
+    return build(date, product, quantity, price, method, tx_id)
+
+
+def merge_rows(target, rows):
+    for name, items in rows.items():
+        target.setdefault(name, []).extend(items)
+    return target
+
+
+def build_receipt(kind, date, lines, products=PRODUCTS):
+    """Baris semua barang dalam satu nota, digabung agar bisa disimpan sebagai satu posting.
+
+    `lines` berisi dict dengan `product`, `quantity`, `payment_method` dan `price` opsional;
+    baris tanpa barang dilewati. Setiap barang tetap mendapat tx_id sendiri seperti formulir
+    satu barang. Hasilnya (baris gabungan, daftar (nomor baris, pesan)).
+    """
+    rows, errors = {}, []
+    for number, line in enumerate(lines, 1):
+        if not line.get("product"):
+            continue
+        try:
+            merge_rows(rows, build_posting(
+                kind, date, line["product"], line.get("quantity"), line.get("payment_method"),
+                line.get("price"), products=products
+            ))
+        except ValueError as error:
+            errors.append((number, str(error)))
+    return rows, errors
+
+
+# ------------------- Operasi Penulisan -------------------
+def _locate(data, name, position, expect):
+    # Posisi dari tampilan pengguna bisa sudah bergeser (atau tidak diketahui, None);
+    # pastikan barisnya masih sama, jika tidak cari lewat tx_id
+    rows = data[name]
+    if position is not None and position < len(rows) and rows[position] == expect:
+        return position
+    tx_id = expect.get("tx_id")
+    if tx_id is not None:
+        for i in get_links(data).get(tx_id, {}).get(name, []):
+            if rows[i] == expect:
+                return i
+    raise LedgerConflict("Data sudah diubah oleh pengguna lain. Muat ulang halaman lalu coba lagi.")
+
+
+def _delete_record(data, positions):
+    # Isi baris yang dihapus ikut dicatat agar ringkasan bisa diperbarui tanpa data lengkap
+    return {
+        "op": "delete", "rows": positions,
+        "removed": {name: [data[name][i] for i in items] for name, items in positions.items()},
+    }
+
+
+def _void_record(data, positions, reason):
+    # Salinan baris sebelum dibatalkan ikut dicatat, seperti "removed" pada penghapusan
+    reason = (reason or "").strip()
+    if not reason:
+        raise ValueError("Alasan pembatalan wajib diisi.")
+    positions = {name: sorted(set(items)) for name, items in positions.items() if items}
+    if any(is_void(data[name][i]) for name, items in positions.items() for i in items):
+        raise ValueError("Baris sudah dibatalkan.")
+    return {
+        "op": "void", "rows": positions, "reason": reason, "at": datetime.now().isoformat(timespec="seconds"),
+        "removed": {name: [dict(data[name][i]) for i in items] for name, items in positions.items()},
+    }
+
+
+def _restore_record(data, positions):
+    positions = {name: sorted(set(items)) for name, items in positions.items() if items}
+    if not all(is_void(data[name][i]) for name, items in positions.items() for i in items):
+        raise ValueError("Baris tidak sedang dibatalkan.")
+    return {
+        "op": "restore", "rows": positions,
+        "restored": {name: [dict(data[name][i]) for i in items] for name, items in positions.items()},
+    }
+
+
+def _transaction_tombstones(data, name, position, restore):
+    # Pembatalan transaksi mengenai semua baris tertautnya yang masih aktif; pemulihan hanya
+    # baris yang dibatalkan bersama baris terpilih, bukan baris yang dibatalkan sendiri-sendiri.
+    # Baris terpilih boleh dari koleksi lain (misalnya jurnal); postingnya dicari lewat tx_id
+    row = data[name][position]
+    label = "Transaksi" if name == "transactions" else "Baris"
+    if is_void(row) != restore:
+        raise ValueError(f"{label} tidak sedang dibatalkan." if restore else f"{label} sudah dibatalkan.")
+    if name == "transactions":
+        linked = linked_positions(data, position)
+    elif "tx_id" in row:
+        linked = get_links(data)[row["tx_id"]]
+    else:
+        raise ValueError("Baris lama tanpa tx_id tidak tertaut ke posting; batalkan transaksinya di halaman Transaksi.")
+    mark = row.get(VOID_KEY)
+    return {
+        other: [i for i in items if data[other][i].get(VOID_KEY) == mark]
+        for other, items in linked.items()
+    }
+
+
+def _check_open(data, rows):
+    through = (data.get(CLOSING_KEY) or {}).get("through")
+    if not through:
+        return
+    limit = date_to_ordinal(through)
+    for items in rows.values():
+        for row in items:
+            if date_to_ordinal(row["date"]) <= limit:
+                raise PeriodClosed(f"Periode sampai {through} sudah ditutup; tanggal {row['date']} tidak bisa dicatat.")
+
+
+def open_from(data):
+    # Tanggal pertama periode yang masih terbuka, None jika belum pernah tutup buku
+    through = (data.get(CLOSING_KEY) or {}).get("through")
+    return (date.fromisoformat(through) + timedelta(days=1)).isoformat() if through else None
+
+
+def _close_record(data, period):
+    first, through = period_bounds(period)
+    closed = data.get(CLOSING_KEY) or empty_closing()
+    if closed["through"] and through <= closed["through"]:
+        raise PeriodClosed(f"Periode sampai {closed['through']} sudah ditutup.")
+    if through >= date.today().isoformat():
+        raise PeriodClosed(f"Periode {period} belum berakhir.")
+    positions = {name: get_date_index(data, name).positions_between(None, through) for name in COLLECTIONS}
+    record = _delete_record(data, positions)
+    record.update({"op": "close", "period": period, "from": open_from(data), "through": through, "file": f"{period}.dkl"})
+    return record
+
+
+def _with_stock(data, record):
+    # Keadaan stok barang yang dihitung ulang ikut dicatat, sehingga pemutaran log ke
+    # ringkasan tidak membutuhkan baris lengkap barang tersebut; titik mulai barunya hanya
+    # dibawa ke `apply_record` dan tidak ikut ditulis ke log
+    marks = {}
+    rebuilt = stock_rebuilds(data, record, marks)
+    if rebuilt:
+        record["stock"] = rebuilt
+        record["_stock_marks"] = marks
+    return record
+
+
+def resolve_operation(data, op, locate=None):
+    # Operasi dari halaman diterjemahkan ke record log berbasis posisi terhadap data terkini;
+    # `locate(koleksi, kunci)` menerjemahkan kunci baris dari `fetch` store menjadi posisi
+    where = locate or (lambda name, key: key)
+    if op["op"] == "post":
+        _check_open(data, op["rows"])
+        return _with_stock(data, {"op": "post", "rows": op["rows"]})
+    if op["op"] == "close_period":
+        return _close_record(data, op["period"])
+    if op["op"] == "delete_transaction":
+        position = _locate(data, "transactions", where("transactions", op["position"]), op["expect"])
+        return _with_stock(data, _delete_record(data, linked_positions(data, position)))
+    if op["op"] == "delete_rows":
+        return _with_stock(data, _delete_record(data, {
+            name: [_locate(data, name, where(name, key), row) for key, row in items]
+            for name, items in op["rows"].items()
+        }))
+    if op["op"] in ("void_transaction", "restore_transaction"):
+        restore = op["op"] == "restore_transaction"
+        name = op.get("collection", "transactions")
+        position = _locate(data, name, where(name, op["position"]), op["expect"])
+        positions = _transaction_tombstones(data, name, position, restore)
+        record = _restore_record(data, positions) if restore else _void_record(data, positions, op.get("reason"))
+        return _with_stock(data, record)
+    if op["op"] in ("void_rows", "restore_rows"):
+        positions = {
+            name: [_locate(data, name, where(name, key), row) for key, row in items]
+            for name, items in op["rows"].items()
+        }
+        if op["op"] == "restore_rows":
+            return _with_stock(data, _restore_record(data, positions))
+        return _with_stock(data, _void_record(data, positions, op.get("reason")))
+    if op["op"] == "purge_voids":
+        return _delete_record(data, purge_positions(data, op.get("before") or tombstone_cutoff()))
+    raise ValueError(f"Operasi tidak dikenal: {op['op']}")
+
+
+# ------------------- Ringkasan -------------------
+def summarize(data, recent=RECENT_ROWS):
+    """Bentuk ringan dari data: struktur turunan, jumlah baris dan baris terakhir saja.
+
+    Ringkasan bisa dipakai di tempat data lengkap oleh fungsi yang hanya membaca struktur
+    turunan (total, rekap periode, neraca saldo). Koleksinya paling banyak berisi `recent` baris
+    terakhir, jadi jangan dipakai untuk mencari atau menghapus baris.
+    """
+    summary = {name: data[name][-recent:] for name in COLLECTIONS}
+    summary["counts"] = {name: len(data[name]) for name in COLLECTIONS}
+    summary["totals"] = get_totals(data)
+    summary["rollups"] = get_rollups(data)
+    summary["accounts"] = get_accounts(data)
+    summary["stock"] = get_stock(data)
+    if CLOSING_KEY in data:
+        summary[CLOSING_KEY] = data[CLOSING_KEY]
+    return summary
+
+
+def apply_to_summary(summary, record, recent=RECENT_ROWS):
+    # Mengembalikan False jika record tidak membawa cukup isi (log lama tanpa "removed" atau
+    # tanpa keadaan stok hasil hitung ulang, atau tutup buku yang barisnya hanya ada di berkas partisi)
+    if record["op"] == "close" or (record["op"] == "delete" and "removed" not in record):
+        return False
+    stock = summary["stock"]
+    rebuilt = record.get("stock", {})
+    if "stock" not in record:
+        if record["op"] == "post" and _backdated_products(stock, record["rows"]):
+            return False
+        changed = record.get("restored") if record["op"] == "restore" else record.get("removed", {})
+        if record["op"] != "post" and any(
+            not is_void(row) or record["op"] == "restore"
+            for name in TOTAL_COLLECTIONS for row in changed.get(name, ())
+        ):
+            return False
+    updaters = _derived_updaters(summary)
+    counts = summary["counts"]
+    if record["op"] == "post":
+        for name, rows in record["rows"].items():
+            for row in rows:
+                for state, add in updaters:
+                    add(state, name, row, 1)
+                if name in TOTAL_COLLECTIONS and row["product"] not in rebuilt:
+                    move_stock(stock, name, row)
+            summary[name] = (summary[name] + rows)[-recent:]
+            counts[name] += len(rows)
+    elif record["op"] in ("void", "restore"):
+        sign = -1 if record["op"] == "void" else 1
+        for name, rows in marked_rows(record).items():
+            start = counts[name] - len(summary[name])
+            for i, row in zip(record["rows"][name], rows):
+                for state, add in updaters:
+                    add(state, name, row, sign)
+                if i >= start:
+                    summary[name][i - start] = row
+    else:
+        for name, rows in record["removed"].items():
+            for row in rows:
+                if not is_void(row):
+                    for state, add in updaters:
+                        add(state, name, row, -1)
+        for name, positions in record["rows"].items():
+            start = counts[name] - len(summary[name])
+            for i in sorted(set(positions), reverse=True):
+                if i >= start:
+                    del summary[name][i - start]
+            counts[name] -= len(set(positions))
+    for product, item in rebuilt.items():
+        if item is None:
+            stock.pop(product, None)
+        else:
+            stock[product] = _copy_item(item)
+    return True
+
+
+# ------------------- Total Berjalan -------------------
+def empty_totals():
+    return {name: {"total": 0, "by_product": {}, "by_method": {}} for name in TOTAL_COLLECTIONS}
+
+
+def add_to_totals(totals, collection, row, sign):
+    if collection not in totals:
+        return
+    bucket = totals[collection]
+    amount = sign * row["total"]
+    method = row.get("payment_method", UNKNOWN_METHOD)
+    bucket["total"] += amount
+    bucket["by_product"][row["product"]] = bucket["by_product"].get(row["product"], 0) + amount
+    bucket["by_method"][method] = bucket["by_method"].get(method, 0) + amount
+
+
+def compute_totals(data):
+    # Total kumulatif: saldo pembuka dari periode tertutup ditambah baris yang masih aktif
+    totals = merge_nested(empty_totals(), (data.get(CLOSING_KEY) or {}).get("totals", {}))
+    for name in TOTAL_COLLECTIONS:
+        for row in data[name]:
+            if not is_void(row):
+                add_to_totals(totals, name, row, 1)
+    return totals
+
+
+def get_totals(data):
+    # Data lama tanpa total dihitung sekali, setelah itu hanya diperbarui per posting
+    if "totals" not in data:
+        data["totals"] = compute_totals(data)
+    return data["totals"]
+
+
+def verify_totals(data, actual=None, tolerance=1e-6):
+    stored = data.get("totals") or empty_totals()
+    actual = actual or compute_totals(data)
+    drift = []
+    for name in TOTAL_COLLECTIONS:
+        if abs(stored[name]["total"] - actual[name]["total"]) > tolerance:
+            drift.append((name, "total", stored[name]["total"], actual[name]["total"]))
+        for group in ("by_product", "by_method"):
+            for key in sorted(set(stored[name][group]) | set(actual[name][group])):
+                expected = actual[name][group].get(key, 0)
+                found = stored[name][group].get(key, 0)
+                if abs(found - expected) > tolerance:
+                    drift.append((name, f"{group}:{key}", found, expected))
+    return drift
+
+
+# ------------------- Rekap Periode -------------------
+def period_keys(date_str):
+    # Tanggal ditulis ulang ke bentuk baku agar "2024-1-5" dan "2024-01-05" satu periode
+    if len(date_str) != 10:
+        date_str = datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y-%m-%d")
+    return {"daily": date_str, "monthly": date_str[:7]}
+
+
+def signed_quantity(row):
+    return -row["quantity"] if row.get("payment_method", "").startswith("Retur") else row["quantity"]
+
+
+def empty_rollups():
+    return {grain: {"inventory": {}, "sales": {}, "journal_entries": {}} for grain in ("daily", "monthly")}
+
+
+def add_to_rollups(rollups, collection, row, sign):
+    if collection == "journal_entries":
+        key, values = row["account"], {"debit": row["debit"], "credit": row["credit"]}
+    elif collection in TOTAL_COLLECTIONS:
+        key, values = row["product"], {"quantity": signed_quantity(row), "total": row["total"]}
+    else:
+        return
+    for grain, period in period_keys(row["date"]).items():
+        periods = rollups[grain][collection]
+        bucket = periods.setdefault(period, {}).setdefault(key, dict(dict.fromkeys(values, 0), count=0))
+        bucket["count"] += sign
+        for field, value in values.items():
+            bucket[field] += sign * value
+        # Kunci yang sudah tidak punya baris dibuang agar laporan tetap ringkas
+        if bucket["count"] == 0:
+            del periods[period][key]
+            if not periods[period]:
+                del periods[period]
+
+
+def compute_rollups(data):
+    rollups = empty_rollups()
+    for name in ("inventory", "sales", "journal_entries"):
+        for row in data[name]:
+            if not is_void(row):
+                add_to_rollups(rollups, name, row, 1)
+    return rollups
+
+
+def get_rollups(data):
+    if "rollups" not in data:
+        data["rollups"] = compute_rollups(data)
+    return data["rollups"]
+
+
+def rollup_report(data, grain, collection, key=None, period_from=None, period_to=None):
+    # Biaya sebanding dengan jumlah periode, bukan jumlah transaksi
+    report = []
+    for period, buckets in sorted(get_rollups(data)[grain][collection].items()):
+        if (period_from and period < period_from) or (period_to and period > period_to):
+            continue
+        for name, values in sorted(buckets.items()):
+            if key is None or name == key:
+                report.append(dict(values, period=period, key=name))
+    return report
+
+
+def nested_drift(stored, actual, path="", tolerance=1e-6):
+    if isinstance(stored, dict) or isinstance(actual, dict):
+        stored, actual = stored or {}, actual or {}
+        drift = []
+        for key in sorted(set(stored) | set(actual)):
+            drift += nested_drift(stored.get(key), actual.get(key), f"{path}/{key}", tolerance)
+        return drift
+    if abs((stored or 0) - (actual or 0)) > tolerance:
+        return [(path, stored or 0, actual or 0)]
+    return []
+
+
+# ------------------- Buku Besar dan Neraca Saldo -------------------
+def add_to_accounts(accounts, collection, row, sign):
+    if collection != "journal_entries":
+        return
+    bucket = accounts.setdefault(row["account"], {"debit": 0, "credit": 0, "count": 0})
+    bucket["debit"] += sign * row["debit"]
+    bucket["credit"] += sign * row["credit"]
+    bucket["count"] += sign
+
+
+def compute_accounts(data):
+    accounts = merge_nested({}, (data.get(CLOSING_KEY) or {}).get("accounts", {}))
+    for row in data["journal_entries"]:
+        if not is_void(row):
+            add_to_accounts(accounts, "journal_entries", row, 1)
+    return accounts
+
+
+def get_accounts(data):
+    if "accounts" not in data:
+        data["accounts"] = compute_accounts(data)
+    return data["accounts"]
+
+
+def invalidate_checkpoints(checkpoints, collection, row, sign):
+    # Titik saldo akun yang berubah dibangun ulang saat dibutuhkan
+    if collection == "journal_entries":
+        checkpoints.pop(row["account"], None)
+
+
+def account_balance(account, debit, credit):
+    return credit - debit if ACCOUNT_TYPES.get(account) == "credit" else debit - credit
+
+
+def _checkpoints(data, account):
+    # Saldo kumulatif per akun di setiap akhir bulan, urut menurut bulan
+    checkpoints = data.setdefault("_checkpoints", {})
+    if account not in checkpoints:
+        months, cumulative = [], []
+        debit, credit = opening_balance(data, account)
+        for month, buckets in sorted(get_rollups(data)["monthly"]["journal_entries"].items()):
+            if account in buckets:
+                debit += buckets[account]["debit"]
+                credit += buckets[account]["credit"]
+                months.append(month)
+                cumulative.append((debit, credit))
+        checkpoints[account] = (months, cumulative)
+    return checkpoints[account]
+
+
+def opening_balance(data, account):
+    # Debit/kredit yang dibawa dari periode tertutup; rekap aktif dimulai setelahnya
+    bucket = (data.get(CLOSING_KEY) or {}).get("accounts", {}).get(account)
+    return (bucket["debit"], bucket["credit"]) if bucket else (0, 0)
+
+
+def balance_as_of(data, account, date_str):
+    # Titik saldo bulan sebelumnya dicari dengan bisect, lalu ditambah mutasi harian bulan berjalan
+    day = period_keys(date_str)["daily"]
+    month = day[:7]
+    months, cumulative = _checkpoints(data, account)
+    i = bisect.bisect_left(months, month)
+    debit, credit = cumulative[i - 1] if i else opening_balance(data, account)
+    daily = get_rollups(data)["daily"]["journal_entries"]
+    for n in range(1, 32):
+        key = f"{month}-{n:02d}"
+        if key > day:
+            break
+        bucket = daily.get(key, {}).get(account)
+        if bucket:
+            debit += bucket["debit"]
+            credit += bucket["credit"]
+    return debit, credit
+
+
+def trial_balance(data, as_of=None):
+    accounts = sorted(set(ACCOUNT_TYPES) | set(get_accounts(data)))
+    report = []
+    for account in accounts:
+        if as_of:
+            debit, credit = balance_as_of(data, account, as_of)
+        else:
+            bucket = get_accounts(data).get(account, {"debit": 0, "credit": 0})
+            debit, credit = bucket["debit"], bucket["credit"]
+        net = debit - credit
+        report.append({
+            "account": account, "debit": debit, "credit": credit,
+            "balance_debit": max(net, 0), "balance_credit": max(-net, 0),
+            "balance": account_balance(account, debit, credit)
+        })
+    return report
+
+
+def account_ledger(data, account, entries, date_from=None):
+    # Baris jurnal satu akun (sudah difilter) diurutkan per tanggal dengan saldo berjalan;
+    # saldo awal diambil dari titik saldo sehari sebelum `date_from`
+    debit, credit = opening_balance(data, account)
+    if date_from:
+        previous = datetime.strptime(date_from, "%Y-%m-%d") - timedelta(days=1)
+        debit, credit = balance_as_of(data, account, previous.strftime("%Y-%m-%d"))
+    opening = account_balance(account, debit, credit)
+    report = []
+    for entry in sorted(entries, key=lambda entry: period_keys(entry["date"])["daily"]):
+        debit += entry["debit"]
+        credit += entry["credit"]
+        report.append(dict(entry, balance=account_balance(account, debit, credit)))
+    return opening, report
+
+
+# ------------------- Persediaan Perpetual -------------------
+def empty_stock_item():
+    # Lapisan FIFO berisi [jumlah, biaya per unit] dari yang terlama; "last" adalah kunci
+    # urutan mutasi terakhir yang sudah diterapkan dan "day_start" salinan keadaan sebelum
+    # mutasi pertama pada tanggal itu
+    return {
+        "quantity": 0, "layers": [], "average": 0, "last_cost": 0,
+        "cogs": dict.fromkeys(COST_METHODS, 0), "last": None, "day_start": None
+    }
+
+
+def _snapshot(item):
+    return {
+        key: [list(layer) for layer in value] if key == "layers" else dict(value) if key == "cogs" else value
+        for key, value in item.items() if key != "day_start"
+    }
+
+
+def _copy_item(item):
+    # Salinan yang aman dimutasi tanpa deepcopy: "day_start" tidak pernah diubah di tempat
+    return dict(_snapshot(item), day_start=item.get("day_start"))
+
+
+def _movement_key(collection, row):
+    # Urutan mutasi: tanggal, lalu pembelian sebelum penjualan pada hari yang sama
+    return [date_to_ordinal(row["date"]), 0 if collection == "inventory" else 1]
+
+
+def _stock_in(item, quantity, fifo_cost, average_cost):
+    # Unit yang masuk menutup kekurangan stok dulu (sudah dibebankan saat keluar),
+    # sisanya menjadi lapisan baru dan ikut rata-rata tertimbang
+    on_hand = max(item["quantity"], 0)
+    fresh = quantity - min(max(-item["quantity"], 0), quantity)
+    if fresh:
+        item["layers"].append([fresh, fifo_cost])
+        item["average"] = (on_hand * item["average"] + fresh * average_cost) / (on_hand + fresh)
+    item["quantity"] += quantity
+
+
+def _stock_out(item, quantity, fallback, newest=False):
+    # Unit keluar diambil dari lapisan terlama (terbaru untuk retur pembelian); jika stok
+    # kurang, sisanya dibebankan dengan biaya terakhir yang diketahui
+    layers = item["layers"]
+    fifo, remaining = 0, quantity
+    while remaining and layers:
+        layer = layers[-1] if newest else layers[0]
+        take = min(remaining, layer[0])
+        fifo += take * layer[1]
+        remaining -= take
+        layer[0] -= take
+        if not newest:
+            item["last_cost"] = layer[1]
+        if not layer[0]:
+            layers.pop(-1 if newest else 0)
+    fifo += remaining * (item["last_cost"] or fallback)
+    item["quantity"] -= quantity
+    return fifo, quantity * (item["average"] or fallback)
+
+
+def _mark_stock(marks, product, item, day):
+    # Titik mulai: keadaan lengkap barang sebelum mutasi pertama tanggal `day`, dicatat
+    # setelah paling sedikit MARK_EVERY mutasi sejak titik sebelumnya
+    entry = marks.setdefault(product, {"days": [], "states": [], "count": 0})
+    if day is not None and entry["count"] >= MARK_EVERY:
+        entry["days"].append(day)
+        entry["states"].append(_copy_item(item))
+        entry["count"] = 0
+    entry["count"] += 1
+
+
+def move_stock(stock, collection, row, key=None, marks=None):
+    """Terapkan satu baris pembelian/penjualan ke keadaan stok barangnya.
+
+    Pembelian menambah lapisan biaya, retur pembelian mengeluarkan unit dari lapisan
+    terbaru, penjualan mengeluarkan unit dari lapisan terlama dan menambah HPP, dan retur
+    penjualan mengembalikan unit dengan biaya keluar terakhir sambil mengurangi HPP.
+    Jika `marks` diberikan, titik mulai hitung ulang barang dicatat di sana.
+    """
+    item = stock.setdefault(row["product"], empty_stock_item())
+    key = key or _movement_key(collection, row)
+    new_day = item["last"] is None or key[0] > item["last"][0]
+    if marks is not None:
+        _mark_stock(marks, row["product"], item, key[0] if new_day and item["last"] else None)
+    if new_day:
+        item["day_start"] = _snapshot(item)
+    quantity, price = row["quantity"], row["price"]
+    returned = row.get("payment_method", "").startswith("Retur")
+    if collection == "inventory" and not returned:
+        _stock_in(item, quantity, price, price)
+    elif collection == "inventory":
+        _stock_out(item, quantity, price, newest=True)
+    elif returned:
+        fifo, average = item["last_cost"] or price, item["average"] or price
+        _stock_in(item, quantity, fifo, average)
+        item["cogs"]["fifo"] -= quantity * fifo
+        item["cogs"]["average"] -= quantity * average
+    else:
+        fifo, average = _stock_out(item, quantity, price)
+        item["cogs"]["fifo"] += fifo
+        item["cogs"]["average"] += average
+    item["last"] = key
+
+
+def replay_stock(opening, movements, marks=None):
+    stock = {product: _copy_item(item) for product, item in opening.items()}
+    for key, name, row in movements:
+        move_stock(stock, name, row, key, marks)
+    return stock
+
+
+def _stock_movements(data):
+    # Semua mutasi aktif dalam urutan tanggal; baris yang dibatalkan dilewati dan sort
+    # stabil menjaga urutan catat di tanggal yang sama
+    movements = [
+        (_movement_key(name, row), name, row)
+        for name in TOTAL_COLLECTIONS for row in data[name] if VOID_KEY not in row
+    ]
+    movements.sort(key=lambda movement: movement[0])
+    return movements
+
+
+def _product_movements(data, product, since=None, skip=None, extra=None, include=None):
+    # Mutasi satu barang sejak ordinal `since` lewat indeks per barang; `skip` berisi posisi
+    # yang akan dihapus atau dibatalkan, `include` tombstone yang akan dipulihkan dan `extra`
+    # baris yang akan ditambahkan. Urutannya sama dengan `_stock_movements`.
+    since_date = None if since is None else date.fromordinal(since).isoformat()
+    movements = []
+    for name in TOTAL_COLLECTIONS:
+        excluded = set((skip or {}).get(name, ()))
+        included = set((include or {}).get(name, ()))
+        rows = data[name]
+        index = get_movement_index(data, name).get(product)
+        positions = index.positions_between(since_date) if index is not None else []
+        movements += [
+            (_movement_key(name, rows[i]), name, rows[i]) for i in positions
+            if i not in excluded and (VOID_KEY not in rows[i] or i in included)
+        ]
+        movements += [
+            (_movement_key(name, row), name, row) for row in (extra or {}).get(name, [])
+            if row["product"] == product and (since is None or date_to_ordinal(row["date"]) >= since)
+        ]
+    movements.sort(key=lambda movement: movement[0])
+    return movements
+
+
+def compute_stock(data):
+    # Saldo pembuka stok dari periode tertutup ditambah semua mutasi yang masih aktif
+    return replay_stock((data.get(CLOSING_KEY) or {}).get("stock", {}), _stock_movements(data))
+
+
+def get_stock(data):
+    if "stock" not in data:
+        data["stock"] = compute_stock(data)
+    return data["stock"]
+
+
+def _backdated_products(stock, rows):
+    # Barang yang menerima mutasi bertanggal sebelum mutasi terakhirnya
+    last = {product: item["last"] for product, item in stock.items()}
+    products = set()
+    for name, items in rows.items():
+        if name not in TOTAL_COLLECTIONS:
+            continue
+        for row in items:
+            key = _movement_key(name, row)
+            if last.get(row["product"]) and key < last[row["product"]]:
+                products.add(row["product"])
+            else:
+                last[row["product"]] = key
+    return products
+
+
+def stock_rebuilds(data, record, marks=None):
+    """Keadaan stok baru untuk barang yang tidak bisa diperbarui dengan menambah mutasi di ujung.
+
+    Penghapusan, pembatalan, pemulihan dan posting bertanggal mundur mengubah lapisan biaya
+    semua mutasi sesudahnya, jadi hanya barang itu yang dihitung ulang, mulai dari titik
+    mulai terakhir sebelum tanggal paling awal yang berubah (atau saldo pembuka periode
+    aktif jika belum ada), dengan mutasi yang diambil lewat indeks per barang. Posting yang
+    hanya mundur di dalam tanggal terakhir barang cukup diputar ulang dari awal hari itu.
+    Titik mulai baru barang yang dihitung ulang diisi ke `marks`. Dipanggil sebelum record
+    diterapkan; nilai None berarti barang tidak punya mutasi lagi.
+    """
+    opening = (data.get(CLOSING_KEY) or {}).get("stock", {})
+    stock = get_stock(data)
+    earliest = {}
+    if record["op"] == "post":
+        products = _backdated_products(stock, record["rows"])
+        changed = {name: rows for name, rows in record["rows"].items() if name in TOTAL_COLLECTIONS}
+        skip, extra, include = None, record["rows"], None
+    elif record["op"] in ("delete", "void", "restore"):
+        # Tombstone tidak lagi memengaruhi stok, jadi menghapusnya tidak perlu hitung ulang
+        restore = record["op"] == "restore"
+        changed = {
+            name: [data[name][i] for i in positions if restore or not is_void(data[name][i])]
+            for name, positions in record["rows"].items() if name in TOTAL_COLLECTIONS
+        }
+        products = {row["product"] for rows in changed.values() for row in rows}
+        skip, extra, include = (None, None, record["rows"]) if restore else (record["rows"], None, None)
+    else:
+        return {}
+    for rows in changed.values():
+        for row in rows:
+            if row["product"] in products:
+                ordinal = date_to_ordinal(row["date"])
+                earliest[row["product"]] = min(earliest.get(row["product"], ordinal), ordinal)
+    existing = data.get("_stock_marks", {})
+    rebuilt = {}
+    for product in sorted(products):
+        day, item, kept = earliest[product], stock.get(product), None
+        if record["op"] == "post" and item and item.get("day_start") and day >= item["last"][0]:
+            since, state = item["last"][0], item["day_start"]
+        else:
+            entry = existing.get(product) or {"days": [], "states": []}
+            at = bisect.bisect_right(entry["days"], day)
+            since, state = (entry["days"][at - 1], entry["states"][at - 1]) if at else (None, opening.get(product))
+            kept = {}
+        state = replay_stock(
+            {} if state is None else {product: state},
+            _product_movements(data, product, since, skip, extra, include), kept
+        ).get(product)
+        rebuilt[product] = state
+        if kept is not None and marks is not None:
+            fresh = kept.get(product, {"days": [], "states": [], "count": 0})
+            marks[product] = {
+                "days": entry["days"][:at] + fresh["days"],
+                "states": entry["states"][:at] + fresh["states"], "count": fresh["count"],
+            }
+    return rebuilt
+
+
+def stock_value(item, method="fifo"):
+    if method == "fifo":
+        return sum(quantity * cost for quantity, cost in item["layers"])
+    return max(item["quantity"], 0) * item["average"]
+
+
+def stock_report(data, method="fifo"):
+    # Stok di tangan, nilai persediaan dan HPP kumulatif per barang menurut metode biaya
+    report = []
+    for product, item in sorted(get_stock(data).items()):
+        value = stock_value(item, method)
+        report.append({
+            "product": product, "quantity": item["quantity"], "value": value,
+            "unit_cost": value / item["quantity"] if item["quantity"] > 0 else 0,
+            "cogs": item["cogs"][method]
+        })
+    return report
+
+
+def cost_of_goods_sold(data, method="fifo"):
+    return sum(item["cogs"][method] for item in get_stock(data).values())
+
+
+def stock_values(stock):
+    # Bentuk tanpa lapisan untuk dibandingkan dengan nested_drift
+    return {
+        product: {
+            "quantity": item["quantity"], "cogs": item["cogs"],
+            "value": {method: stock_value(item, method) for method in COST_METHODS}
+        }
+        for product, item in stock.items()
+    }
+
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    from dapur_kita_store import open_store
+
+    parser = argparse.ArgumentParser(description="Alat baris perintah buku besar Dapur Kita")
+    parser.add_argument("--data", default="dapur_kita_data.json")
+    parser.add_argument("--mode", default="wal", choices=("json", "wal", "sqlite"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    verify = commands.add_parser("verify", help="hitung ulang total dan rekap periode dari awal dan laporkan selisih")
+    verify.add_argument("--fix", action="store_true", help="simpan total hasil hitung ulang")
+    migrate = commands.add_parser("migrate", help="salin berkas data ke format biner terkompresi")
+    migrate.add_argument("--output", help="berkas tujuan (default: nama berkas data dengan akhiran .dkl)")
+    migrate.add_argument("--no-compress", action="store_true", help="tulis format biner tanpa kompresi zlib")
+    close = commands.add_parser("close", help="tutup buku sampai akhir periode dan arsipkan barisnya")
+    close.add_argument("period", help="YYYY untuk satu tahun atau YYYY-MM untuk satu bulan")
+    purge = commands.add_parser("purge", help="hapus permanen baris yang sudah lama dibatalkan")
+    purge.add_argument("--days", type=int, default=TOMBSTONE_DAYS, help=f"umur tombstone minimal (default: {TOMBSTONE_DAYS} hari)")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        from dapur_kita_store import migrate as migrate_file
+
+        try:
+            report = migrate_file(args.mode, args.data, args.output, not args.no_compress)
+        except (OSError, ValueError) as error:
+            print(error, file=sys.stderr)
+            return 1
+        print(f"{'Format':<8} {'Ukuran':>14} {'Muat':>9} {'Simpan':>9}")
+        for name in ("json", "binary"):
+            print(f"{name:<8} {report[name + '_bytes']:>12,} B {report[name + '_load']:>8.3f}s {report[name + '_save']:>8.3f}s")
+        print(f"Data disalin ke {report['output']}; pakai dengan DAPUR_KITA_DATA={report['output']}.")
+        return 0
+
+    store = open_store(args.mode, args.data)
+    if args.command == "purge":
+        from dapur_kita_store import open_ledger
+
+        ledger = open_ledger(store)
+        try:
+            counts = ledger.purge_tombstones(tombstone_cutoff(args.days))
+        finally:
+            ledger.close()
+        if not counts:
+            print(f"Tidak ada baris yang dibatalkan lebih dari {args.days} hari lalu.")
+        else:
+            print("Tombstone dihapus permanen: " + ", ".join(f"{name} {count}" for name, count in counts.items()))
+        return 0
+    if args.command == "close":
+        from dapur_kita_store import open_ledger
+
+        ledger = open_ledger(store)
+        try:
+            ledger.submit({"op": "close_period", "period": args.period}).result()
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 1
+        finally:
+            ledger.close()
+        closed = ledger.read()[CLOSING_KEY]
+        partition = closed["partitions"][-1]
+        print(f"Periode sampai {closed['through']} ditutup ke {partition['file']}: "
+              + ", ".join(f"{name} {count}" for name, count in partition["counts"].items()))
+        return 0
+
+    data = store.load()
+    if args.command == "verify":
+        # Hitung ulang lewat representasi kolumnar, terpisah dari jalur inkremental
+        from dapur_kita_columnar import ColumnarLedger
+
+        live = {name: [row for row in data[name] if not is_void(row)] for name in COLLECTIONS}
+        actual = merge_nested(ColumnarLedger.from_data(live).totals(), (data.get(CLOSING_KEY) or {}).get("totals", {}))
+        drift = verify_totals(data, actual)
+        for name, key, found, expected in drift:
+            print(f"{name} {key}: tersimpan {found:,.0f}, seharusnya {expected:,.0f}")
+        rollup_drift = nested_drift(data.get("rollups"), compute_rollups(data), "rollups")
+        rollup_drift += nested_drift(data.get("accounts"), compute_accounts(data), "accounts")
+        rollup_drift += nested_drift(stock_values(data.get("stock") or {}), stock_values(compute_stock(data)), "stock")
+        for path, found, expected in rollup_drift:
+            print(f"{path}: tersimpan {found:,.0f}, seharusnya {expected:,.0f}")
+        if not drift and not rollup_drift:
+            print("Total dan rekap periode sesuai dengan data.")
+            return 0
+        if args.fix:
+            data["totals"] = compute_totals(data)
+            data["rollups"] = compute_rollups(data)
+            data["accounts"] = compute_accounts(data)
+            data["stock"] = compute_stock(data)
+            store.save(data)
+            print("Total dan rekap periode diperbaiki.")
+            return 0
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+# ------------------- Konstanta -------------------
+# DAPUR_KITA_METRICS=1 mengaktifkan instrumentasi sejak awal; DAPUR_KITA_METRICS_FILE
+# menambahkan satu baris JSON per rerun ke berkas tersebut
+ENABLE_ENV = "DAPUR_KITA_METRICS"
+EXPORT_ENV = "DAPUR_KITA_METRICS_FILE"
+HISTORY = 200
+PERCENTILES = (50, 90, 99)
+
+
+# ------------------- Pencatat Metrik -------------------
+class Metrics:
+    """Waktu per bagian rerun dan penghitung sederhana, disimpan di memori proses.
+
+    Setiap rerun dicatat sebagai satu record berisi durasi total, durasi per span dan
+    penghitung. Record aktif disimpan per thread karena Streamlit menjalankan setiap
+    sesi di thread-nya sendiri. Pekerjaan yang dijalankan thread lain atas nama sebuah
+    rerun (misalnya penulis buku besar) dikumpulkan dengan `capture` lalu ditambahkan ke
+    rerun asalnya dengan `credit`; penghitung lain dari thread itu hanya masuk ke total
+    proses. Saat nonaktif, span dan penghitung langsung kembali setelah memeriksa satu
+    atribut.
+    """
+
+    def __init__(self, history=HISTORY):
+        self.enabled = False
+        self.export_path = None
+        self.reruns = deque(maxlen=history)
+        self.totals = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def enable(self, export_path=None):
+        self.export_path = export_path
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        self.local.current = None
+
+    def clear(self):
+        with self.lock:
+            self.reruns.clear()
+            self.totals = {}
+
+    def begin_rerun(self, label=None):
+        if not self.enabled:
+            return
+        self.local.current = {
+            "started": datetime.now().isoformat(timespec="milliseconds"),
+            "label": label,
+            "spans": {},
+            "counters": {},
+            "_start": time.perf_counter(),
+        }
+
+    def end_rerun(self):
+        record = getattr(self.local, "current", None)
+        if record is None:
+            return
+        self.local.current = None
+        record["duration"] = time.perf_counter() - record.pop("_start")
+        with self.lock:
+            self.reruns.append(record)
+            if self.export_path:
+                with open(self.export_path, "a") as f:
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def current(self):
+        # Record rerun yang sedang aktif di thread ini, None jika tidak ada
+        return getattr(self.local, "current", None)
+
+    @contextlib.contextmanager
+    def capture(self):
+        # Span dan penghitung di thread ini ditampung ke record sementara selama blok berjalan
+        captured = {"spans": {}, "counters": {}}
+        previous = self.current()
+        self.local.current = captured if self.enabled else None
+        try:
+            yield captured
+        finally:
+            self.local.current = previous
+
+    def credit(self, record, captured):
+        # Tambahkan hasil `capture` ke record rerun asal operasi
+        if record is None:
+            return
+        with self.lock:
+            for key in ("spans", "counters"):
+                for name, value in captured[key].items():
+                    record[key][name] = record[key].get(name, 0) + value
+
+    def label(self, label):
+        record = getattr(self.local, "current", None)
+        if record is not None:
+            record["label"] = label
+
+    def add_span(self, name, seconds):
+        record = getattr(self.local, "current", None)
+        if record is not None:
+            record["spans"][name] = record["spans"].get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.totals[name] = self.totals.get(name, 0) + amount
+        record = getattr(self.local, "current", None)
+        if record is not None:
+            record["counters"][name] = record["counters"].get(name, 0) + amount
+
+    def timed(self, name=None):
+        # Dekorator span; nama default adalah nama fungsi
+        def decorate(fn):
+            span = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.add_span(span, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def summary(self):
+        # Persentil durasi per span, hanya dari rerun yang benar-benar menjalankan span itu
+        with self.lock:
+            reruns = list(self.reruns)
+        if not reruns:
+            return []
+        names = ["rerun"] + sorted({span for record in reruns for span in record["spans"]})
+        rows = []
+        for span in names:
+            values = np.array([
+                record["duration"] if span == "rerun" else record["spans"][span]
+                for record in reruns
+                if span == "rerun" or span in record["spans"]
+            ])
+            row = {"span": span, "count": len(values), "mean_ms": values.mean() * 1000}
+            for pct, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                row[f"p{pct}_ms"] = value * 1000
+            rows.append(row)
+        return rows
+
+    def recent(self, limit=50):
+        with self.lock:
+            return list(self.reruns)[-limit:][::-1]
+
+
+def configured_export():
+    # Berkas ekspor hanya diambil dari lingkungan proses, tidak pernah dari input pengguna
+    return os.environ.get(EXPORT_ENV) or None
+
+
+metrics = Metrics()
+if os.environ.get(ENABLE_ENV, "") not in ("", "0"):
+    metrics.enable(configured_export())
@@ -0,0 +1,219 @@
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dapur_kita_ledger import COST_METHODS, get_accounts, get_stock, get_totals, merge_nested, stock_value
+from dapur_kita_store import _write_json_atomic, file_signature, open_store, sidecar_base
+
+# ------------------- Konstanta -------------------
+# Lebih dari ini, shard yang berubah dihitung di proses pekerja secara paralel
+POOL_THRESHOLD = 1
+# Peta nama toko → berkas buku besar, disimpan di samping berkas dasar
+STORE_MAP_SUFFIX = ".stores.json"
+
+_STORE_MAP_LOCK = threading.Lock()
+_REPORTS = {}
+_REPORTS_LOCK = threading.Lock()
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+# ------------------- Shard per Toko -------------------
+def parse_stores(value):
+    # "Pusat, Cabang Timur" -> ["Pusat", "Cabang Timur"]; nama kembar tetap ikut dan ditolak `check_stores`
+    names = [name.strip() for name in (value or "").split(",")]
+    return [name for name in names if name]
+
+
+def store_slug(store):
+    return re.sub(r"[^a-z0-9]+", "-", store.lower()).strip("-") or "toko"
+
+
+def check_stores(stores):
+    # Nama toko yang slug-nya sama akan berbagi berkas buku besar, jadi ditolak sejak awal
+    seen = {}
+    for store in stores:
+        slug = store_slug(store)
+        if seen.get(slug) == store:
+            raise ValueError(f"Toko {store!r} tercantum lebih dari sekali; hapus salah satunya.")
+        if slug in seen:
+            raise ValueError(f"Toko {seen[slug]!r} dan {store!r} memakai nama berkas yang sama ({slug}); ganti salah satu nama.")
+        seen[slug] = store
+    return stores
+
+
+def store_map_path(base):
+    return sidecar_base(base) + STORE_MAP_SUFFIX
+
+
+def load_store_map(base):
+    try:
+        with open(store_map_path(base), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def shard_paths(base, stores):
+    """Berkas buku besar setiap toko di `stores` ({toko: path}) menurut peta toko yang tersimpan.
+
+    Toko yang sudah tercatat selalu memakai berkas yang tercatat, apa pun urutannya di
+    daftar. Toko baru dicatat dengan berkas berakhiran nama tokonya; hanya saat peta belum
+    ada, toko pertama mendapat `base` agar data yang sudah ada tetap milik toko utama. Nama
+    yang slug-nya kembar atau berkasnya sudah dicatat untuk toko lain ditolak dengan
+    ValueError. Semua berkas turunan (log, cache, ringkasan, arsip, database) mengikuti
+    nama berkas shard.
+    """
+    check_stores(stores)
+    with _STORE_MAP_LOCK:
+        mapping = load_store_map(base)
+        owners = {path: store for store, path in mapping.items()}
+        root, ext = os.path.splitext(base)
+        added = False
+        for store in stores:
+            if store in mapping:
+                continue
+            path = base if not mapping else f"{root}_{store_slug(store)}{ext}"
+            if path in owners:
+                raise ValueError(f"Berkas {path} sudah dipakai toko {owners[path]!r}; ganti nama toko {store!r}.")
+            mapping[store], owners[path], added = path, store, True
+        if added:
+            _write_json_atomic(store_map_path(base), mapping)
+    return {store: mapping[store] for store in stores}
+
+
+# ------------------- Agregasi per Shard -------------------
+def shard_report(mode, path):
+    """Angka satu shard untuk laporan gabungan, dihitung dari ringkasan store saja.
+
+    Hasilnya struktur bertingkat berisi angka (total pembelian/pendapatan, HPP per metode
+    biaya, saldo akun dan rincian per barang), sehingga beberapa shard cukup dijumlahkan
+    dengan `merge_nested`. Dijalankan di proses pekerja, jadi hanya hasil kecil ini yang
+    dikirim balik, bukan isi buku besar.
+    """
+    summary = open_store(mode, path).load_summary()
+    totals = get_totals(summary)
+    stock = get_stock(summary)
+    products = {}
+    for collection, field in (("inventory", "purchases"), ("sales", "sales")):
+        for product, amount in totals[collection]["by_product"].items():
+            products.setdefault(product, {})[field] = amount
+    for product, item in stock.items():
+        products.setdefault(product, {}).update({
+            "quantity": item["quantity"], "cogs": dict(item["cogs"]),
+            "value": {method: stock_value(item, method) for method in COST_METHODS},
+        })
+    return {
+        "purchases": totals["inventory"]["total"],
+        "sales": totals["sales"]["total"],
+        "cogs": {method: sum(item["cogs"][method] for item in stock.values()) for method in COST_METHODS},
+        "accounts": {account: dict(bucket) for account, bucket in get_accounts(summary).items()},
+        "products": products,
+    }
+
+
+def _pool(workers):
+    # Proses pekerja dibuat sekali lalu dipakai ulang; "spawn" agar pekerja tidak mewarisi
+    # kunci yang sedang dipegang thread penulis saat fork
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+
+def shutdown_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown()
+            _POOL = None
+
+
+def shard_reports(mode, paths, workers=None):
+    """Laporan per shard untuk `paths` ({toko: path}), dengan cache per shard.
+
+    Tanda tangan berkas (mtime dan ukuran) setiap shard dibandingkan dengan saat laporannya
+    dihitung; hanya shard yang berubah dihitung ulang, dan jika lebih dari `POOL_THRESHOLD`
+    shard berubah semuanya dikirim ke process pool sekaligus. Tanda tangan diambil sebelum
+    menghitung, jadi posting yang masuk selama perhitungan membuat shard itu dihitung lagi
+    pada panggilan berikutnya. Hasilnya ({toko: laporan}, daftar toko yang dihitung ulang).
+    """
+    signatures = {store: file_signature(open_store(mode, path).files()) for store, path in paths.items()}
+    reports, stale = {}, []
+    with _REPORTS_LOCK:
+        for store, path in paths.items():
+            cached = _REPORTS.get((mode, path))
+            if cached and cached[0] == signatures[store]:
+                reports[store] = cached[1]
+            else:
+                stale.append(store)
+    if len(stale) > POOL_THRESHOLD:
+        pool = _pool(workers)
+        futures = {store: pool.submit(shard_report, mode, paths[store]) for store in stale}
+        fresh = {store: future.result() for store, future in futures.items()}
+    else:
+        fresh = {store: shard_report(mode, paths[store]) for store in stale}
+    with _REPORTS_LOCK:
+        for store, report in fresh.items():
+            _REPORTS[(mode, paths[store])] = (signatures[store], report)
+    reports.update(fresh)
+    return {store: reports[store] for store in paths}, stale
+
+
+def consolidate(reports):
+    # Jumlah semua shard; bentuknya sama dengan laporan satu shard
+    total = {}
+    for report in reports.values():
+        merge_nested(total, report)
+    return total
+
+
+def reset_reports():
+    with _REPORTS_LOCK:
+        _REPORTS.clear()
+
+
+# ------------------- CLI -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Laporan gabungan semua toko Dapur Kita")
+    parser.add_argument("--data", default="dapur_kita_data.json", help="berkas dasar buku besar; peta toko disimpan di sampingnya")
+    parser.add_argument("--mode", default="wal", choices=("json", "wal", "sqlite"))
+    parser.add_argument("--stores", default=os.environ.get("DAPUR_KITA_STORES", ""), help="nama toko dipisah koma")
+    parser.add_argument("--method", default="fifo", choices=COST_METHODS)
+    parser.add_argument("--workers", type=int, help="jumlah proses pekerja (default: jumlah CPU)")
+    args = parser.parse_args(argv)
+
+    stores = parse_stores(args.stores)
+    if not stores:
+        print("Belum ada toko; isi --stores atau DAPUR_KITA_STORES.", file=sys.stderr)
+        return 1
+    try:
+        paths = shard_paths(args.data, stores)
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    try:
+        reports, _ = shard_reports(args.mode, paths, args.workers)
+    finally:
+        shutdown_pool()
+    elapsed = time.perf_counter() - start
+    rows = dict(reports, **{"Gabungan": consolidate(reports)})
+    print("Toko\tBerkas\tPembelian\tPendapatan\tHPP\tLaba Kotor")
+    for store, report in rows.items():
+        cogs = report.get("cogs", {}).get(args.method, 0)
+        sales = report.get("sales", 0)
+        print(f"{store}\t{paths.get(store, '-')}\t{report.get('purchases', 0):,.0f}\t{sales:,.0f}\t{cogs:,.0f}\t{sales - cogs:,.0f}")
+    print(f"{len(stores)} toko dihitung dalam {elapsed:.2f} detik.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1277 @@
+import bisect
+import json
+import os
+import pickle
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date
+
+from dapur_kita_ledger import (
+    CLOSING_KEY, COLLECTIONS, DERIVED_KEYS, RECENT_ROWS, TOMBSTONE_DAYS, TOTAL_COLLECTIONS, VOID_KEY, apply_record,
+    apply_to_summary, date_to_ordinal, empty_data, empty_rollups, empty_totals, get_accounts, get_date_index,
+    get_rollups, get_stock, get_totals, get_voids, live_positions, marked_rows, merge_rows, period_keys, persistable,
+    purge_positions, resolve_operation, summarize, tombstone_cutoff
+)
+from dapur_kita_archive import file_signature, partition_data
+from dapur_kita_integrity import check_change, check_posting, posting_error
+from dapur_kita_columnar import MAGIC, is_packed, pack_ledger, unpack_ledger
+from dapur_kita_metrics import metrics
+
+# ------------------- Konstanta -------------------
+SEQ_KEY = "wal_seq"
+# Berkas data berakhiran ini ditulis dalam format biner (lihat `pack_ledger`)
+BINARY_SUFFIX = ".dkl"
+# Tanda tangan berkas JSON yang disalin, disimpan di dalam berkas cache biner
+CACHE_KEY = "cache_signature"
+# Kunci selain koleksi yang disimpan di tabel meta SQLite
+META_KEYS = ("totals", CLOSING_KEY)
+# Struktur turunan SQLite yang disimpan satu baris per kunci: tabel -> kolom kuncinya
+KEYED_TABLES = {"rollups": ("grain", "collection", "period"), "accounts": ("account",), "stock": ("product",)}
+# Penanda di tabel meta bahwa struktur turunan sudah dipindah ke KEYED_TABLES
+KEYED_MARK = "keyed_tables"
+# Koleksi yang ikut rekap periode
+ROLLUP_COLLECTIONS = TOTAL_COLLECTIONS + ("journal_entries",)
+# Paling banyak sekian nilai per kueri IN, di bawah batas parameter SQLite
+SQL_CHUNK = 500
+# Selang (detik) penulis yang menganggur memeriksa tombstone yang sudah boleh dibuang
+PURGE_EVERY = 600
+# Record yang mengubah baris tersimpan dan diperiksa `check_change` sebelum diterapkan
+CHANGE_OPS = ("void", "restore", "delete")
+
+# Kolom yang diindeks per koleksi; baris lengkap tetap disimpan utuh sebagai JSON
+INDEXED_FIELDS = {
+    "inventory": {"date": "date", "product": "product"},
+    "transactions": {"date": "date", "product": "type"},
+    "sales": {"date": "date", "product": "product"},
+    "journal_entries": {"date": "date", "account": "account"},
+}
+
+_STORES = {}
+_LEDGERS = {}
+_STORES_LOCK = threading.Lock()
+
+
+# ------------------- Fungsi Utilitas -------------------
+def match_row(collection, row, product=None, account=None):
+    # Filter tanggal ditangani indeks tanggal; di sini hanya barang dan akun
+    fields = INDEXED_FIELDS[collection]
+    if product and ("product" not in fields or row.get(fields["product"]) != product):
+        return False
+    if account and ("account" not in fields or row.get(fields["account"]) != account):
+        return False
+    return True
+
+
+def in_dates(row, date_from=None, date_to=None):
+    ordinal = date_to_ordinal(row["date"])
+    return (not date_from or ordinal >= date_to_ordinal(date_from)) and (not date_to or ordinal <= date_to_ordinal(date_to))
+
+
+def sql_date(value):
+    # Kolom tanggal SQLite dibandingkan sebagai teks, jadi selalu ditulis dan dicari dalam
+    # bentuk baku; "2024-1-5" dan "2024-01-05" menjadi nilai yang sama
+    return period_keys(value)["daily"] if value else value
+
+
+def _chunks(values, size=SQL_CHUNK):
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def _op_rows(op):
+    # (koleksi, kunci dari `fetch`, baris yang diharapkan) yang dirujuk operasi halaman
+    if op["op"] in ("delete_transaction", "void_transaction", "restore_transaction"):
+        return [(op.get("collection", "transactions"), op["position"], op["expect"])]
+    if op["op"] in ("delete_rows", "void_rows", "restore_rows"):
+        return [(name, key, row) for name, items in op["rows"].items() for key, row in items]
+    return []
+
+
+def _row_keys(name, row, rollup_keys, products):
+    # Kunci rekap (grain, koleksi, periode) dan barang yang berubah bila baris ini berubah
+    if name in ROLLUP_COLLECTIONS:
+        rollup_keys.update((grain, name, period) for grain, period in period_keys(row["date"]).items())
+    if name in TOTAL_COLLECTIONS:
+        products.add(row["product"])
+
+
+def _touched_keys(records):
+    # Kunci rekap dan barang yang bisa berubah oleh `records`; tombstone yang dihapus sudah
+    # tidak ikut di struktur turunan, jadi dilewati
+    rollup_keys, products = set(), set()
+    for record in records:
+        if record["op"] == "post":
+            changed = record["rows"]
+        else:
+            changed = record["restored"] if record["op"] == "restore" else record["removed"]
+        for name, rows in changed.items():
+            for row in rows:
+                if record["op"] in ("delete", "close") and VOID_KEY in row:
+                    continue
+                _row_keys(name, row, rollup_keys, products)
+        products.update(record.get("stock", ()))
+    return rollup_keys, products
+
+
+def sidecar_base(path):
+    # Berkas turunan (log, cache, ringkasan, arsip) dinamai dari nama berkas lengkap, agar
+    # data.json dan data.dkl hasil migrasi tidak berbagi log atau arsip; hanya .json yang
+    # tetap memakai nama tanpa akhiran seperti sebelumnya
+    root, ext = os.path.splitext(path)
+    return root if ext == ".json" else path
+
+
+def _write_json_atomic(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+        metrics.count("bytes_written", f.tell())
+    os.replace(tmp_path, path)
+
+
+def _write_bytes_atomic(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    metrics.count("bytes_written", len(payload))
+    os.replace(tmp_path, path)
+
+
+# ------------------- Penyimpanan JSON -------------------
+class JsonStore:
+    """Seluruh data disimpan sebagai satu file JSON dan ditulis ulang setiap kali disimpan.
+
+    Di samping file JSON ada dua berkas turunan yang boleh dihapus kapan saja:
+    `.cache` berisi salinan file JSON dalam format biner kolumnar tanpa kompresi (lihat
+    `pack_ledger`; dimuat lebih cepat daripada parse JSON dan, tidak seperti pickle, tidak
+    bisa menjalankan kode saat dibaca) dan `.summary.json` berisi ringkasan (lihat
+    `summarize`) untuk halaman yang hanya butuh total. Keduanya hanya dipakai selama mtime
+    dan ukuran file JSON masih sama dengan saat berkas turunan itu ditulis.
+
+    Jika nama file berakhiran `BINARY_SUFFIX`, data ditulis dalam format biner kolumnar
+    (terkompresi zlib kecuali `compress=False`) dan salinan cache tidak diperlukan.
+    Format file dikenali dari isinya saat dimuat, apa pun akhiran namanya.
+    """
+
+    # Store ini mencari baris lewat data lengkap di memori
+    partial_reads = False
+    # Penulis menerapkan operasi ke data lengkap di memori (lihat `SqliteStore.load_for`)
+    partial_writes = False
+
+    def __init__(self, path, compress=True):
+        self.path = path
+        self.binary = path.endswith(BINARY_SUFFIX)
+        self.compress = compress
+        base = sidecar_base(path)
+        self.cache_path = base + ".cache"
+        self.summary_path = base + ".summary.json"
+        self.archive_dir = base + ".archive"
+
+    def _write_file(self, data):
+        if self.binary:
+            _write_bytes_atomic(self.path, pack_ledger(data, self.compress))
+        else:
+            _write_json_atomic(self.path, data)
+            self._write_cache(data, file_signature([self.path]))
+
+    def _stage_file(self, data):
+        # Isi berkas data ditulis dan di-fsync ke berkas sementara; pemanggil yang memasangnya
+        tmp_path = self.path + ".stage.tmp"
+        payload = pack_ledger(data, self.compress) if self.binary else json.dumps(data, indent=2).encode()
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.count("bytes_written", len(payload))
+        return tmp_path
+
+    def _write_cache(self, data, signature):
+        _write_bytes_atomic(self.cache_path, pack_ledger(dict(data, **{CACHE_KEY: signature}), compress=False))
+
+    def _read_cache(self, signature):
+        try:
+            with open(self.cache_path, "rb") as f:
+                blob = f.read()
+            if not is_packed(blob):
+                return None
+            cached = unpack_ledger(blob)
+        except Exception:
+            # Cache rusak atau dari versi lama (pickle) diabaikan lalu ditulis ulang
+            return None
+        stored = cached.pop(CACHE_KEY, None)
+        if stored is None or tuple(tuple(part) for part in stored) != signature:
+            return None
+        return cached
+
+    def _read_snapshot(self):
+        with open(self.path, "rb") as f:
+            if is_packed(f.read(len(MAGIC))):
+                f.seek(0)
+                return unpack_ledger(f.read())
+        signature = file_signature([self.path])
+        cached = self._read_cache(signature)
+        if cached is not None:
+            return cached
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        self._write_cache(data, signature)
+        return data
+
+    def _write_summary(self, data, **extra):
+        # Dipanggil tepat setelah file JSON ditulis, sehingga tanda tangannya masih sama
+        summary = dict(summarize(data), signature=file_signature([self.path]), **extra)
+        _write_json_atomic(self.summary_path, summary)
+
+    def _read_summary(self):
+        try:
+            with open(self.summary_path, "r") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            return None
+        signature = summary.pop("signature", None)
+        if signature is None or tuple(tuple(part) for part in signature) != file_signature([self.path]):
+            return None
+        # Ringkasan versi lama tanpa struktur turunan terbaru dibangun ulang dari data lengkap
+        if any(key not in summary for key in DERIVED_KEYS):
+            return None
+        return summary
+
+    def load(self):
+        if os.path.exists(self.path):
+            data = self._read_snapshot()
+            metrics.count("rows_loaded", sum(len(data.get(name, ())) for name in COLLECTIONS))
+            return data
+        return empty_data()
+
+    def load_summary(self):
+        if not os.path.exists(self.path):
+            return summarize(empty_data())
+        return self._read_summary() or summarize(self.load())
+
+    def save(self, data):
+        if self.binary:
+            _write_bytes_atomic(self.path, pack_ledger(persistable(data), self.compress))
+        else:
+            _write_json_atomic(self.path, persistable(data))
+        self._write_summary(data)
+
+    def commit(self, data, record):
+        self.commit_batch(data, [record])
+
+    def commit_batch(self, data, records):
+        self._write_partitions(records)
+        self.save(data)
+
+    def _write_partitions(self, records):
+        # Berkas partisi ditulis sebelum record tutup buku disimpan, lalu dibuat hanya-baca
+        for record in records:
+            if record["op"] != "close":
+                continue
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = os.path.join(self.archive_dir, record["file"])
+            if os.path.exists(path):
+                # Direktori arsip hanya milik berkas data ini dan periode yang sudah ditutup
+                # ditolak sebelum sampai sini, jadi berkas yang ada adalah sisa tutup buku
+                # yang gagal disimpan dan belum pernah dirujuk oleh data
+                os.chmod(path, 0o644)
+            _write_bytes_atomic(path, pack_ledger(partition_data(record)))
+            os.chmod(path, 0o444)
+
+    def files(self):
+        return [self.path]
+
+    def sidecars(self):
+        # Semua berkas milik store ini; migrasi menolak tujuan yang salah satunya sudah ada
+        return [self.path, self.cache_path, self.summary_path, self.archive_dir]
+
+    def close(self):
+        pass
+
+    def signature(self):
+        return file_signature(self.files())
+
+    def position(self, data, collection, key):
+        # Kunci baris dari `fetch` store ini sudah berupa posisi di koleksi
+        return key
+
+    def _candidates(self, data, collection, date_from=None, date_to=None):
+        if date_from or date_to:
+            return get_date_index(data, collection).positions_between(date_from, date_to)
+        return range(len(data[collection]))
+
+    def _tombstones(self, data, collection, date_from=None, date_to=None, **filters):
+        # Daftar tombstone kecil (dibuang berkala oleh pemadatan), jadi cukup disaring langsung
+        rows = data[collection]
+        return [
+            (i, rows[i]) for i in get_voids(data)[collection]
+            if in_dates(rows[i], date_from, date_to) and match_row(collection, rows[i], **filters)
+        ]
+
+    def fetch(self, data, collection, limit=None, offset=0, date_from=None, date_to=None, voided=False, **filters):
+        # Hasilnya pasangan (posisi di koleksi, baris); baris yang dibatalkan hanya muncul
+        # dengan `voided=True`. Tanpa filter cukup diiris, melompati tombstone lewat bisect
+        end = None if limit is None else offset + limit
+        rows = data[collection]
+        if voided:
+            return self._tombstones(data, collection, date_from, date_to, **filters)[offset:end]
+        voids = get_voids(data)[collection]
+        if not any(filters.values()):
+            if not date_from and not date_to:
+                if not voids:
+                    return list(enumerate(rows[offset:end], start=offset))
+                return [(i, rows[i]) for i in live_positions(voids, len(rows), offset, limit)]
+            positions = self._candidates(data, collection, date_from, date_to)
+            if voids:
+                skip = set(voids)
+                positions = [i for i in positions if i not in skip]
+            return [(i, rows[i]) for i in positions[offset:end]]
+        skip = set(voids)
+        matches, scanned, skipped = [], 0, 0
+        for i in self._candidates(data, collection, date_from, date_to):
+            scanned += 1
+            if i in skip or not match_row(collection, rows[i], **filters):
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            matches.append((i, rows[i]))
+            if end is not None and len(matches) >= limit:
+                break
+        metrics.count("rows_scanned", scanned)
+        return matches
+
+    def count(self, data, collection, date_from=None, date_to=None, voided=False, **filters):
+        tombstones = len(self._tombstones(data, collection, date_from, date_to, **filters))
+        if voided:
+            return tombstones
+        if not any(filters.values()):
+            if not date_from and not date_to:
+                return len(data[collection]) - tombstones
+            return get_date_index(data, collection).count(date_from, date_to) - tombstones
+        rows = data[collection]
+        candidates = self._candidates(data, collection, date_from, date_to)
+        metrics.count("rows_scanned", len(candidates))
+        return sum(1 for i in candidates if match_row(collection, rows[i], **filters)) - tombstones
+
+    def iter_rows(self, data, collection, chunk_size=1000, date_from=None, date_to=None, **filters):
+        # Baris aktif yang cocok dikirim per potongan, berurutan sesuai urutan catat
+        rows = data[collection]
+        skip = set(get_voids(data)[collection])
+        chunk = []
+        for i in self._candidates(data, collection, date_from, date_to):
+            if i not in skip and match_row(collection, rows[i], **filters):
+                chunk.append(rows[i])
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+
+# ------------------- Penyimpanan Write-Ahead Log -------------------
+class WalStore(JsonStore):
+    """Snapshot JSON ditambah log append-only; setiap posting cukup menambah satu baris log.
+
+    Log dilipat ke snapshot setiap `compact_every` record oleh thread pemadat di latar
+    belakang: salinan data di memori ditulis sebagai snapshot di luar kunci, lalu snapshot
+    dipasang dan log dipangkas sampai nomor urut snapshot dalam satu kunci singkat, jadi
+    posting tidak menunggu penulisan snapshot. Nomor urut record yang sudah masuk snapshot
+    disimpan di snapshot, sehingga record yang sama tidak diputar ulang walaupun proses
+    berhenti di tengah pemadatan.
+    """
+
+    def __init__(self, path, log_path=None, compact_every=500, compress=True):
+        super().__init__(path, compress)
+        self.log_path = log_path or sidecar_base(path) + ".log"
+        self.compact_every = compact_every
+        self.seq = None
+        self.pending = 0
+        self.lock = threading.RLock()
+        self.compactor = None
+        # Tanda tangan berkas sesudah pemadatan sendiri → tanda tangan sebelumnya
+        self.aliases = {}
+
+    def files(self):
+        return [self.path, self.log_path]
+
+    def signature(self):
+        # Pemadatan tidak mengubah isi data, jadi salinan di memori tidak perlu dimuat ulang
+        with self.lock:
+            signature = file_signature(self.files())
+            return self.aliases.get(signature, signature)
+
+    def sidecars(self):
+        return super().sidecars() + [self.log_path]
+
+    def _read_log(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Baris terakhir yang terpotong (crash saat menulis) diabaikan
+                    return
+
+    def _load_with_seq(self):
+        data = super().load()
+        seq = data.pop(SEQ_KEY, 0)
+        pending = 0
+        for record in self._read_log():
+            if record["seq"] <= seq:
+                continue
+            apply_record(data, record)
+            seq = record["seq"]
+            pending += 1
+        return data, seq, pending
+
+    def load(self):
+        with self.lock:
+            data, self.seq, self.pending = self._load_with_seq()
+            return data
+
+    def load_summary(self):
+        # Ringkasan snapshot ditambah record log yang lebih baru; log lama tanpa isi baris
+        # yang dihapus membuat ringkasan dibangun dari data lengkap
+        with self.lock:
+            summary = self._read_summary() if os.path.exists(self.path) else summarize(empty_data())
+            if summary is not None:
+                seq = summary.pop(SEQ_KEY, 0)
+                for record in self._read_log():
+                    if record["seq"] <= seq:
+                        continue
+                    if not apply_to_summary(summary, record):
+                        summary = None
+                        break
+            return summary or summarize(self.load())
+
+    def _write_snapshot(self, data, seq):
+        self._write_file(dict(persistable(data), **{SEQ_KEY: seq}))
+        self._write_summary(data, **{SEQ_KEY: seq})
+        open(self.log_path, "w").close()
+        self.pending = 0
+
+    def save(self, data):
+        # Pemadatan yang sedang berjalan diselesaikan dulu agar tidak memasang snapshot lama
+        self.wait_compaction()
+        with self.lock:
+            if self.seq is None:
+                self.load()
+            self._write_snapshot(data, self.seq)
+
+    def commit_batch(self, data, records):
+        # Satu kali tulis dan satu fsync untuk seluruh record dalam batch
+        with self.lock:
+            if self.seq is None:
+                self.load()
+            self._write_partitions(records)
+            lines = []
+            for record in records:
+                self.seq += 1
+                # Kunci berawalan "_" hanya untuk memori; baris yang ditutup sudah ada di partisi
+                record = {
+                    key: value for key, value in record.items()
+                    if not key.startswith("_") and not (record["op"] == "close" and key == "removed")
+                }
+                lines.append(json.dumps(dict(record, seq=self.seq), separators=(",", ":")) + "\n")
+            payload = "".join(lines)
+            with open(self.log_path, "a") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            metrics.count("bytes_written", len(payload))
+            self.pending += len(records)
+            if self.pending >= self.compact_every and self.compactor is None:
+                # Baris tidak pernah diubah di tempat (pembatalan mengganti barisnya), jadi
+                # koleksi cukup disalin dangkal; struktur turunan yang diubah di tempat disalin
+                # lewat pickle, jauh lebih cepat daripada deepcopy
+                snapshot = {
+                    key: list(value) if key in COLLECTIONS else pickle.loads(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                    for key, value in persistable(data).items()
+                }
+                # Bukan daemon: proses menunggu snapshot selesai ditulis sebelum keluar
+                self.compactor = threading.Thread(
+                    target=self._compact_snapshot, args=(snapshot, self.seq), name="dapur-kita-compactor"
+                )
+                self.compactor.start()
+
+    def _compact_snapshot(self, data, seq):
+        try:
+            tmp_path = self._stage_file(dict(data, **{SEQ_KEY: seq}))
+            summary = dict(summarize(data), **{SEQ_KEY: seq})
+            with self.lock:
+                before = self.signature()
+                os.replace(tmp_path, self.path)
+                self._truncate_log(seq)
+                signature = file_signature([self.path])
+                self.aliases = {file_signature(self.files()): before}
+            # Ringkasan ditandai tanda tangan snapshot ini sehingga tidak dipakai jika snapshot
+            # sudah diganti lagi. Cache biner tidak ditulis di sini: pengemasannya memegang GIL
+            # cukup lama dan menahan thread penulis; cache dibuat ulang saat muat berikutnya
+            _write_json_atomic(self.summary_path, dict(summary, signature=signature))
+        finally:
+            self.compactor = None
+
+    def _truncate_log(self, seq):
+        # Hanya record sesudah `seq` yang tersisa; dipanggil dengan kunci dipegang
+        lines = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r") as f:
+                for line in f:
+                    try:
+                        if json.loads(line)["seq"] > seq:
+                            lines.append(line)
+                    except ValueError:
+                        break
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self.pending = len(lines)
+
+    def wait_compaction(self):
+        compactor = self.compactor
+        if compactor is not None:
+            compactor.join()
+
+    def close(self):
+        self.wait_compaction()
+
+    def compact(self):
+        # Pemadatan langsung (misalnya sebelum migrasi); snapshot dibangun ulang dari disk
+        self.wait_compaction()
+        with self.lock:
+            data, self.seq, _ = self._load_with_seq()
+            self._write_snapshot(data, self.seq)
+
+
+# ------------------- Penyimpanan SQLite -------------------
+class SqliteStore(JsonStore):
+    """Satu tabel per koleksi di SQLite dengan indeks tanggal, barang, akun dan tx_id.
+
+    Posting dan penghapusan hanya menyentuh baris yang berubah di dalam satu transaksi
+    database, dan halaman dapat mengambil baris yang ditampilkan saja lewat `fetch`.
+    Baris halaman dikenali dengan id-nya, bukan posisi; `position` menerjemahkan id ke
+    posisi lewat daftar id yang dibawa data hasil `load`/`load_for` dan diikuti oleh commit.
+    Rekap periode, saldo akun dan stok disimpan satu baris per kunci (lihat `KEYED_TABLES`),
+    total dan keadaan tutup buku di tabel `meta`; commit hanya menulis kunci yang disentuh
+    record-nya. Penulis tidak memuat seluruh buku besar: `load_for` mengambil baris dan
+    kunci turunan yang dibutuhkan operasinya saja.
+    Jika database belum ada tetapi file JSON lama ada, isinya disalin sekali saat dibuka.
+    """
+
+    partial_reads = True
+    partial_writes = True
+
+    def __init__(self, path, db_path=None):
+        super().__init__(path)
+        self.db_path = db_path or os.path.splitext(path)[0] + ".db"
+        self.lock = threading.RLock()
+        # Batas halaman yang sudah diambil: (tanda tangan, {kueri: {offset: id terakhir}})
+        self.bounds = (None, {})
+        is_new = not os.path.exists(self.db_path)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        self._migrate_meta()
+        if is_new and os.path.exists(self.path):
+            self.save(JsonStore.load(self))
+
+    def files(self):
+        return [self.db_path, self.db_path + "-wal"]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def _create_schema(self):
+        with self.conn:
+            for name, fields in INDEXED_FIELDS.items():
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT, product TEXT, account TEXT, doc TEXT NOT NULL, "
+                    "voided INTEGER NOT NULL DEFAULT 0, tx_id TEXT)"
+                )
+                columns = {column[1] for column in self.conn.execute(f"PRAGMA table_info({name})")}
+                # Database dari versi sebelum pembatalan belum punya kolom penanda tombstone
+                if "voided" not in columns:
+                    self.conn.execute(f"ALTER TABLE {name} ADD COLUMN voided INTEGER NOT NULL DEFAULT 0")
+                # Kolom tx_id dipakai penulis untuk memuat baris satu posting saja; diisi sekali dari dokumen
+                if "tx_id" not in columns:
+                    self.conn.execute(f"ALTER TABLE {name} ADD COLUMN tx_id TEXT")
+                    docs = self.conn.execute(f"SELECT id, doc FROM {name}").fetchall()
+                    linked = [(json.loads(doc).get("tx_id"), row_id) for row_id, doc in docs]
+                    self.conn.executemany(
+                        f"UPDATE {name} SET tx_id = ? WHERE id = ?", [(tx_id, row_id) for tx_id, row_id in linked if tx_id]
+                    )
+                # Database lama bisa menyimpan tanggal tanpa nol di depan; dibakukan sekali
+                unpadded = self.conn.execute(f"SELECT id, date FROM {name} WHERE length(date) != 10").fetchall()
+                self.conn.executemany(
+                    f"UPDATE {name} SET date = ? WHERE id = ?", [(sql_date(day), row_id) for row_id, day in unpadded]
+                )
+                # Semua kueri halaman menyaring `voided` lalu kolom filter dan diurutkan menurut id,
+                # yang sudah ikut di setiap indeks sebagai rowid. Indeks barang ikut tanggal agar
+                # mutasi satu barang sejak suatu tanggal (lihat `load_for`) tidak membaca baris lain
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_voided ON {name} (voided)")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_tx_id ON {name} (tx_id)")
+                for column in fields:
+                    if column == "product":
+                        self.conn.execute(f"DROP INDEX IF EXISTS idx_{name}_voided_product")
+                        self.conn.execute(
+                            f"CREATE INDEX IF NOT EXISTS idx_{name}_voided_product_date ON {name} (voided, product, date)"
+                        )
+                    else:
+                        self.conn.execute(
+                            f"CREATE INDEX IF NOT EXISTS idx_{name}_voided_{column} ON {name} (voided, {column})"
+                        )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            for table, keys in KEYED_TABLES.items():
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(f'{key} TEXT' for key in keys)}, "
+                    f"value TEXT NOT NULL, PRIMARY KEY ({', '.join(keys)}))"
+                )
+
+    def _migrate_meta(self):
+        # Database lama menyimpan rekap, saldo akun dan stok sebagai satu dokumen JSON di `meta`
+        # (atau belum punya sebagian); dipindah sekali ke tabel per kunci dari data lengkap
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = ?", (KEYED_MARK,)).fetchone():
+                return
+            data = {
+                name: [json.loads(doc) for (doc,) in self.conn.execute(f"SELECT doc FROM {name} ORDER BY id")]
+                for name in COLLECTIONS
+            }
+            for key, value in self.conn.execute("SELECT key, value FROM meta"):
+                data[key] = json.loads(value)
+            with self.conn:
+                self._save_derived(data)
+                self.conn.executemany("DELETE FROM meta WHERE key = ?", [(table,) for table in KEYED_TABLES])
+
+    def _save_derived(self, data, records=None):
+        """Tulis struktur turunan ke tabel per kunci dan total/tutup buku ke `meta`.
+
+        Tanpa `records` semua kunci ditulis ulang (simpan penuh dan migrasi); dengan
+        `records` hanya kunci rekap dan stok yang disentuh baris record-nya (lihat
+        `_touched_keys`), sehingga biaya commit tidak ikut besar bersama buku besar. Kunci
+        yang nilainya sudah tidak ada dihapus. Saldo akun hanya beberapa baris dan selalu ditulis.
+        """
+        meta = {"totals": get_totals(data)}
+        if records is None:
+            for get in (get_rollups, get_accounts, get_stock):
+                get(data)
+            for table in KEYED_TABLES:
+                self.conn.execute(f"DELETE FROM {table}")
+            rollup_keys = {
+                (grain, name, period)
+                for grain, names in data["rollups"].items() for name, periods in names.items() for period in periods
+            }
+            products = set(data["stock"])
+            meta[KEYED_MARK] = True
+        else:
+            rollup_keys, products = _touched_keys(records)
+        if CLOSING_KEY in data and (records is None or any(record["op"] == "close" for record in records)):
+            meta[CLOSING_KEY] = data[CLOSING_KEY]
+        rollups, stock = data["rollups"], data["stock"]
+        items = {
+            "rollups": [(key, rollups[key[0]][key[1]].get(key[2])) for key in sorted(rollup_keys)],
+            "accounts": [((account,), value) for account, value in data["accounts"].items()],
+            "stock": [((product,), stock.get(product)) for product in sorted(products)],
+        }
+        # Penghitung byte untuk SQLite memakai ukuran dokumen JSON, bukan halaman database
+        written = 0
+        for table, pairs in items.items():
+            keys = KEYED_TABLES[table]
+            values = [key + (json.dumps(value, separators=(",", ":")),) for key, value in pairs if value is not None]
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(keys)}, value) VALUES ({', '.join('?' * (len(keys) + 1))})",
+                values,
+            )
+            self.conn.executemany(
+                f"DELETE FROM {table} WHERE {' AND '.join(f'{key} = ?' for key in keys)}",
+                [key for key, value in pairs if value is None],
+            )
+            written += sum(len(value[-1]) for value in values)
+        values = [(key, json.dumps(value, separators=(",", ":"))) for key, value in meta.items()]
+        self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", values)
+        metrics.count("bytes_written", written + sum(len(value) for _, value in values))
+
+    def _load_derived(self, rollup_keys=None, products=None):
+        # Struktur turunan dari `meta` dan tabel per kunci; dengan `rollup_keys`/`products`
+        # hanya kunci rekap dan barang itu yang dibaca, saldo akun selalu semua
+        derived = {"totals": empty_totals(), "rollups": empty_rollups(), "accounts": {}, "stock": {}}
+        found = self.conn.execute(
+            f"SELECT key, value FROM meta WHERE key IN ({', '.join('?' * len(META_KEYS))})", META_KEYS
+        )
+        for key, value in found:
+            derived[key] = json.loads(value)
+        for account, value in self.conn.execute("SELECT account, value FROM accounts"):
+            derived["accounts"][account] = json.loads(value)
+        rollups = derived["rollups"]
+        if rollup_keys is None:
+            found = self.conn.execute("SELECT grain, collection, period, value FROM rollups")
+        else:
+            groups = {}
+            for grain, name, period in rollup_keys:
+                groups.setdefault((grain, name), []).append(period)
+            found = [
+                row for (grain, name), periods in groups.items() for chunk in _chunks(periods)
+                for row in self.conn.execute(
+                    "SELECT grain, collection, period, value FROM rollups "
+                    f"WHERE grain = ? AND collection = ? AND period IN ({', '.join('?' * len(chunk))})",
+                    [grain, name] + chunk,
+                )
+            ]
+        for grain, name, period, value in found:
+            rollups[grain][name][period] = json.loads(value)
+        if products is None:
+            found = self.conn.execute("SELECT product, value FROM stock")
+        else:
+            found = [
+                row for chunk in _chunks(sorted(products))
+                for row in self.conn.execute(
+                    f"SELECT product, value FROM stock WHERE product IN ({', '.join('?' * len(chunk))})", chunk
+                )
+            ]
+        for product, value in found:
+            derived["stock"][product] = json.loads(value)
+        return derived
+
+    def _insert(self, collection, rows):
+        fields = INDEXED_FIELDS[collection]
+        values = [
+            (
+                sql_date(row.get("date")),
+                row.get(fields["product"]) if "product" in fields else None,
+                row.get(fields["account"]) if "account" in fields else None,
+                json.dumps(row, separators=(",", ":")),
+                int(VOID_KEY in row),
+                row.get("tx_id"),
+            )
+            for row in rows
+        ]
+        self.conn.executemany(
+            f"INSERT INTO {collection} (date, product, account, doc, voided, tx_id) VALUES (?, ?, ?, ?, ?, ?)", values
+        )
+        metrics.count("bytes_written", sum(len(value[3]) for value in values))
+
+    def _data_ids(self, data, collection):
+        # id baris `data` urut posisi; data yang tidak dimuat store ini dianggap lengkap
+        ids = data.setdefault("_ids", {})
+        if collection not in ids:
+            ids[collection] = [row_id for (row_id,) in self.conn.execute(f"SELECT id FROM {collection} ORDER BY id")]
+        return ids[collection]
+
+    def _ids(self, data, collection, positions):
+        # Posisi daftar = urutan id; hasilnya id untuk posisi terurut yang masih ada
+        ids = self._data_ids(data, collection)
+        return [(ids[i],) for i in sorted(set(positions)) if i < len(ids)]
+
+    def position(self, data, collection, key):
+        # Posisi baris ber-id `key` di `data`, atau None jika tidak ada di sana (lihat `_locate`)
+        if key is None:
+            return None
+        with self.lock:
+            ids = self._data_ids(data, collection)
+            i = bisect.bisect_left(ids, key)
+            return i if i < len(ids) and ids[i] == key else None
+
+    def _delete_positions(self, data, collection, positions):
+        # id dicari dulu sebelum ada baris yang terhapus
+        ids = self._ids(data, collection, positions)
+        self.conn.executemany(f"DELETE FROM {collection} WHERE id = ?", ids)
+        gone = {row_id for (row_id,) in ids}
+        data["_ids"][collection] = [row_id for row_id in data["_ids"][collection] if row_id not in gone]
+
+    def _mark_rows(self, data, record):
+        # Pembatalan/pemulihan hanya menulis ulang dokumen baris yang ditandai
+        for name, rows in marked_rows(record).items():
+            ids = self._ids(data, name, record["rows"][name])
+            values = [
+                (json.dumps(row, separators=(",", ":")), int(VOID_KEY in row), row_id)
+                for row, (row_id,) in zip(rows, ids)
+            ]
+            self.conn.executemany(f"UPDATE {name} SET doc = ?, voided = ? WHERE id = ?", values)
+            metrics.count("bytes_written", sum(len(value[0]) for value in values))
+
+    def _rows_where(self, collection, where, params):
+        return self.conn.execute(f"SELECT id, doc FROM {collection} WHERE {where}", params).fetchall()
+
+    def _rows_in(self, collection, column, values):
+        return [
+            row for chunk in _chunks(sorted(values))
+            for row in self._rows_where(collection, f"{column} IN ({', '.join('?' * len(chunk))})", chunk)
+        ]
+
+    def load(self):
+        with self.lock:
+            data, ids = {}, {}
+            for name in COLLECTIONS:
+                found = self.conn.execute(f"SELECT id, doc FROM {name} ORDER BY id").fetchall()
+                ids[name] = [row_id for row_id, _ in found]
+                data[name] = [json.loads(doc) for _, doc in found]
+            data.update(self._load_derived())
+            data["_ids"] = ids
+            metrics.count("rows_loaded", sum(len(data[name]) for name in COLLECTIONS))
+            return data
+
+    def load_for(self, ops):
+        """Bagian data yang cukup untuk menyelesaikan dan menerapkan `ops` tanpa memuat semua baris.
+
+        Isinya baris yang dirujuk operasi (lewat id dari `fetch`) beserta semua baris
+        tx_id-nya, tombstone untuk pemadatan, dan mutasi aktif barang yang tersentuh: sejak
+        tanggal mutasi terakhirnya jika semua perubahan jatuh di tanggal itu atau sesudahnya
+        (keadaan awal hari itu dipasang sebagai titik mulai hitung ulang), atau seluruhnya
+        jika tidak. Struktur turunan hanya berisi kunci rekap dan barang yang bisa berubah.
+        Tutup buku dan baris lama tanpa tx_id tetap memakai data lengkap (`load`).
+        """
+        with self.lock:
+            keyed = {name: set() for name in COLLECTIONS}
+            posted, tx_ids, purge = [], set(), False
+            for op in ops:
+                if op["op"] == "close_period":
+                    return self.load()
+                if op["op"] == "purge_voids":
+                    purge = True
+                elif op["op"] == "post":
+                    posted += [(name, row) for name, rows in op["rows"].items() for row in rows]
+                for name, key, row in _op_rows(op):
+                    if "tx_id" not in row:
+                        return self.load()
+                    tx_ids.add(row["tx_id"])
+                    if key is not None:
+                        keyed[name].add(key)
+            rows = {name: {} for name in COLLECTIONS}
+            for name in COLLECTIONS:
+                found = self._rows_in(name, "id", keyed[name]) + self._rows_in(name, "tx_id", tx_ids)
+                rows[name].update((row_id, json.loads(doc)) for row_id, doc in found)
+            touched = [(name, row) for name in COLLECTIONS for row in rows[name].values()] + posted
+            rollup_keys, products = set(), set()
+            earliest = {}
+            for name, row in touched:
+                _row_keys(name, row, rollup_keys, products)
+                if name in TOTAL_COLLECTIONS:
+                    ordinal = date_to_ordinal(row["date"])
+                    earliest[row["product"]] = min(earliest.get(row["product"], ordinal), ordinal)
+            derived = self._load_derived(rollup_keys, products)
+            marks = {}
+            for product in sorted(products):
+                # Keadaan awal hari tanpa mutasi sebelumnya sama dengan saldo pembuka, jadi
+                # barang itu dimuat seluruhnya (barisnya memang hanya sejak tanggal tersebut)
+                item = derived["stock"].get(product)
+                start = (item or {}).get("day_start") or {}
+                if start.get("last") and earliest[product] >= item["last"][0]:
+                    day = item["last"][0]
+                    where, params = "voided = 0 AND product = ? AND date >= ?", [product, date.fromordinal(day).isoformat()]
+                    marks[product] = {"days": [day], "states": [item["day_start"]], "count": 0}
+                else:
+                    where, params = "voided = 0 AND product = ?", [product]
+                for name in TOTAL_COLLECTIONS:
+                    rows[name].update((row_id, json.loads(doc)) for row_id, doc in self._rows_where(name, where, params))
+            if purge:
+                for name in COLLECTIONS:
+                    rows[name].update((row_id, json.loads(doc)) for row_id, doc in self._rows_where(name, "voided = 1", []))
+            data = {name: [rows[name][row_id] for row_id in sorted(rows[name])] for name in COLLECTIONS}
+            data.update(derived)
+            data["_ids"] = {name: sorted(rows[name]) for name in COLLECTIONS}
+            data["_stock_marks"] = marks
+            metrics.count("rows_loaded", sum(len(data[name]) for name in COLLECTIONS))
+            return data
+
+    def load_summary(self):
+        # Struktur turunan dari `meta` dan tabel per kunci, jumlah baris lewat COUNT dan baris terakhir saja
+        with self.lock:
+            summary = {"counts": {}}
+            for name in COLLECTIONS:
+                docs = self.conn.execute(
+                    f"SELECT doc FROM {name} ORDER BY id DESC LIMIT ?", (RECENT_ROWS,)
+                ).fetchall()
+                summary[name] = [json.loads(doc) for (doc,) in reversed(docs)]
+                summary["counts"][name] = self.conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            summary.update(self._load_derived())
+        return summary
+
+    def save(self, data):
+        with self.lock, self.conn:
+            for name in COLLECTIONS:
+                self.conn.execute(f"DELETE FROM {name}")
+                self._insert(name, data[name])
+            self._save_derived(data)
+            # id baris berubah semua; dibaca ulang saat dibutuhkan
+            data.pop("_ids", None)
+
+    def commit_batch(self, data, records):
+        self._write_partitions(records)
+        with self.lock:
+            try:
+                with self.conn:
+                    for record in records:
+                        if record["op"] in ("void", "restore"):
+                            self._mark_rows(data, record)
+                            continue
+                        for name, rows in record["rows"].items():
+                            if record["op"] == "post":
+                                ids = self._data_ids(data, name)
+                                self._insert(name, rows)
+                                new_ids = self.conn.execute(
+                                    f"SELECT id FROM {name} ORDER BY id DESC LIMIT ?", (len(rows),)
+                                ).fetchall()
+                                ids.extend(row_id for (row_id,) in reversed(new_ids))
+                            else:
+                                self._delete_positions(data, name, rows)
+                    self._save_derived(data, records)
+            except Exception:
+                # Transaksi dibatalkan; daftar id pada data dibaca ulang saat dibutuhkan
+                data.pop("_ids", None)
+                raise
+
+    def _where(self, collection, date_from=None, date_to=None, product=None, account=None, voided=False):
+        fields = INDEXED_FIELDS[collection]
+        clauses, params = ["voided = ?"], [int(voided)]
+        for column, op, value in (("date", ">=", date_from), ("date", "<=", date_to),
+                                  ("product", "=", product), ("account", "=", account)):
+            if not value:
+                continue
+            if column not in fields:
+                return " WHERE 0", []
+            clauses.append(f"{column} {op} ?")
+            params.append(sql_date(value) if column == "date" else value)
+        return " WHERE " + " AND ".join(clauses), params
+
+    def fetch(self, data, collection, limit=None, offset=0, voided=False, **filters):
+        # Hasilnya pasangan (id baris, baris). Halaman dilanjutkan dari id terakhir halaman
+        # sebelumnya (keyset) jika batasnya sudah diketahui sejak database terakhir berubah,
+        # sehingga halaman berikutnya tidak melewati ulang semua baris di depannya
+        where, params = self._where(collection, voided=voided, **filters)
+        with self.lock:
+            signature = self.signature()
+            if self.bounds[0] != signature:
+                self.bounds = (signature, {})
+            bounds = self.bounds[1].setdefault((collection, where, tuple(params)), {0: None})
+            start = max(known for known in bounds if known <= offset)
+            after = bounds[start]
+            if after is not None:
+                where, params = where + " AND id > ?", params + [after]
+            cursor = self.conn.execute(
+                f"SELECT id, doc FROM {collection}{where} ORDER BY id LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset - start],
+            )
+            rows = [(row_id, json.loads(doc)) for row_id, doc in cursor]
+            if rows:
+                bounds[offset + len(rows)] = rows[-1][0]
+            metrics.count("rows_scanned", len(rows))
+            return rows
+
+    def count(self, data, collection, **filters):
+        where, params = self._where(collection, **filters)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {collection}{where}", params).fetchone()[0]
+
+    def iter_rows(self, data, collection, chunk_size=1000, **filters):
+        # Paginasi keyset lewat id: setiap potongan satu kueri pendek, tanpa OFFSET yang
+        # makin mahal dan tanpa menahan kunci koneksi selama pemanggil memproses potongan
+        where, params = self._where(collection, **filters)
+        where = f"{where} AND id > ?"
+        last_id = 0
+        while True:
+            with self.lock:
+                found = self.conn.execute(
+                    f"SELECT id, doc FROM {collection}{where} ORDER BY id LIMIT ?", params + [last_id, chunk_size]
+                ).fetchall()
+            if not found:
+                return
+            metrics.count("rows_scanned", len(found))
+            last_id = found[-1][0]
+            yield [json.loads(doc) for _, doc in found]
+
+
+def migrate(mode, path, output=None, compress=True):
+    """Salin data dari `path` ke format biner dan bandingkan ukuran serta waktu muat/simpan.
+
+    Pada mode WAL, log lebih dulu dilipat ke snapshot JSON sehingga berkas lama tetap
+    lengkap sebagai cadangan. Berkas tujuan punya log, ringkasan dan arsip sendiri (lihat
+    `sidecar_base`); partisi arsip disalin, dan nomor urut log dilanjutkan dari snapshot
+    sumber. Migrasi ditolak jika salah satu berkas milik tujuan sudah ada.
+    """
+    if mode == "sqlite":
+        raise ValueError("Mode sqlite tidak memakai berkas snapshot; migrasi hanya untuk json/wal.")
+    output = output or os.path.splitext(path)[0] + BINARY_SUFFIX
+    source = open_store(mode, path)
+    existing = [name for name in STORE_TYPES[mode](output).sidecars() if os.path.exists(name)]
+    if existing:
+        raise ValueError(f"Berkas tujuan migrasi sudah ada: {', '.join(existing)}")
+    if mode == "wal":
+        source.compact()
+    data = persistable(source.load())
+    report = {"output": output}
+
+    start = time.perf_counter()
+    with open(path, "r") as f:
+        json.load(f)
+    report["json_load"] = time.perf_counter() - start
+    report["json_bytes"] = os.path.getsize(path)
+    tmp_path = path + ".migrate.tmp"
+    start = time.perf_counter()
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    report["json_save"] = time.perf_counter() - start
+    os.remove(tmp_path)
+
+    target = open_store(mode, output, compress=compress)
+    if os.path.isdir(source.archive_dir):
+        shutil.copytree(source.archive_dir, target.archive_dir)
+    if mode == "wal":
+        target.seq, target.pending = source.seq, 0
+    start = time.perf_counter()
+    target.save(data)
+    report["binary_save"] = time.perf_counter() - start
+    report["binary_bytes"] = os.path.getsize(output)
+    start = time.perf_counter()
+    with open(output, "rb") as f:
+        unpack_ledger(f.read())
+    report["binary_load"] = time.perf_counter() - start
+    return report
+
+
+STORE_TYPES = {
+    "json": JsonStore,
+    "wal": WalStore,
+    "sqlite": SqliteStore,
+}
+
+
+def open_store(mode, path, **options):
+    # Satu objek store per berkas agar nomor urut log tetap konsisten antar-rerun
+    with _STORES_LOCK:
+        key = (mode, path)
+        if key not in _STORES:
+            _STORES[key] = STORE_TYPES[mode](path, **options)
+        return _STORES[key]
+
+
+# ------------------- Buku Besar Bersama -------------------
+class SharedLedger:
+    """Satu salinan data per proses yang dibaca bersama oleh semua sesi.
+
+    Salinan dimuat ulang hanya jika berkas penyimpanan berubah dari luar proses
+    (dilihat dari mtime dan ukuran). Semua perubahan dikirim lewat `submit` ke satu
+    thread penulis yang menerapkannya berurutan; operasi yang sudah mengantre digabung
+    menjadi satu penulisan ke disk, lalu `version` dinaikkan.
+
+    Data lengkap baru dimuat saat pertama kali dibutuhkan. Halaman yang hanya butuh
+    total atau baris terakhir memakai `summary`, yang tidak memuat seluruh buku besar
+    selama data lengkap belum ada di memori. Untuk store dengan `partial_writes`,
+    penulis juga tidak memakai data lengkap: setiap batch diterapkan ke bagian data hasil
+    `load_for` store itu.
+
+    Saat antrean kosong selama `purge_every` detik, penulis membuang permanen baris yang
+    dibatalkan lebih dari `tombstone_days` hari lalu (lihat `purge_tombstones`).
+
+    Dengan `guard` (bawaan), baris setiap posting diperiksa dulu lewat `check_posting`;
+    posting yang jurnalnya tidak seimbang atau barisnya tidak saling cocok ditolak dengan
+    ValueError dan tidak ikut disimpan. Pembatalan, pemulihan dan penghapusan diperiksa
+    sesudah diterjemahkan ke record lewat `check_change`, sehingga perubahan sebagian
+    posting yang membuat jurnalnya tidak seimbang juga ditolak.
+    """
+
+    def __init__(self, store, max_batch=500, tombstone_days=TOMBSTONE_DAYS, purge_every=PURGE_EVERY, guard=True):
+        self.store = store
+        self.max_batch = max_batch
+        self.guard = guard
+        self.tombstone_days = tombstone_days
+        self.purge_every = purge_every
+        self.lock = threading.RLock()
+        self.data = None
+        self.signature = None
+        self.summary_data = None
+        self.summary_signature = None
+        self.version = 0
+        self.queue = queue.Queue()
+        self.writer = None
+
+    def read(self):
+        with self.lock:
+            signature = self.store.signature()
+            if self.data is None or signature != self.signature:
+                self.data = self.store.load()
+                self.signature = signature
+                self.summary_data = None
+                self.version += 1
+            return self.data
+
+    def summary(self):
+        with self.lock:
+            signature = self.store.signature()
+            if self.data is not None and signature == self.signature:
+                return self.data
+            if self.summary_data is None or signature != self.summary_signature:
+                self.summary_data = self.store.load_summary()
+                self.summary_signature = signature
+            return self.summary_data
+
+    def submit(self, op):
+        # Waktu simpan dan byte yang ditulis untuk operasi ini dicatat ke rerun pengirimnya
+        future = Future()
+        future.rerun = metrics.current()
+        with self.lock:
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self._run_writer, name="dapur-kita-writer", daemon=True)
+                self.writer.start()
+        self.queue.put((op, future))
+        return future
+
+    def post(self, rows):
+        return self.submit({"op": "post", "rows": rows}).result()
+
+    def close(self):
+        # Penulis berhenti setelah operasi yang sudah mengantre selesai disimpan
+        with self.lock:
+            writer = self.writer
+        if writer is not None and writer.is_alive():
+            self.queue.put(None)
+            writer.join()
+
+    def purge_tombstones(self, before=None):
+        # Hapus permanen tombstone yang dibatalkan sebelum `before`; hasilnya jumlah per koleksi
+        op = {"op": "purge_voids", "before": before or tombstone_cutoff(self.tombstone_days)}
+        with self.lock:
+            counts = {name: len(items) for name, items in purge_positions(self._working([op]), op["before"]).items()}
+        if counts:
+            self.submit(op).result()
+        return counts
+
+    def _purge_idle(self):
+        # Hanya jika data lengkap sudah di memori atau store bisa memuat tombstone saja;
+        # pemadatan tidak boleh memicu muat penuh
+        op = {"op": "purge_voids", "before": tombstone_cutoff(self.tombstone_days)}
+        with self.lock:
+            if self.store.partial_writes:
+                due = purge_positions(self._working([op]), op["before"])
+            else:
+                due = self.data is not None and self.signature == self.store.signature() and purge_positions(self.data, op["before"])
+        if due:
+            self._flush([(op, Future())])
+
+    def _working(self, ops):
+        # Data yang dipakai penulis: salinan lengkap di memori, atau bagian yang dibutuhkan
+        # `ops` saja untuk store yang bisa menulis sebagian (lihat `SqliteStore.load_for`)
+        return self.store.load_for(ops) if self.store.partial_writes else self.read()
+
+    def _run_writer(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.purge_every)]
+            except queue.Empty:
+                self._purge_idle()
+                continue
+            while len(batch) < self.max_batch and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                self._flush(batch)
+            if stop:
+                return
+
+    def _guard(self, batch):
+        # Semua posting dalam batch diperiksa dengan satu pindaian; hanya jika ada temuan
+        # setiap posting diperiksa sendiri agar yang ditolak hanya posting yang bermasalah
+        posts = {}
+        for op, _ in batch:
+            if op["op"] == "post":
+                merge_rows(posts, op["rows"])
+        if not posts or not check_posting(posts):
+            return batch
+        kept = []
+        for op, future in batch:
+            issues = check_posting(op["rows"]) if op["op"] == "post" else None
+            if issues:
+                future.set_exception(ValueError(posting_error(issues)))
+            else:
+                kept.append((op, future))
+        return kept
+
+    def _flush(self, batch):
+        if self.guard:
+            batch = self._guard(batch)
+        with self.lock:
+            data = self._working([op for op, _ in batch])
+            records, futures = [], []
+            for op, future in batch:
+                try:
+                    record = resolve_operation(data, op, lambda name, key: self.store.position(data, name, key))
+                    issues = self.guard and record["op"] in CHANGE_OPS and check_change(data, record)
+                    if issues:
+                        raise ValueError(posting_error(issues, "Perubahan"))
+                except Exception as error:
+                    future.set_exception(error)
+                    continue
+                try:
+                    apply_record(data, record)
+                except Exception as error:
+                    # Baris sudah diperiksa sebelum data diubah, jadi ini tidak seharusnya terjadi;
+                    # salinan di memori mungkin setengah diterapkan, maka tidak ada yang disimpan:
+                    # salinan dimuat ulang dari disk dan operasi lain di batch diterapkan ulang
+                    self.data = None
+                    future.set_exception(error)
+                    self._flush([(other, waiting) for other, waiting in batch if not waiting.done()])
+                    return
+                records.append(record)
+                futures.append(future)
+            if not records:
+                return
+            try:
+                with metrics.capture() as captured:
+                    start = time.perf_counter()
+                    self.store.commit_batch(data, records)
+                    metrics.add_span("commit_batch", time.perf_counter() - start)
+            except Exception as error:
+                # Salinan di memori tidak lagi sama dengan disk; muat ulang saat dibaca berikutnya
+                self.data = None
+                for future in futures:
+                    future.set_exception(error)
+                return
+            if self.store.partial_writes:
+                # Salinan lengkap yang mungkin dimuat lewat `read` tidak ikut diubah commit ini
+                self.data = None
+            self.signature = self.store.signature()
+            self.version += 1
+            for future in futures:
+                metrics.credit(getattr(future, "rerun", None), captured)
+                future.set_result(self.version)
+
+
+def open_ledger(store):
+    with _STORES_LOCK:
+        if store not in _LEDGERS:
+            _LEDGERS[store] = SharedLedger(store)
+        return _LEDGERS[store]
+
+
+def reset_stores():
+    # Menutup semua store dan buku besar bersama; dipakai benchmark di antara skenario
+    with _STORES_LOCK:
+        ledgers, stores = list(_LEDGERS.values()), list(_STORES.values())
+        _LEDGERS.clear()
+        _STORES.clear()
+    for ledger in ledgers:
+        ledger.close()
+    for store in stores:
+        store.close()
@@ -1,22 +1,62 @@
 import streamlit as st
 import hashlib
+import io
 import json
 import os
-from datetime import datetime
+
+from dapur_kita_archive import archived_rows, report_view
+from dapur_kita_ledger import (
+    ACCOUNT_TYPES, CLOSING_KEY, PURCHASE_METHODS, SALE_METHODS, TOMBSTONE_DAYS, VOID_KEY, LedgerConflict,
+    PeriodClosed,
+    account_ledger, build_posting, build_receipt, cost_of_goods_sold, date_to_ordinal, get_totals, open_from,
+    rollup_report, stock_report, trial_balance, validate_date
+)
+from dapur_kita_catalog import HISTORY_START, open_catalog
+from dapur_kita_export import export, export_filename
+from dapur_kita_import import import_postings
+from dapur_kita_metrics import EXPORT_ENV, configured_export, metrics
+from dapur_kita_shards import consolidate, parse_stores, shard_paths, shard_reports
+from dapur_kita_store import open_ledger, open_store
 
 # ------------------- Konstanta dan Inisialisasi -------------------
-PRODUCTS = {
-    "Sendok A": 15000,
-    "Sendok B": 20000,
-    "Sendok C": 25000,
-    "Sendok D": 30000,
-    "Pisau A": 15000,
-    "Pisau B": 20000,
-    "Pisau Bungkus (C)": 30000,
-    "Saringan": 10000,
-    "Toples kecil": 12000
+DATA_FILE = os.environ.get("DAPUR_KITA_DATA", "dapur_kita_data.json")
+# "json" = tulis ulang seluruh file, "wal" = log append-only + snapshot, "sqlite" = database berindeks
+STORAGE_MODE = os.environ.get("DAPUR_KITA_STORAGE", "wal")
+# Nama toko dipisah koma; setiap toko punya buku besar sendiri, berkasnya dicatat di peta toko
+# di samping DATA_FILE sehingga urutan daftar tidak memindahkan data. Nama kembar, termasuk yang
+# hanya beda huruf besar atau tanda baca, ditolak `shard_paths` dengan ValueError.
+STORES = parse_stores(os.environ.get("DAPUR_KITA_STORES", ""))
+SHARDS = shard_paths(DATA_FILE, STORES)
+# Katalog barang (SKU, harga dan riwayat harga); perubahan berkas terbaca tanpa restart
+CATALOG_FILE = os.environ.get("DAPUR_KITA_CATALOG", "dapur_kita_catalog.json")
+COMPACT_EVERY = 500
+ACCOUNTS = list(ACCOUNT_TYPES.keys())
+PAGE_SIZES = [25, 50, 100, 250]
+COST_METHOD_LABELS = {"FIFO": "fifo", "Rata-rata Tertimbang": "average"}
+EXPORT_COLLECTIONS = {
+    "Jurnal Umum": "journal_entries", "Transaksi": "transactions",
+    "Penjualan": "sales", "Persediaan": "inventory"
 }
-DATA_FILE = "dapur_kita_data.json"
+EXPORT_MIME = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+RECEIPT_LINES = 5
+MENU = [
+    "🏠 Home", 
+    "📦 Persediaan", 
+    "🏷️ Katalog Barang",
+    "🧾 Transaksi", 
+    "💰 Pendapatan", 
+    "📒 Jurnal Umum", 
+    "📘 Buku Besar",
+    "📊 Profitabilitas",
+    "📈 Laporan Periode",
+    "📥 Impor CSV",
+    "📤 Ekspor Data",
+    "🔒 Tutup Buku"
+]
+# Hanya muncul jika ada lebih dari satu toko
+CONSOLIDATED_MENU = "🏬 Laporan Gabungan"
+# Halaman diagnostik tidak ada di menu; dibuka admin lewat ?diagnostics=1 di URL
+DIAGNOSTICS_MENU = "🩺 Diagnostik"
 DEFAULT_USERNAME = "admin"
 DEFAULT_PASSWORD = hashlib.sha256("dapur123".encode()).hexdigest()
 
@@ -24,226 +64,740 @@ DEFAULT_PASSWORD = hashlib.sha256("dapur123".encode()).hexdigest()
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
+def data_file():
+    # Buku besar toko yang dipilih saat login
+    return SHARDS.get(st.session_state.get("store"), DATA_FILE)
+
+def get_store():
+    if STORAGE_MODE == "wal":
+        return open_store(STORAGE_MODE, data_file(), compact_every=COMPACT_EVERY)
+    return open_store(STORAGE_MODE, data_file())
+
+def get_catalog():
+    # Dibaca ulang hanya jika berkas katalog berubah sejak rerun sebelumnya
+    return open_catalog(CATALOG_FILE)
+
+def get_ledger():
+    # Satu salinan data per proses, dipakai bersama semua sesi/tab
+    return open_ledger(get_store())
+
+@metrics.timed("load_data")
 def load_data():
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    return {"inventory": [], "transactions": [], "sales": [], "journal_entries": []}
+    return get_ledger().read()
 
-def save_data(data):
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+@metrics.timed("load_summary")
+def load_summary():
+    # Total, rekap periode dan baris terakhir saja; buku besar lengkap tidak ikut dimuat
+    return get_ledger().summary()
 
-def validate_date(date_str):
-    try:
-        datetime.strptime(date_str, "%Y-%m-%d")
-        return True
-    except ValueError:
-        return False
+def load_table_data():
+    # SQLite mengambil baris tabel langsung dari database, jadi ringkasan sudah cukup
+    return load_summary() if get_store().partial_reads else load_data()
+
+def load_report_data(data):
+    # Rekap periode termasuk partisi arsip, untuk laporan yang bisa mencakup periode tertutup
+    return report_view(data, get_store().archive_dir, get_ledger().version)
+
+def closed_caption(data):
+    closed = data.get(CLOSING_KEY)
+    if closed and closed["through"]:
+        st.caption(f"Baris sampai {closed['through']} sudah diarsipkan lewat Tutup Buku.")
+
+@metrics.timed("submit")
+def submit(op):
+    # Semua perubahan diantrekan ke satu penulis; ditunggu agar pesan sukses akurat
+    return get_ledger().submit(op).result()
+
+def post_rows(rows):
+    submit({"op": "post", "rows": rows})
+
+@metrics.timed("dataframe")
+def show_table(rows):
+    st.dataframe(rows)
 
 # ------------------- Halaman Login -------------------
+def is_admin():
+    return st.session_state.get("username") == DEFAULT_USERNAME
+
 def login_page():
     st.title("DAPUR KITA - LOGIN")
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
+    store = st.selectbox("Toko", STORES) if STORES else None
     if st.button("Login"):
         if username == DEFAULT_USERNAME and hash_password(password) == DEFAULT_PASSWORD:
             st.session_state["logged_in"] = True
+            st.session_state["username"] = username
+            st.session_state["store"] = store
             st.rerun()
         else:
             st.error("Username atau password salah.")
 
 # ------------------- Halaman Home -------------------
-def home_page():
+@metrics.timed("home_menu")
+def home_menu():
     st.title("TOKO DAPUR KITA")
     st.markdown("""
     Selamat datang di Sistem Manajemen Toko Dapur Kita!
     """)
-    menu = st.selectbox("Pilih Menu", [
-        "🏠 Home", 
-        "📦 Persediaan", 
-        "🧾 Transaksi", 
-        "💰 Pendapatan", 
-        "📒 Jurnal Umum", 
-        "📊 Profitabilitas"
-    ])
+    if STORES:
+        st.caption(f"Toko: {st.session_state.get('store') or STORES[0]}")
+    options = list(MENU)
+    if len(STORES) > 1:
+        options.append(CONSOLIDATED_MENU)
+    if st.query_params.get("diagnostics") == "1" and is_admin():
+        options.append(DIAGNOSTICS_MENU)
+    return st.selectbox("Pilih Menu", options)
+
+def home_page():
+    menu = home_menu()
+    metrics.label(menu)
     if menu == "🏠 Home":
         st.info("Silakan pilih menu lain di atas untuk mulai menggunakan aplikasi.")
     elif menu == "📦 Persediaan":
         inventory_page()
+    elif menu == "🏷️ Katalog Barang":
+        catalog_page()
     elif menu == "🧾 Transaksi":
         transaction_page()
     elif menu == "💰 Pendapatan":
         sales_page()
     elif menu == "📒 Jurnal Umum":
         journal_page()
+    elif menu == "📘 Buku Besar":
+        general_ledger_page()
     elif menu == "📊 Profitabilitas":
         profitability_page()
+    elif menu == "📈 Laporan Periode":
+        period_report_page()
+    elif menu == "📥 Impor CSV":
+        import_page()
+    elif menu == "📤 Ekspor Data":
+        export_page()
+    elif menu == "🔒 Tutup Buku":
+        closing_page()
+    elif menu == CONSOLIDATED_MENU:
+        consolidated_page()
+    elif menu == DIAGNOSTICS_MENU and is_admin():
+        diagnostics_page()
+
+# ------------------- Nota Banyak Barang -------------------
+def receipt_template(methods):
+    return [{"Barang": None, "Jumlah": 1, "Metode Pembayaran": methods[0]} for _ in range(RECEIPT_LINES)]
+
+def receipt_lines(template, edits):
+    # Terapkan perubahan grid (diubah, dihapus, ditambah) ke baris awal, urutannya sama dengan Streamlit
+    lines = [dict(line) for line in template]
+    for index, changes in edits.get("edited_rows", {}).items():
+        lines[int(index)].update(changes)
+    deleted = {int(index) for index in edits.get("deleted_rows", [])}
+    lines = [line for index, line in enumerate(lines) if index not in deleted]
+    return lines + [dict(row) for row in edits.get("added_rows", [])]
+
+def save_receipt(kind, key, methods):
+    # Dipanggil sebelum halaman digambar ulang, jadi grid yang tersimpan langsung kosong lagi
+    state = st.session_state
+    lines = receipt_lines(receipt_template(methods), state.get(f"{key}_receipt_{state[f'{key}_receipt_nonce']}", {}))
+    quantities = [line.get("Jumlah") for line in lines]
+    rows, errors = build_receipt(kind, state.get(f"{key}_receipt_date", ""), [{
+        "product": line.get("Barang"),
+        "quantity": int(quantity) if isinstance(quantity, float) and quantity.is_integer() else quantity,
+        "payment_method": line.get("Metode Pembayaran"),
+    } for line, quantity in zip(lines, quantities)], get_catalog())
+    if errors:
+        state[f"{key}_receipt_result"] = ("error", [f"Baris {number}: {message}" for number, message in errors])
+        return
+    if not rows:
+        state[f"{key}_receipt_result"] = ("error", ["Nota belum berisi barang."])
+        return
+    try:
+        post_rows(rows)
+    except ValueError as error:
+        state[f"{key}_receipt_result"] = ("error", [str(error)])
+        return
+    total = sum(row["total"] for row in rows["sales" if kind == "penjualan" else "inventory"])
+    state[f"{key}_receipt_result"] = ("success", [
+        f"Nota berisi {len(rows['transactions'])} barang (total Rp {total:,.0f}) berhasil disimpan."
+    ])
+    state[f"{key}_receipt_nonce"] += 1
+
+# Formulir nota: semua baris divalidasi lalu dikirim sebagai satu posting, jadi satu nota
+# cukup satu penulisan dan tidak pernah tersimpan separuh; harga katalog pada tanggal nota
+def receipt_form(kind, key, methods):
+    st.subheader("Nota Banyak Barang")
+    st.session_state.setdefault(f"{key}_receipt_nonce", 0)
+    with st.form(f"form_{key}_receipt"):
+        st.text_input("Tanggal Nota (YYYY-MM-DD)", key=f"{key}_receipt_date")
+        # Kunci grid berganti setelah nota tersimpan agar baris yang sudah diisi dikosongkan
+        st.data_editor(
+            receipt_template(methods), num_rows="dynamic",
+            key=f"{key}_receipt_{st.session_state[f'{key}_receipt_nonce']}",
+            column_config={
+                "Barang": st.column_config.SelectboxColumn("Barang", options=list(get_catalog())),
+                "Jumlah": st.column_config.NumberColumn("Jumlah", min_value=1, step=1),
+                "Metode Pembayaran": st.column_config.SelectboxColumn("Metode Pembayaran", options=methods),
+            },
+        )
+        st.form_submit_button("Simpan Nota", on_click=save_receipt, args=(kind, key, methods))
+
+    status, messages = st.session_state.pop(f"{key}_receipt_result", (None, []))
+    for message in messages:
+        (st.success if status == "success" else st.error)(message)
 
 # ------------------- Halaman Persediaan -------------------
+@metrics.timed()
 def inventory_page():
     st.header("Tambah Transaksi Persediaan")
-    data = st.session_state["data"]
 
+    catalog = get_catalog()
     with st.form("form_inventory"):
         date = st.text_input("Tanggal (YYYY-MM-DD)")
-        product = st.selectbox("Jenis Barang", list(PRODUCTS.keys()))
-        price = PRODUCTS[product]
+        product = st.selectbox("Jenis Barang", list(catalog))
+        # Harga dari riwayat katalog pada tanggal transaksi; selama tanggal belum valid, harga hari ini
+        price = catalog.price_on(product, date if validate_date(date) else None)
         st.markdown(f"**Harga per Barang:** Rp {price}")
         quantity = st.number_input("Jumlah Barang", min_value=1, value=1)
-        method = st.selectbox("Metode Pembayaran", ["Tunai", "Kredit", "Retur Pembelian"])
+        method = st.selectbox("Metode Pembayaran", PURCHASE_METHODS)
         submitted = st.form_submit_button("Tambah Transaksi")
 
         if submitted:
-            if not validate_date(date):
-                st.error("Format tanggal tidak valid.")
+            # Validasi dan pembentukan jurnal sama dengan impor CSV dan API tanpa UI
+            try:
+                post_rows(build_posting("pembelian", date, product, quantity, method, price, products=catalog))
+            except ValueError as error:
+                st.error(str(error))
             else:
-                total = quantity * price * (-1 if method == "Retur Pembelian" else 1)
-                keterangan = "Retur Pembelian" if method == "Retur Pembelian" else "Pembelian"
-
-                data["inventory"].append({
-                    "date": date, "product": product,
-                    "quantity": quantity, "price": price, "total": total
-                })
-                data["transactions"].append({
-                    "date": date, "type": product,
-                    "description": keterangan, "amount": total,
-                    "payment_method": method
-                })
-
-                # Jurnal
-                if method == "Retur Pembelian":
-                    data["journal_entries"].append({
-                        "date": date, "description": f"Retur pembelian {product}",
-                        "account": "Utang Usaha", "debit": 0, "credit": -total
-                    })
-                    data["journal_entries"].append({
-                        "date": date, "description": f"Pengurangan persediaan karena retur {product}",
-                        "account": "Persediaan", "debit": -total, "credit": 0
-                    })
-                else:
-                    data["journal_entries"].append({
-                        "date": date, "description": f"Pembelian {product}",
-                        "account": "Persediaan", "debit": total, "credit": 0
-                    })
-                    if method == "Tunai":
-                        data["journal_entries"].append({
-                            "date": date, "description": f"Pembayaran tunai pembelian {product}",
-                            "account": "Kas", "debit": 0, "credit": total
-                        })
-                save_data(data)
                 st.success("Transaksi persediaan berhasil ditambahkan.")
 
+    receipt_form("pembelian", "inventory", PURCHASE_METHODS)
+
+    # Stok perpetual dibaca dari ringkasan, tidak menghitung ulang riwayat
+    st.subheader("Stok di Tangan")
+    label = st.selectbox("Metode Biaya", list(COST_METHOD_LABELS), key="stock_method")
+    report = stock_report(load_summary(), COST_METHOD_LABELS[label])
+    if report:
+        show_table([{
+            "Barang": row["product"], "Stok": row["quantity"],
+            "Biaya per Unit": round(row["unit_cost"], 2), "Nilai Persediaan": round(row["value"], 2)
+        } for row in report])
+        if any(row["quantity"] < 0 for row in report):
+            st.warning("Ada barang yang terjual melebihi stok tercatat.")
+    else:
+        st.info("Belum ada mutasi persediaan.")
+
+# ------------------- Halaman Katalog Barang -------------------
+@metrics.timed()
+def catalog_page():
+    st.header("Katalog Barang")
+    catalog = get_catalog()
+
+    st.subheader("Ubah Harga")
+    with st.form("form_catalog_price"):
+        product = st.selectbox("Barang", list(catalog))
+        price = st.number_input("Harga Baru", min_value=1, value=1)
+        effective = st.text_input("Berlaku Mulai (YYYY-MM-DD)")
+        if st.form_submit_button("Simpan Harga"):
+            # Harga lama tetap di riwayat, jadi transaksi sebelum tanggal berlaku tidak berubah
+            try:
+                catalog.set_price(product, price, effective.strip())
+            except ValueError as error:
+                st.error(str(error))
+            else:
+                st.success(f"Harga {product} menjadi Rp {price} mulai {effective.strip()}.")
+
+    st.subheader("Tambah Barang")
+    with st.form("form_catalog_add"):
+        col1, col2 = st.columns(2)
+        sku = col1.text_input("SKU")
+        name = col2.text_input("Nama Barang")
+        price = col1.number_input("Harga", min_value=1, value=1)
+        effective = col2.text_input("Berlaku Mulai (YYYY-MM-DD, kosongkan jika sejak awal)")
+        if st.form_submit_button("Tambah Barang"):
+            try:
+                catalog.add_product(sku, name, price, effective.strip() or HISTORY_START)
+            except ValueError as error:
+                st.error(str(error))
+            else:
+                st.success(f"{name.strip()} ditambahkan ke katalog.")
+
+    st.subheader("Daftar Barang")
+    day = st.text_input("Harga pada Tanggal (YYYY-MM-DD, kosongkan untuk hari ini)", key="catalog_date")
+    if day and not validate_date(day):
+        st.error("Format tanggal tidak valid.")
+        return
+    show_table([{
+        "SKU": catalog.product(name)["sku"], "Barang": name, "Harga": catalog.price_on(name, day or None),
+        "Perubahan Harga": len(catalog.product(name)["prices"])
+    } for name in catalog])
+    product = st.selectbox("Riwayat Harga", list(catalog), key="catalog_history")
+    show_table([{"Berlaku Mulai": entry["from"], "Harga": entry["price"]} for entry in catalog.history(product)])
+
 # ------------------- Halaman Pendapatan -------------------
+@metrics.timed()
 def sales_page():
     st.header("Tambah Pendapatan")
-    data = st.session_state["data"]
 
+    catalog = get_catalog()
     with st.form("form_sales"):
         date = st.text_input("Tanggal (YYYY-MM-DD)")
-        product = st.selectbox("Barang", list(PRODUCTS.keys()))
-        price = PRODUCTS[product]
+        product = st.selectbox("Barang", list(catalog))
+        # Harga dari riwayat katalog pada tanggal transaksi; selama tanggal belum valid, harga hari ini
+        price = catalog.price_on(product, date if validate_date(date) else None)
         st.markdown(f"**Harga per Barang:** Rp {price}")
         quantity = st.number_input("Jumlah Terjual", min_value=1, value=1)
-        method = st.selectbox("Metode Pembayaran", ["Tunai", "Kredit", "Retur Penjualan"])
+        method = st.selectbox("Metode Pembayaran", SALE_METHODS)
         submitted = st.form_submit_button("Tambah Pendapatan")
 
         if submitted:
-            if not validate_date(date):
-                st.error("Format tanggal tidak valid.")
+            try:
+                post_rows(build_posting("penjualan", date, product, quantity, method, price, products=catalog))
+            except ValueError as error:
+                st.error(str(error))
             else:
-                total = price * quantity * (-1 if method == "Retur Penjualan" else 1)
-                keterangan = "Retur Penjualan" if method == "Retur Penjualan" else "Penjualan"
-
-                data["sales"].append({
-                    "date": date, "product": product, "price": price,
-                    "quantity": quantity, "total": total, "payment_method": method
-                })
-                data["transactions"].append({
-                    "date": date, "type": product,
-                    "description": keterangan, "amount": total, "payment_method": method
-                })
-
-                # Jurnal
-                if method == "Retur Penjualan":
-                    data["journal_entries"].append({
-                        "date": date, "description": f"Retur penjualan {product}",
-                        "account": "Persediaan", "debit": -total, "credit": 0
-                    })
-                    data["journal_entries"].append({
-                        "date": date, "description": f"Pengembalian kas karena retur {product}",
-                        "account": "Kas", "debit": 0, "credit": -total
-                    })
-                else:
-                    akun = "Kas" if method == "Tunai" else "Piutang Usaha"
-                    data["journal_entries"].append({
-                        "date": date, "description": f"{keterangan.lower()} {product}",
-                        "account": akun, "debit": total, "credit": 0
-                    })
-                    data["journal_entries"].append({
-                        "date": date, "description": f"Pengurangan persediaan karena {keterangan.lower()} {product}",
-                        "account": "Persediaan", "debit": 0, "credit": total
-                    })
-
-                save_data(data)
                 st.success("Pendapatan berhasil ditambahkan.")
 
+    receipt_form("penjualan", "sales", SALE_METHODS)
+
+# ------------------- Tabel Berhalaman -------------------
+def paged_table(data, collection, key, filter_label, filter_field, options):
+    col1, col2, col3 = st.columns(3)
+    date_from = col1.text_input("Dari Tanggal (YYYY-MM-DD)", key=f"{key}_from")
+    date_to = col2.text_input("Sampai Tanggal (YYYY-MM-DD)", key=f"{key}_to")
+    choice = col3.selectbox(filter_label, ["Semua"] + options, key=f"{key}_filter")
+    for value in (date_from, date_to):
+        if value and not validate_date(value):
+            st.error("Format tanggal filter tidak valid.")
+            return []
+    filters = {
+        "date_from": date_from or None, "date_to": date_to or None,
+        filter_field: None if choice == "Semua" else choice
+    }
+
+    # Hanya baris pada halaman yang dipilih yang diambil dan dikirim ke browser
+    store = get_store()
+    total = store.count(data, collection, **filters)
+    col1, col2 = st.columns(2)
+    page_size = col1.selectbox("Baris per Halaman", PAGE_SIZES, key=f"{key}_size")
+    pages = max(1, -(-total // page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = col2.number_input(f"Halaman (1-{pages})", min_value=1, max_value=pages, key=f"{key}_page")
+    rows = store.fetch(data, collection, limit=page_size, offset=(page - 1) * page_size, **filters)
+    show_table([row for _, row in rows])
+    st.caption(f"Menampilkan {len(rows)} dari {total} baris.")
+    return rows
+
+def void_controls(rows, key, label, make_op):
+    # Baris tidak dihapus, hanya ditandai batal beserta alasannya sehingga bisa dipulihkan
+    index = st.number_input(f"Pilih indeks {label} pada halaman ini untuk dibatalkan", min_value=0, max_value=len(rows)-1, key=f"{key}_void_index")
+    reason = st.text_input("Alasan Pembatalan", key=f"{key}_void_reason")
+    if st.button(f"Batalkan {label.title()}", key=f"{key}_void"):
+        position, row = rows[index]
+        try:
+            submit(make_op(position, row, reason))
+        except (LedgerConflict, ValueError) as error:
+            st.error(str(error))
+            return
+        st.success(f"{label.capitalize()} dibatalkan; pulihkan lewat daftar di bawah jika keliru.")
+        st.rerun()
+
+def voided_section(data, collection, key, label, make_op):
+    # Tombstone tetap tersimpan sampai dibuang permanen oleh pemadatan berkala
+    rows = get_store().fetch(data, collection, voided=True)
+    if not rows:
+        return
+    with st.expander(f"{label.capitalize()} Dibatalkan ({len(rows)})"):
+        st.caption(f"Baris yang dibatalkan lebih dari {TOMBSTONE_DAYS} hari lalu dihapus permanen.")
+        show_table([dict(
+            {name: value for name, value in row.items() if name != VOID_KEY},
+            alasan=row[VOID_KEY]["reason"], dibatalkan=row[VOID_KEY]["at"]
+        ) for _, row in rows])
+        index = st.number_input(f"Pilih indeks {label} yang akan dipulihkan", min_value=0, max_value=len(rows)-1, key=f"{key}_restore_index")
+        if st.button(f"Pulihkan {label.title()}", key=f"{key}_restore"):
+            position, row = rows[index]
+            try:
+                submit(make_op(position, row))
+            except (LedgerConflict, ValueError) as error:
+                st.error(str(error))
+                return
+            st.success(f"{label.capitalize()} dipulihkan.")
+            st.rerun()
+
 # ------------------- Halaman Transaksi -------------------
+@metrics.timed()
 def transaction_page():
     st.header("Data Transaksi")
-    data = st.session_state["data"]
+    data = load_table_data()
+    closed_caption(data)
     if data["transactions"]:
-        st.dataframe(data["transactions"])
-        index_to_delete = st.number_input("Pilih indeks transaksi untuk dihapus", min_value=0, max_value=len(data["transactions"])-1)
-        if st.button("Hapus Transaksi"):
-            transaksi = data["transactions"].pop(index_to_delete)
-            data["inventory"] = [item for item in data["inventory"] if not (item["total"] == transaksi["amount"] and item["product"] == transaksi["type"])]
-            data["sales"] = [item for item in data["sales"] if not (item["total"] == transaksi["amount"] and item["product"] == transaksi["type"])]
-            data["journal_entries"] = [entry for entry in data["journal_entries"] if entry["date"] != transaksi["date"] or entry["description"].find(transaksi["type"]) == -1]
-            save_data(data)
-            st.success("Transaksi berhasil dihapus.")
-            st.rerun()
+        rows = paged_table(data, "transactions", "tx", "Barang", "product", list(get_catalog()))
+        if rows:
+            void_controls(rows, "tx", "transaksi", lambda position, row, reason: {
+                "op": "void_transaction", "position": position, "expect": row, "reason": reason
+            })
+        else:
+            st.info("Tidak ada transaksi yang sesuai filter.")
+        voided_section(data, "transactions", "tx", "transaksi", lambda position, row: {
+            "op": "restore_transaction", "position": position, "expect": row
+        })
     else:
         st.info("Belum ada transaksi.")
 
 # ------------------- Halaman Jurnal -------------------
+@metrics.timed()
 def journal_page():
     st.header("Jurnal Umum")
-    data = st.session_state["data"]
+    data = load_table_data()
+    closed_caption(data)
     if data["journal_entries"]:
-        st.dataframe(data["journal_entries"])
-        index_to_delete = st.number_input("Pilih indeks jurnal untuk dihapus", min_value=0, max_value=len(data["journal_entries"])-1)
-        if st.button("Hapus Jurnal"):
-            deleted = data["journal_entries"].pop(index_to_delete)
-            save_data(data)
-            st.success(f"Entri jurnal pada tanggal {deleted['date']} dengan akun {deleted['account']} berhasil dihapus.")
-            st.rerun()
+        rows = paged_table(data, "journal_entries", "journal", "Akun", "account", ACCOUNTS)
+        if rows:
+            # Satu baris jurnal saja tidak bisa dibatalkan tanpa membuat jurnal tidak seimbang,
+            # jadi yang dibatalkan seluruh posting transaksinya
+            st.caption("Membatalkan entri jurnal membatalkan seluruh posting transaksinya.")
+            void_controls(rows, "journal", "jurnal", lambda position, row, reason: {
+                "op": "void_transaction", "collection": "journal_entries", "position": position, "expect": row, "reason": reason
+            })
+        else:
+            st.info("Tidak ada entri jurnal yang sesuai filter.")
+        voided_section(data, "journal_entries", "journal", "jurnal", lambda position, row: {
+            "op": "restore_transaction", "collection": "journal_entries", "position": position, "expect": row
+        })
     else:
         st.info("Belum ada entri jurnal.")
 
+# ------------------- Halaman Buku Besar -------------------
+@metrics.timed()
+def general_ledger_page():
+    st.header("Buku Besar dan Neraca Saldo")
+    data = load_table_data()
+    view = load_report_data(data)
+    closed = data.get(CLOSING_KEY)
+    tab_balance, tab_ledger = st.tabs(["Neraca Saldo", "Buku Besar per Akun"])
+
+    with tab_balance:
+        as_of = st.text_input("Per Tanggal (YYYY-MM-DD, kosongkan untuk saldo terkini)", key="tb_as_of")
+        if as_of and not validate_date(as_of):
+            st.error("Format tanggal tidak valid.")
+        else:
+            report = trial_balance(view, as_of or None)
+            show_table([{
+                "Akun": row["account"], "Debit": row["balance_debit"], "Kredit": row["balance_credit"]
+            } for row in report])
+            total_debit = sum(row["balance_debit"] for row in report)
+            total_credit = sum(row["balance_credit"] for row in report)
+            col1, col2 = st.columns(2)
+            col1.metric("Total Debit", f"Rp {total_debit:,.0f}")
+            col2.metric("Total Kredit", f"Rp {total_credit:,.0f}")
+            if total_debit != total_credit:
+                st.warning("Neraca saldo tidak seimbang.")
+
+    with tab_ledger:
+        account = st.selectbox("Akun", ACCOUNTS, key="gl_account")
+        col1, col2 = st.columns(2)
+        date_from = col1.text_input("Dari Tanggal (YYYY-MM-DD)", key="gl_from")
+        date_to = col2.text_input("Sampai Tanggal (YYYY-MM-DD)", key="gl_to")
+        if (date_from and not validate_date(date_from)) or (date_to and not validate_date(date_to)):
+            st.error("Format tanggal tidak valid.")
+            return
+        if not date_from and open_from(data):
+            date_from = open_from(data)
+            st.caption(f"Menampilkan periode terbuka mulai {date_from}; isi Dari Tanggal untuk melihat arsip.")
+        entries = [row for _, row in get_store().fetch(
+            data, "journal_entries", account=account, date_from=date_from or None, date_to=date_to or None
+        )]
+        if closed and (not date_from or date_to_ordinal(date_from) <= date_to_ordinal(closed["through"])):
+            # Mutasi periode tertutup dibaca dari partisi yang beririsan dengan rentang saja
+            entries = archived_rows(
+                get_store().archive_dir, closed, "journal_entries", date_from or None, date_to or None, account=account
+            ) + entries
+        opening, lines = account_ledger(view, account, entries, date_from or None)
+        st.metric("Saldo Awal", f"Rp {opening:,.0f}")
+        if lines:
+            show_table([{
+                "Tanggal": line["date"], "Keterangan": line["description"],
+                "Debit": line["debit"], "Kredit": line["credit"], "Saldo": line["balance"]
+            } for line in lines])
+        else:
+            st.info("Tidak ada mutasi pada rentang ini.")
+        st.metric("Saldo Akhir", f"Rp {lines[-1]['balance'] if lines else opening:,.0f}")
+
 # ------------------- Halaman Profitabilitas -------------------
+@metrics.timed()
 def profitability_page():
     st.header("Laporan Profitabilitas")
-    data = st.session_state["data"]
-    total_inventory = sum(item["total"] for item in data["inventory"])
-    total_sales = sum(item["total"] for item in data["sales"])
-    profit = total_sales - total_inventory
+    data = load_summary()
+    totals = get_totals(data)
+    method = COST_METHOD_LABELS[st.selectbox("Metode Biaya", list(COST_METHOD_LABELS))]
+    total_inventory = totals["inventory"]["total"]
+    total_sales = totals["sales"]["total"]
+    cogs = cost_of_goods_sold(data, method)
+    profit = total_sales - cogs
 
-    st.metric("Total Biaya Produksi", f"Rp {total_inventory:,.0f}")
+    # Laba dihitung dari harga pokok barang yang terjual, bukan dari seluruh pembelian
+    st.metric("Total Pembelian", f"Rp {total_inventory:,.0f}")
     st.metric("Total Pendapatan", f"Rp {total_sales:,.0f}")
-    st.metric("Laba/Rugi", f"Rp {profit:,.0f}")
+    st.metric("Harga Pokok Penjualan", f"Rp {cogs:,.0f}")
+    st.metric("Laba Kotor", f"Rp {profit:,.0f}")
+
+    st.subheader("Rincian per Barang")
+    stock = {row["product"]: row for row in stock_report(data, method)}
+    products = sorted(set(totals["inventory"]["by_product"]) | set(totals["sales"]["by_product"]) | set(stock))
+    show_table([{
+        "Barang": product,
+        "Pembelian": totals["inventory"]["by_product"].get(product, 0),
+        "Penjualan": totals["sales"]["by_product"].get(product, 0),
+        "HPP": round(stock[product]["cogs"], 2) if product in stock else 0,
+        "Laba Kotor": round(totals["sales"]["by_product"].get(product, 0) - (stock[product]["cogs"] if product in stock else 0), 2),
+        "Stok": stock[product]["quantity"] if product in stock else 0
+    } for product in products])
+
+    st.subheader("Rincian per Metode Pembayaran")
+    methods = sorted(set(totals["inventory"]["by_method"]) | set(totals["sales"]["by_method"]))
+    show_table([{
+        "Metode": method,
+        "Pembelian": totals["inventory"]["by_method"].get(method, 0),
+        "Penjualan": totals["sales"]["by_method"].get(method, 0)
+    } for method in methods])
+
+# ------------------- Halaman Laporan Periode -------------------
+@metrics.timed()
+def period_report_page():
+    st.header("Laporan per Periode")
+    data = load_report_data(load_summary())
+    col1, col2 = st.columns(2)
+    grain = col1.selectbox("Periode", ["Bulanan", "Harian"])
+    report = col2.selectbox("Laporan", ["Penjualan per Barang", "Pembelian per Barang", "Mutasi Akun"])
+    grain = "monthly" if grain == "Bulanan" else "daily"
+
+    if report == "Mutasi Akun":
+        choice = st.selectbox("Akun", ["Semua"] + ACCOUNTS)
+        rows = rollup_report(data, grain, "journal_entries", None if choice == "Semua" else choice)
+        table = [{
+            "Periode": row["period"], "Akun": row["key"], "Debit": row["debit"],
+            "Kredit": row["credit"], "Mutasi": row["debit"] - row["credit"]
+        } for row in rows]
+    else:
+        collection = "sales" if report == "Penjualan per Barang" else "inventory"
+        choice = st.selectbox("Barang", ["Semua"] + list(get_catalog()))
+        rows = rollup_report(data, grain, collection, None if choice == "Semua" else choice)
+        table = [{
+            "Periode": row["period"], "Barang": row["key"],
+            "Jumlah Barang": row["quantity"], "Total": row["total"]
+        } for row in rows]
+
+    if table:
+        show_table(table)
+    else:
+        st.info("Belum ada data untuk laporan ini.")
+
+# ------------------- Halaman Impor CSV -------------------
+@metrics.timed()
+def import_page():
+    st.header("Impor Pembelian dan Penjualan dari CSV")
+    st.markdown("""
+    Kolom CSV: `kind` (`pembelian`/`penjualan`), `date` (YYYY-MM-DD), `product`, `quantity`,
+    `payment_method`, dan `price` (opsional, default harga katalog pada tanggal transaksi).
+    """)
+    uploaded = st.file_uploader("Berkas CSV", type="csv")
+    skip_errors = st.checkbox("Impor baris yang valid walaupun ada baris bermasalah")
+    if uploaded is not None and st.button("Impor"):
+        status = st.empty()
+        try:
+            rows, count, errors = import_postings(
+                io.TextIOWrapper(uploaded, encoding="utf-8-sig", newline=""), get_catalog(),
+                on_chunk=lambda done, failed: status.text(f"Diproses: {done} valid, {failed} bermasalah")
+            )
+        except ValueError as error:
+            st.error(str(error))
+            return
+        if errors:
+            show_table([{"Baris": line, "Kesalahan": message} for line, message in errors])
+        if errors and not skip_errors:
+            st.error(f"{len(errors)} baris bermasalah, tidak ada data yang diimpor.")
+        elif count:
+            try:
+                post_rows(rows)
+            except PeriodClosed as error:
+                st.error(str(error))
+                return
+            st.success(f"{count} transaksi berhasil diimpor.")
+        else:
+            st.info("Tidak ada transaksi yang diimpor.")
+
+# ------------------- Halaman Ekspor -------------------
+@metrics.timed()
+def export_page():
+    st.header("Ekspor Data")
+    data = load_table_data()
+    col1, col2 = st.columns(2)
+    label = col1.selectbox("Data", list(EXPORT_COLLECTIONS))
+    fmt = col2.selectbox("Format", ["CSV", "Parquet"]).lower()
+    collection = EXPORT_COLLECTIONS[label]
+    col1, col2, col3 = st.columns(3)
+    date_from = col1.text_input("Dari Tanggal (YYYY-MM-DD)", key="export_from")
+    date_to = col2.text_input("Sampai Tanggal (YYYY-MM-DD)", key="export_to")
+    if collection == "journal_entries":
+        choice = col3.selectbox("Akun", ["Semua"] + ACCOUNTS, key="export_account")
+        filters = {"account": None if choice == "Semua" else choice}
+    else:
+        choice = col3.selectbox("Barang", ["Semua"] + list(get_catalog()), key="export_product")
+        filters = {"product": None if choice == "Semua" else choice}
+
+    if st.button("Siapkan Berkas"):
+        # Baris dibaca per potongan, tetapi tombol unduh butuh isi berkas utuh, jadi berkas
+        # ekspor disimpan di memori; ekspor besar dengan memori terbatas lewat CLI dapur_kita_export
+        buffer = io.BytesIO()
+        try:
+            count = export(
+                get_store(), data, collection, buffer, fmt,
+                date_from=date_from or None, date_to=date_to or None, **filters
+            )
+        except ValueError as error:
+            st.error(str(error))
+            return
+        st.download_button(
+            f"Unduh {count} baris ({fmt.upper()})", buffer.getvalue(),
+            file_name=export_filename(collection, fmt, date_from, date_to), mime=EXPORT_MIME[fmt]
+        )
+
+# ------------------- Halaman Tutup Buku -------------------
+@metrics.timed()
+def closing_page():
+    st.header("Tutup Buku")
+    st.markdown("""
+    Baris sampai akhir periode dipindahkan ke berkas arsip yang tidak bisa diubah lagi.
+    Total dan saldo akun dibawa sebagai saldo awal, dan transaksi bertanggal di periode
+    tertutup tidak bisa dicatat atau dihapus lagi.
+    """)
+    data = load_summary()
+    closed = data.get(CLOSING_KEY)
+    if closed and closed["partitions"]:
+        st.info(f"Periode sampai {closed['through']} sudah ditutup.")
+        show_table([{
+            "Periode": partition["period"], "Dari": partition["from"] or "-", "Sampai": partition["through"],
+            "Berkas": partition["file"], "Baris Transaksi": partition["counts"].get("transactions", 0),
+            "Baris Jurnal": partition["counts"].get("journal_entries", 0)
+        } for partition in closed["partitions"]])
+    else:
+        st.info("Belum ada periode yang ditutup.")
+
+    with st.form("form_closing"):
+        period = st.text_input("Periode (YYYY untuk satu tahun, YYYY-MM untuk satu bulan)")
+        submitted = st.form_submit_button("Tutup Periode")
+        if submitted:
+            try:
+                submit({"op": "close_period", "period": period.strip()})
+            except ValueError as error:
+                st.error(str(error))
+                return
+            st.success(f"Periode {period.strip()} berhasil ditutup.")
+
+# ------------------- Halaman Laporan Gabungan -------------------
+@metrics.timed()
+def consolidated_page():
+    st.header("Laporan Gabungan Semua Toko")
+    method = COST_METHOD_LABELS[st.selectbox("Metode Biaya", list(COST_METHOD_LABELS), key="consolidated_method")]
+    # Hanya toko yang bukunya berubah sejak laporan terakhir yang dihitung ulang
+    reports, stale = shard_reports(STORAGE_MODE, SHARDS)
+    total = consolidate(reports)
+    st.caption(f"{len(stale)} dari {len(STORES)} toko dihitung ulang, sisanya dari cache.")
+
+    cogs = total["cogs"][method]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total Pembelian", f"Rp {total['purchases']:,.0f}")
+    col2.metric("Total Pendapatan", f"Rp {total['sales']:,.0f}")
+    col3.metric("Harga Pokok Penjualan", f"Rp {cogs:,.0f}")
+    col4.metric("Laba Kotor", f"Rp {total['sales'] - cogs:,.0f}")
+
+    st.subheader("Profitabilitas per Toko")
+    show_table([{
+        "Toko": store, "Pembelian": report["purchases"], "Pendapatan": report["sales"],
+        "HPP": round(report["cogs"][method], 2), "Laba Kotor": round(report["sales"] - report["cogs"][method], 2)
+    } for store, report in reports.items()])
+
+    st.subheader("Neraca Saldo Gabungan")
+    show_table([dict({
+        "Akun": row["account"], "Debit": row["balance_debit"], "Kredit": row["balance_credit"]
+    }, **{
+        store: report["accounts"].get(row["account"], {}).get("debit", 0)
+        - report["accounts"].get(row["account"], {}).get("credit", 0)
+        for store, report in reports.items()
+    }) for row in trial_balance({"accounts": total["accounts"]})])
+    st.caption("Kolom per toko berisi saldo debit dikurangi kredit.")
+
+    st.subheader("Penjualan per Barang")
+    products = total["products"]
+    if not products:
+        st.info("Belum ada transaksi di toko mana pun.")
+        return
+    show_table([dict({
+        "Barang": product, "Pendapatan": item.get("sales", 0), "HPP": round(item.get("cogs", {}).get(method, 0), 2),
+        "Laba Kotor": round(item.get("sales", 0) - item.get("cogs", {}).get(method, 0), 2),
+        "Stok": item.get("quantity", 0)
+    }, **{
+        store: report["products"].get(product, {}).get("sales", 0) for store, report in reports.items()
+    }) for product, item in sorted(products.items())])
+
+# ------------------- Halaman Diagnostik -------------------
+def diagnostics_page():
+    st.header("Diagnostik Rerun")
+    # Instrumentasi berlaku untuk seluruh proses (semua sesi); berkas ekspor hanya dari lingkungan
+    enabled = st.checkbox("Aktifkan instrumentasi (semua sesi)", value=metrics.enabled)
+    export_path = configured_export()
+    st.caption(f"Ekspor JSONL: {export_path}" if export_path else f"Ekspor JSONL nonaktif; atur {EXPORT_ENV} untuk mengaktifkan.")
+    if enabled and (not metrics.enabled or export_path != metrics.export_path):
+        metrics.enable(export_path)
+    elif not enabled and metrics.enabled:
+        metrics.disable()
+    if not metrics.enabled:
+        st.info("Instrumentasi nonaktif. Aktifkan lalu buka halaman lain untuk mulai mencatat.")
+        return
+
+    summary = metrics.summary()
+    if not summary:
+        st.info("Belum ada rerun yang tercatat.")
+        return
+    st.subheader("Persentil Waktu per Bagian")
+    show_table([{
+        "Bagian": row["span"], "Jumlah": row["count"], "Rata-rata (ms)": round(row["mean_ms"], 2),
+        "p50 (ms)": round(row["p50_ms"], 2), "p90 (ms)": round(row["p90_ms"], 2), "p99 (ms)": round(row["p99_ms"], 2)
+    } for row in summary])
+
+    st.subheader("Rerun Terakhir")
+    recent = metrics.recent()
+    show_table([dict({
+        "Waktu": record["started"], "Halaman": record["label"] or "-",
+        "Total (ms)": round(record["duration"] * 1000, 2)
+    }, **{f"{name} (ms)": round(value * 1000, 2) for name, value in record["spans"].items()},
+       **record["counters"]) for record in recent])
+
+    st.subheader("Penghitung Proses")
+    show_table([{"Penghitung": name, "Nilai": value} for name, value in sorted(metrics.totals.items())])
+
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        "Unduh Metrik (JSONL)",
+        "".join(json.dumps(record) + "\n" for record in reversed(recent)),
+        file_name="dapur_kita_metrics.jsonl",
+    )
+    if col2.button("Bersihkan Riwayat"):
+        metrics.clear()
+        st.rerun()
 
 # ------------------- Main -------------------
 def main():
     if "logged_in" not in st.session_state:
         st.session_state["logged_in"] = False
-    if "data" not in st.session_state:
-        st.session_state["data"] = load_data()
 
-    if not st.session_state["logged_in"]:
-        login_page()
-    else:
-        home_page()
+    metrics.begin_rerun()
+    try:
+        if not st.session_state["logged_in"]:
+            login_page()
+        else:
+            home_page()
+    finally:
+        metrics.end_rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file